@@ -1,18 +1,49 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from routers import data_router  # 导入我们即将创建的路由
 from administrator.routers import lend_record_router
+from administrator.services.api_client import original_api_client
+from utils.log_pipeline import setup_logging
+from utils.loop_watchdog import install_loop_watchdog
+from utils.metrics import install_metrics
+from utils.openapi_cache import install_openapi_cache
+from utils.server_timing import ServerTimingMiddleware
+
+# 日志：经队列由后台线程写出，级别和格式见 LOG_* 配置
+setup_logging()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：退出时关闭上游连接池"""
+    yield
+    await original_api_client.aclose()
+
 
 # 创建FastAPI应用实例
 app = FastAPI(
     title="二次封装API服务",
     description="对现有接口进行二次封装的API服务",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Server-Timing 响应头
+app.add_middleware(ServerTimingMiddleware)
+
+# 事件循环阻塞检测（LOOP_WATCHDOG_ENABLED 时启用）
+install_loop_watchdog(app)
+
 # 包含路由
 app.include_router(data_router.router, prefix="/api/v1", tags=["数据接口"])
 app.include_router(lend_record_router.router, prefix="/api/v1", tags=["借出记录"])
 
+# OpenAPI 文档按模型定义哈希缓存到磁盘，各 worker 共用
+install_openapi_cache(app, "administrator")
+
+# Prometheus 指标：按客户端方法的耗时分布、失败/超时、缓存命中、传输字节及各组件统计
+install_metrics(app)
+
 # 根路径路由
 @app.get("/")
 async def root():
@@ -4,8 +4,10 @@ from typing import Optional
 # 导入所需的模块
 from administrator.services.api_client import original_api_client
 from administrator.schemas.data_schemas import LendRecordListResponse
+from utils.server_timing import TimedRoute
 
-router = APIRouter()
+# TimedRoute：Server-Timing 中拆分响应模型校验和JSON序列化耗时
+router = APIRouter(route_class=TimedRoute)
 
 @router.get("/lend-records", response_model=LendRecordListResponse)
 async def get_lend_records(
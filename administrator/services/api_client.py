@@ -1,18 +1,22 @@
-import requests
+import httpx
 import logging
 from typing import Dict, Any, Optional
 from datetime import datetime
 
+from utils.http_client import UpstreamSession
+from utils.metrics import instrument_client
+
 logger = logging.getLogger(__name__)
 
 
+@instrument_client("administrator")
 class OriginalAPIClient:
     """封装对原始API的调用"""
 
     def __init__(self, base_url: str, api_key: Optional[str] = None):
         self.base_url = base_url
-        self.session = requests.Session()
-        self.session.headers.update({
+        # 异步会话：与其他角色共用进程内的上游连接池和调度器，路由中直接 await，不阻塞事件循环
+        self.session = UpstreamSession({
             "Content-Type": "application/json",
             "User-Agent": "Secondary-API-Wrapper/1.0"
         })
@@ -60,27 +64,33 @@ class OriginalAPIClient:
         if api_key:
             self.session.headers.update({"Authorization": f"Bearer {api_key}"})
 
-    def get_user_data(self, user_id: int) -> Dict[str, Any]:
+    async def aclose(self):
+        """
+        关闭连接池，释放与原始API之间的keep-alive连接
+        """
+        await self.session.aclose()
+
+    async def get_user_data(self, user_id: int) -> Dict[str, Any]:
         """获取用户数据 from 原始接口"""
         try:
-            response = self.session.get(f"{self.base_url}/users/{user_id}", timeout=10)
+            response = await self.session.get(f"{self.base_url}/users/{user_id}", timeout=10)
             response.raise_for_status()  # 如果HTTP请求返回不成功状态码则抛出异常
             return response.json()
-        except requests.exceptions.RequestException as e:
-            logger.error(f"获取用户数据失败: {e}")
+        except httpx.HTTPError as e:
+            logger.error("获取用户数据失败: %s", e)
             raise
 
-    def get_user_posts(self, user_id: int) -> Dict[str, Any]:
+    async def get_user_posts(self, user_id: int) -> Dict[str, Any]:
         """获取用户帖子列表 from 原始接口"""
         try:
-            response = self.session.get(f"{self.base_url}/users/{user_id}/posts", timeout=10)
+            response = await self.session.get(f"{self.base_url}/users/{user_id}/posts", timeout=10)
             response.raise_for_status()
             return response.json()
-        except requests.exceptions.RequestException as e:
-            logger.error(f"获取用户帖子失败: {e}")
+        except httpx.HTTPError as e:
+            logger.error("获取用户帖子失败: %s", e)
             raise
 
-    def get_lend_records(self, params: Optional[Dict] = None) -> Dict[str, Any]:
+    async def get_lend_records(self, params: Optional[Dict] = None) -> Dict[str, Any]:
         """
         获取借出记录列表
         参数：借出单号、借出人、品牌、型号、状态、时间等查询条件
@@ -122,11 +132,11 @@ class OriginalAPIClient:
         # 真实API调用
         url = f"{self.base_url}/lend-records"
         try:
-            response = self.session.get(url, params=params or {}, timeout=10)
+            response = await self.session.get(url, params=params or {}, timeout=10)
             response.raise_for_status()
             return response.json()
-        except requests.exceptions.RequestException as e:
-            logger.error(f"获取借出记录列表失败: {e}")
+        except httpx.HTTPError as e:
+            logger.error("获取借出记录列表失败: %s", e)
             raise
 
 
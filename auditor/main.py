@@ -1,30 +1,50 @@
 import sys
 import os
 import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 # 将项目根目录添加到 Python 路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from routers.auditor_router import router as auditor_router
+from utils.admission import AdmissionController, AdmissionMiddleware
+from utils.log_pipeline import setup_logging
+from utils.loop_watchdog import install_loop_watchdog
+from utils.metrics import install_metrics
+from utils.openapi_cache import install_openapi_cache
+from utils.server_timing import ServerTimingMiddleware
+from routers.auditor_router import router as auditor_router, export_jobs
 from auditor.services.api_client import original_api_client
 
-# 启动时检查Token配置
-logger.info("========== 审计员服务启动 ==========")
-logger.info(f"API Base URL: {original_api_client.base_url}")
-auth_header = original_api_client.session.headers.get('Authorization')
-if auth_header:
-    logger.info(f"✅ Token已加载（前50字符）: {auth_header[:50]}...")
-else:
-    logger.warning("⚠️  未检测到Token，请检查token.txt文件")
-logger.info("=====================================")
+# 日志：经队列由后台线程写出，级别和格式见 LOG_* 配置
+setup_logging()
+
+
+def log_token_state():
+    """启动时检查Token配置（在应用启动阶段执行，不在导入时执行）"""
+    logger.info("========== 审计员服务启动 ==========")
+    logger.info("API Base URL: %s", original_api_client.base_url)
+    auth_header = original_api_client.session.headers.get(original_api_client.session.auth_header)
+    if auth_header:
+        logger.info("✅ Token已加载（前50字符）: %s...", auth_header[:50])
+    else:
+        logger.warning("⚠️  未检测到Token，请检查token.txt文件")
+    logger.info("=====================================")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动Token自动刷新和分析库同步，退出时取消导出任务并关闭上游连接池"""
+    log_token_state()
+    original_api_client.token_provider.start()
+    if original_api_client.analytics is not None:
+        original_api_client.analytics.start()
+    yield
+    await export_jobs.aclose()
+    await original_api_client.aclose()
+
 
 # 创建FastAPI应用实例
 app = FastAPI(
@@ -73,6 +93,7 @@ app = FastAPI(
     license_info={
         "name": "内部使用",
     },
+    lifespan=lifespan,
     openapi_tags=[
         {
             "name": "出入库统计",
@@ -97,9 +118,24 @@ app = FastAPI(
     ]
 )
 
+# 接口准入控制：按路由限制并发和排队，过载时返回 503 + Retry-After
+admission = AdmissionController()
+app.add_middleware(AdmissionMiddleware, controller=admission)
+# Server-Timing 响应头（在准入控制之外，包含准入排队时间）
+app.add_middleware(ServerTimingMiddleware)
+
+# 事件循环阻塞检测（LOOP_WATCHDOG_ENABLED 时启用）
+install_loop_watchdog(app)
+
 # 包含路由
 app.include_router(auditor_router, prefix="/api/v1/auditor")
 
+# OpenAPI 文档按模型定义哈希缓存到磁盘，各 worker 共用
+install_openapi_cache(app, "auditor")
+
+# Prometheus 指标：按客户端方法的耗时分布、失败/超时、缓存命中、传输字节及各组件统计
+install_metrics(app, admission, clients={"auditor": original_api_client})
+
 # 根路径路由
 @app.get("/", tags=["系统接口"], summary="服务根路径")
 async def root():
@@ -156,10 +192,10 @@ from fastapi.responses import JSONResponse
 async def global_exception_handler(request: Request, exc: Exception):
     """全局异常处理器"""
     import traceback
-    logger.error(f"全局异常: {str(exc)}")
-    logger.error(f"请求URL: {request.url}")
-    logger.error(f"请求方法: {request.method}")
-    logger.error(f"异常堆栈: {traceback.format_exc()}")
+    logger.error("全局异常: %s", exc)
+    logger.error("请求URL: %s", request.url)
+    logger.error("请求方法: %s", request.method)
+    logger.error("异常堆栈: %s", traceback.format_exc())
 
     return JSONResponse(
         status_code=500,
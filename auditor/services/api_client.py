@@ -1,12 +1,35 @@
-import requests
+import asyncio
+import functools
+import httpx
 import logging
-import os
-from typing import Dict, Any, Optional, List
+from datetime import datetime
+from typing import Dict, Any, Optional, List, AsyncIterator
 from urllib.parse import urljoin
+
+from config.config import settings
+from utils.analytics_rollups import (
+    DailyRankingRollup, MonthlyLendRollup, ERROR_RETURN_STATUS, query_ranking, query_year_chart
+)
+from utils.analytics_store import AnalyticsStore, AnalyticsSync
+from utils.http_client import UpstreamSession, iter_stream
+from utils.log_pipeline import log_payload
+from utils.metrics import instrument_client
+from utils.response_cache import ResponseCache, cached, is_success_response
+from utils.token_provider import TokenProvider
+from utils.upstream_scheduler import PRIORITY_ANALYTICS
 #ok
 logger = logging.getLogger(__name__)
 
+# 外部API不可用时返回的模拟数据标记
+MOCK_DATA_MSG = "模拟数据（外部API不可用）"
+
+
+def _is_upstream_result(result: Any) -> bool:
+    """排行结果可缓存判断：排除外部API失败时的模拟数据"""
+    return is_success_response(result) and result.get("msg") != MOCK_DATA_MSG
 
+
+@instrument_client("auditor")
 class OriginalAPIClient:
     """封装对原始API的调用"""
 
@@ -20,88 +43,165 @@ class OriginalAPIClient:
             token_file: Token文件路径（可选），默认为项目根目录下token.txt
         """
         self.base_url = base_url
-        self.session = requests.Session()
-        self.session.headers.update({
+        # 异步连接池会话，路由中直接 await 客户端方法，不阻塞事件循环
+        # 并发的相同GET请求会被合并为一次上游调用；审计统计查询排在写操作和终端查询之后
+        self.session = UpstreamSession({
             "Content-Type": "application/json",
             "User-Agent": "Secondary-API-Wrapper/1.0"
-        })
+        }, read_priority=PRIORITY_ANALYTICS)
+
+        # 只读统计接口的响应缓存（TTL + 过期后后台刷新）
+        self.response_cache = ResponseCache(namespace="auditor")
+
+        # 记录本地分析库，由应用生命周期启动后台增量同步
+        self.analytics: Optional[AnalyticsSync] = None
+        if settings.ANALYTICS_ENABLED:
+            self.analytics = AnalyticsSync(AnalyticsStore(), {
+                "lend": functools.partial(self._fetch_record_page, "/qw/knife/web/from/mes/record/lendList"),
+                "replenish": functools.partial(self._fetch_record_page, "/qw/knife/web/from/mes/record/replenishList"),
+                "storage": functools.partial(self._fetch_record_page, "/qw/knife/web/from/mes/record/storageList"),
+            })
+            # 排行所用的按天汇总、年度图表所用的按月汇总，随领刀记录同步增量维护
+            self.analytics.store.add_extension(DailyRankingRollup())
+            self.analytics.store.add_extension(MonthlyLendRollup())
+
+        # Token保存在内存中：启动时读取一次（优先使用api_key参数，其次为Token文件），
+        # 过期前后台刷新，上游返回401时刷新后重发
+        self.token_provider = TokenProvider(token=api_key, token_file=token_file or "token.txt")
+        self.session.use_token_provider(self.token_provider, "Blade-Auth")
+
+    def update_token(self, token: str):
+        """
+        更新Token
+
+        参数：
+            token: 新的Token字符串
+        """
+        self.token_provider.set_token(token)
+        logger.info("Token已更新")
+
+    def get_coalescing_stats(self) -> Dict[str, int]:
+        """
+        获取GET请求合并计数
+
+        返回：
+            包含 calls/executions/collapsed/inflight 的计数字典
+        """
+        return self.session.coalescer.stats()
+
+    def get_circuit_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        获取各上游接口的熔断状态
+
+        返回：
+            接口路径 -> state/failures/rejected
+        """
+        return self.session.breakers.stats()
+
+    def get_retry_stats(self) -> Dict[str, Any]:
+        """
+        获取GET重试与对冲计数
+
+        返回：
+            retries: 重试次数；requests/hedges/hedgeWins/hedgeRate: 对冲统计
+        """
+        return {"retries": self.session.retry.retries, **self.session.hedge.stats()}
+
+    def get_scheduler_stats(self) -> Dict[str, Any]:
+        """
+        获取上游调度器统计（进程内各角色共用）
+
+        返回：
+            limit/active/waiting 以及按优先级的放行、排队统计
+        """
+        return self.session.scheduler.stats()
+
+    async def aclose(self):
+        """
+        关闭连接池，释放与原始API之间的keep-alive连接
+        """
+        if self.analytics is not None:
+            await self.analytics.stop()
+        await self.token_provider.stop()
+        await self.session.aclose()
+
+    async def _fetch_record_page(self, path: str, current: int, size: int,
+                                 startTime: Optional[str], endTime: Optional[str]) -> Dict[str, Any]:
+        """
+        直接从上游拉取一页记录，供本地分析库同步使用
 
-        # 优先使用api_key参数
-        if api_key:
-            self.session.headers.update({"Blade-Auth": f"Bearer {api_key}"})
-        # 其次尝试从文件读取token
-        elif token_file or os.path.exists("token.txt"):
-            token = self._load_token_from_file(token_file or "token.txt")
-            if token:
-                self.session.headers.update({"Blade-Auth": f"Bearer {token}"})
-                logger.info("已从文件加载Token")
-            else:
-                logger.warning("无法加载Token，将使用无认证模式")
+        参数：
+            path: 记录列表接口路径
+            current: 当前页
+            size: 每页数量
+            startTime: 开始时间（为空时拉取全部历史）
+            endTime: 结束时间
+        返回：
+            上游原始响应
+        """
+        params = {"current": current, "size": size, "startTime": startTime, "endTime": endTime}
+        response = await self.session.get(urljoin(self.base_url, path), params={k: v for k, v in params.items() if v is not None})
+        response.raise_for_status()
+        return response.json()
 
-    def _load_token_from_file(self, token_file: str) -> Optional[str]:
+    async def _query_local_records(self, kind: str, supported: bool, **filters) -> Optional[Dict[str, Any]]:
         """
-        从文件读取Token
+        本地分析库已同步时在本地完成记录查询
 
         参数：
-            token_file: Token文件路径
+            kind: 记录类型 lend/replenish/storage
+            supported: 查询条件是否都能在本地完成（关键字、排序等仍交给上游）
+            filters: AnalyticsStore.query_records 的筛选参数
         返回：
-            Token字符串，如果读取失败则返回None
+            与上游一致的分页结构；无法在本地完成时返回None
         """
-        try:
-            # 如果是相对路径，转换为绝对路径
-            if not os.path.isabs(token_file):
-                # 获取项目根目录
-                current_dir = os.path.dirname(os.path.abspath(__file__))
-                project_root = os.path.dirname(os.path.dirname(current_dir))
-                token_file = os.path.join(project_root, token_file)
-
-            # 读取token文件
-            with open(token_file, 'r', encoding='utf-8') as f:
-                token = f.read().strip()
-                if token:
-                    logger.info(f"成功从 {token_file} 读取Token")
-                    return token
-                else:
-                    logger.warning(f"Token文件 {token_file} 为空")
-                    return None
-        except FileNotFoundError:
-            logger.warning(f"Token文件 {token_file} 不存在")
+        if self.analytics is None or not supported or not self.analytics.ready(kind):
             return None
-        except Exception as e:
-            logger.error(f"读取Token文件失败: {e}")
+        return await asyncio.to_thread(self.analytics.store.query_records, kind, **filters)
+
+    async def _query_local_ranking(self, dimension: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        领刀记录已同步到本地时，由按天汇总计算排行
+
+        返回：
+            排行结果；本地数据不可用时返回None
+        """
+        if self.analytics is None or not self.analytics.ready("lend"):
             return None
+        return await asyncio.to_thread(query_ranking, self.analytics.store, dimension, params)
 
-    def update_token(self, token: str):
+    async def _query_local_year_chart(self, year: Optional[int], metric: str) -> Optional[Dict[str, Any]]:
         """
-        更新Token
+        领刀记录已同步到本地时，直接读取按月汇总
 
-        参数：
-            token: 新的Token字符串
+        返回：
+            年度图表结果；本地数据不可用时返回None（回退上游）
         """
-        self.session.headers.update({"Blade-Auth": f"Bearer {token}"})
-        logger.info("Token已更新")
+        if self.analytics is None or not self.analytics.ready("lend"):
+            return None
+        return await asyncio.to_thread(query_year_chart, self.analytics.store, year or datetime.now().year, metric)
 
-    def get_user_data(self, user_id: int) -> Dict[str, Any]:
+    async def get_user_data(self, user_id: int) -> Dict[str, Any]:
         """获取用户数据 from 原始接口"""
         try:
-            response = self.session.get(f"{self.base_url}/users/{user_id}", timeout=10)
+            response = await self.session.get(f"{self.base_url}/users/{user_id}", timeout=10)
             response.raise_for_status()  # 如果HTTP请求返回不成功状态码则抛出异常
             return response.json()
-        except requests.exceptions.RequestException as e:
-            logger.error(f"获取用户数据失败: {e}")
+        except httpx.HTTPError as e:
+            logger.error("获取用户数据失败: %s", e)
             raise
 
-    def get_user_posts(self, user_id: int) -> Dict[str, Any]:
+    async def get_user_posts(self, user_id: int) -> Dict[str, Any]:
         """获取用户帖子列表 from 原始接口"""
         try:
-            response = self.session.get(f"{self.base_url}/users/{user_id}/posts", timeout=10)
+            response = await self.session.get(f"{self.base_url}/users/{user_id}/posts", timeout=10)
             response.raise_for_status()
             return response.json()
-        except requests.exceptions.RequestException as e:
-            logger.error(f"获取用户帖子失败: {e}")
+        except httpx.HTTPError as e:
+            logger.error("获取用户帖子失败: %s", e)
             raise
 
-    def get_storage_statistics(self, params: Dict[str, Any]) -> Dict[str, Any]:
+    async def get_storage_statistics(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """
         获取出入库统计数据
         调用外部接口：/qw/knife/web/from/mes/record/stockList
@@ -121,7 +221,7 @@ class OriginalAPIClient:
             query_params = {k: v for k, v in params.items() if v is not None}
 
             # 调用外部接口，使用 params 传递查询参数
-            response = self.session.get(
+            response = await self.session.get(
                 f"{self.base_url}/qw/knife/web/from/mes/record/stockList",
                 params=query_params,
                 timeout=10
@@ -139,8 +239,8 @@ class OriginalAPIClient:
                 "data": external_data.get("data")
             }
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"获取出入库统计数据失败: {e}")
+        except httpx.HTTPError as e:
+            logger.error("获取出入库统计数据失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"调用外部接口失败: {str(e)}",
@@ -148,7 +248,7 @@ class OriginalAPIClient:
                 "data": None
             }
 
-    def export_stock_record(self, params: Dict[str, Any]) -> Dict[str, Any]:
+    async def export_stock_record(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """
         导出刀具耗材数据（出入库记录）
         调用外部接口：/qw/knife/web/from/mes/record/exportStockRecord
@@ -167,7 +267,7 @@ class OriginalAPIClient:
             query_params = {k: v for k, v in params.items() if v is not None}
 
             # 调用外部导出接口
-            response = self.session.get(
+            response = await self.session.get(
                 f"{self.base_url}/qw/knife/web/from/mes/record/exportStockRecord",
                 params=query_params,
                 timeout=10
@@ -185,8 +285,8 @@ class OriginalAPIClient:
                 "data": external_data.get("data")
             }
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"导出出入库记录失败: {e}")
+        except httpx.HTTPError as e:
+            logger.error("导出出入库记录失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"调用外部导出接口失败: {str(e)}",
@@ -194,21 +294,28 @@ class OriginalAPIClient:
                 "data": None
             }
 
-    def get_charts_lend_by_year(self) -> Dict[str, Any]:
+    @cached("charts_lend_by_year", ttl=300)
+    async def get_charts_lend_by_year(self, year: Optional[int] = None) -> Dict[str, Any]:
         """
         获取全年取刀数量统计
-        调用外部接口：/qw/knife/web/from/mes/statistics/chartsLendByYear
+        领刀记录已同步到本地分析库时直接读取按月汇总，否则调用外部接口：/qw/knife/web/from/mes/statistics/chartsLendByYear
         请求方式：GET
-        无需参数
+        参数：
+        - year: 年份，默认当年（回退外部接口时作为 year 参数传递）
 
         返回数据：
         - titleList: 月份标题列表（如：["1月", "2月", ..., "12月"]）
         - dataList: 对应的取刀数量列表
         """
+        local = await self._query_local_year_chart(year, "quantity")
+        if local is not None:
+            return local
+
         try:
             # 调用外部接口
-            response = self.session.get(
+            response = await self.session.get(
                 f"{self.base_url}/qw/knife/web/from/mes/statistics/chartsLendByYear",
+                params={"year": year} if year is not None else None,
                 timeout=10
             )
             response.raise_for_status()
@@ -224,8 +331,8 @@ class OriginalAPIClient:
                 "data": external_data.get("data")
             }
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"获取全年取刀数量统计失败: {e}")
+        except httpx.HTTPError as e:
+            logger.error("获取全年取刀数量统计失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"调用外部接口失败: {str(e)}",
@@ -233,21 +340,28 @@ class OriginalAPIClient:
                 "data": None
             }
 
-    def get_charts_lend_price_by_year(self) -> Dict[str, Any]:
+    @cached("charts_lend_price_by_year", ttl=300)
+    async def get_charts_lend_price_by_year(self, year: Optional[int] = None) -> Dict[str, Any]:
         """
         获取全年取刀金额统计
-        调用外部接口：/qw/knife/web/from/mes/statistics/chartsLendPriceByYear
+        领刀记录已同步到本地分析库时直接读取按月汇总，否则调用外部接口：/qw/knife/web/from/mes/statistics/chartsLendPriceByYear
         请求方式：GET
-        无需参数
+        参数：
+        - year: 年份，默认当年（回退外部接口时作为 year 参数传递）
 
         返回数据：
         - titleList: 月份标题列表（如：["1月", "2月", ..., "12月"]）
         - dataList: 对应的取刀金额列表
         """
+        local = await self._query_local_year_chart(year, "amount")
+        if local is not None:
+            return local
+
         try:
             # 调用外部接口
-            response = self.session.get(
+            response = await self.session.get(
                 f"{self.base_url}/qw/knife/web/from/mes/statistics/chartsLendPriceByYear",
+                params={"year": year} if year is not None else None,
                 timeout=10
             )
             response.raise_for_status()
@@ -263,8 +377,8 @@ class OriginalAPIClient:
                 "data": external_data.get("data")
             }
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"获取全年取刀金额统计失败: {e}")
+        except httpx.HTTPError as e:
+            logger.error("获取全年取刀金额统计失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"调用外部接口失败: {str(e)}",
@@ -272,7 +386,8 @@ class OriginalAPIClient:
                 "data": None
             }
 
-    def get_charts_accumulated(self) -> Dict[str, Any]:
+    @cached("charts_accumulated", ttl=300)
+    async def get_charts_accumulated(self) -> Dict[str, Any]:
         """
         获取刀具消耗统计
         调用外部接口：/qw/knife/web/from/mes/statistics/chartsAccumulated
@@ -285,7 +400,7 @@ class OriginalAPIClient:
         """
         try:
             # 调用外部接口
-            response = self.session.get(
+            response = await self.session.get(
                 f"{self.base_url}/qw/knife/web/from/mes/statistics/chartsAccumulated",
                 timeout=10
             )
@@ -302,8 +417,8 @@ class OriginalAPIClient:
                 "data": external_data.get("data")
             }
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"获取刀具消耗统计失败: {e}")
+        except httpx.HTTPError as e:
+            logger.error("获取刀具消耗统计失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"调用外部接口失败: {str(e)}",
@@ -311,7 +426,7 @@ class OriginalAPIClient:
                 "data": None
             }
 
-    def get_total_stock_list(self, params: Dict[str, Any]) -> Dict[str, Any]:
+    async def get_total_stock_list(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """
         获取总库存统计列表（支持搜索和刷新）
         调用外部接口：/qw/knife/web/from/mes/cabinetStock/stockLocTakeInfoById
@@ -339,7 +454,7 @@ class OriginalAPIClient:
 
             # 调用外部接口（这里假设有列表查询接口）
             # 如果外部系统没有列表接口，需要跟外部系统确认正确的接口地址
-            response = self.session.get(
+            response = await self.session.get(
                 f"{self.base_url}/qw/knife/web/from/mes/cabinetStock/stockLocTakeInfoList",
                 params=query_params,
                 timeout=10
@@ -371,8 +486,8 @@ class OriginalAPIClient:
                 "data": data
             }
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"获取总库存统计列表失败: {e}")
+        except httpx.HTTPError as e:
+            logger.error("获取总库存统计列表失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"调用外部接口失败: {str(e)}",
@@ -380,7 +495,7 @@ class OriginalAPIClient:
                 "data": None
             }
 
-    def get_stock_location_by_id(self, stock_id: int) -> Dict[str, Any]:
+    async def get_stock_location_by_id(self, stock_id: int) -> Dict[str, Any]:
         """
         获取取刀柜库位详情（单个）
         调用外部接口：/qw/knife/web/from/mes/cabinetStock/stockLocTakeInfoById
@@ -394,7 +509,7 @@ class OriginalAPIClient:
         """
         try:
             # 调用外部接口
-            response = self.session.get(
+            response = await self.session.get(
                 f"{self.base_url}/qw/knife/web/from/mes/cabinetStock/stockLocTakeInfoById",
                 params={"stockId": stock_id},
                 timeout=10
@@ -419,8 +534,8 @@ class OriginalAPIClient:
                 "data": data
             }
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"获取库位详情失败: {e}")
+        except httpx.HTTPError as e:
+            logger.error("获取库位详情失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"调用外部接口失败: {str(e)}",
@@ -428,7 +543,7 @@ class OriginalAPIClient:
                 "data": None
             }
 
-    def get_waste_knife_recycle_info(self, params: Dict[str, Any]) -> Dict[str, Any]:
+    async def get_waste_knife_recycle_info(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """
         获取废刀回收统计信息（收刀柜还刀信息）
         调用外部接口：/qw/knife/web/from/mes/lend/getLendByStock
@@ -461,7 +576,7 @@ class OriginalAPIClient:
             query_params = {k: v for k, v in params.items() if v is not None}
 
             # 调用外部接口
-            response = self.session.get(
+            response = await self.session.get(
                 f"{self.base_url}/qw/knife/web/from/mes/lend/getLendByStock",
                 params=query_params,
                 timeout=10
@@ -479,8 +594,8 @@ class OriginalAPIClient:
                 "data": external_data.get("data")
             }
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"获取废刀回收统计信息失败: {e}")
+        except httpx.HTTPError as e:
+            logger.error("获取废刀回收统计信息失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"调用外部接口失败: {str(e)}",
@@ -489,16 +604,16 @@ class OriginalAPIClient:
             }
 
     # ==================== 排行接口方法 ====================
-    def _get_ranking_data(self, endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    async def _get_ranking_data(self, endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
         """通用排行数据获取方法"""
         try:
             # 过滤None值参数
             query_params = {k: v for k, v in params.items() if v is not None}
 
-            logger.info(f"调用外部API: {self.base_url}{endpoint}")
-            logger.info(f"请求参数: {query_params}")
+            logger.info("调用外部API: %s%s", self.base_url, endpoint)
+            logger.info("请求参数: %s", query_params)
 
-            response = self.session.get(
+            response = await self.session.get(
                 f"{self.base_url}{endpoint}",
                 params=query_params,
                 timeout=10
@@ -506,11 +621,11 @@ class OriginalAPIClient:
             response.raise_for_status()
 
             result = response.json()
-            logger.info(f"外部API响应: {result}")
+            log_payload(logger, "外部API响应", result)
             return result
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"获取排行数据失败 {endpoint}: {e}")
+        except httpx.HTTPError as e:
+            logger.error("获取排行数据失败 %s: %s", endpoint, e)
             logger.info("由于外部API连接失败，返回模拟数据")
             # 返回模拟数据用于测试
             return self._get_mock_ranking_data(endpoint, params)
@@ -523,7 +638,7 @@ class OriginalAPIClient:
         # 基础响应结构
         mock_data = {
             "code": 200,
-            "msg": "模拟数据（外部API不可用）",
+            "msg": MOCK_DATA_MSG,
             "success": True,
             "data": {
                 "titleList": [],
@@ -557,20 +672,25 @@ class OriginalAPIClient:
     # ==================== 排行接口方法 ====================
     # 这些是新增的排行接口，在合并版本中缺失
 
-    def get_device_ranking(self, params: Dict[str, Any]) -> Dict[str, Any]:
+    @cached("device_ranking", ttl=300, cacheable=_is_upstream_result)
+    async def get_device_ranking(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """
         设备用刀排行
         接口地址: /ou/knife/web/from/ms/statistics/chartsDeviceSanking
         rankingType: 0.批量 1 查错
         """
+        local = await self._query_local_ranking("device", params)
+        if local is not None:
+            return local
+
         try:
             # 构建查询参数，过滤掉None值
             query_params = {k: v for k, v in params.items() if v is not None}
 
-            logger.info(f"调用设备用刀排行接口: {self.base_url}/ou/knife/web/from/ms/statistics/chartsDeviceSanking")
-            logger.info(f"请求参数: {query_params}")
+            logger.info("调用设备用刀排行接口: %s/ou/knife/web/from/ms/statistics/chartsDeviceSanking", self.base_url)
+            logger.info("请求参数: %s", query_params)
 
-            response = self.session.get(
+            response = await self.session.get(
                 f"{self.base_url}/ou/knife/web/from/ms/statistics/chartsDeviceSanking",
                 params=query_params,
                 timeout=10
@@ -578,15 +698,15 @@ class OriginalAPIClient:
             response.raise_for_status()
 
             result = response.json()
-            logger.info(f"设备用刀排行响应: {result}")
+            log_payload(logger, "设备用刀排行响应", result)
             return result
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"获取设备用刀排行失败: {e}")
+        except httpx.HTTPError as e:
+            logger.error("获取设备用刀排行失败: %s", e)
             # 返回模拟数据用于测试
             return {
                 "code": 200,
-                "msg": "模拟数据（外部API不可用）",
+                "msg": MOCK_DATA_MSG,
                 "success": True,
                 "data": {
                     "titleList": ["设备A", "设备B", "设备C", "设备D", "设备E"],
@@ -594,20 +714,25 @@ class OriginalAPIClient:
                 }
             }
 
-    def get_knife_model_ranking(self, params: Dict[str, Any]) -> Dict[str, Any]:
+    @cached("knife_model_ranking", ttl=300, cacheable=_is_upstream_result)
+    async def get_knife_model_ranking(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """
         刀具型号排行
         接口地址: /api/mifc/web/from/me/statistics/charts@tuttenbanking
         rankingType: 0:数量 1:金额
         """
+        local = await self._query_local_ranking("knife_model", params)
+        if local is not None:
+            return local
+
         try:
             # 构建查询参数，过滤掉None值
             query_params = {k: v for k, v in params.items() if v is not None}
 
-            logger.info(f"调用刀具型号排行接口: {self.base_url}/api/mifc/web/from/me/statistics/charts@tuttenbanking")
-            logger.info(f"请求参数: {query_params}")
+            logger.info("调用刀具型号排行接口: %s/api/mifc/web/from/me/statistics/charts@tuttenbanking", self.base_url)
+            logger.info("请求参数: %s", query_params)
 
-            response = self.session.get(
+            response = await self.session.get(
                 f"{self.base_url}/api/mifc/web/from/me/statistics/charts@tuttenbanking",
                 params=query_params,
                 timeout=10
@@ -615,15 +740,15 @@ class OriginalAPIClient:
             response.raise_for_status()
 
             result = response.json()
-            logger.info(f"刀具型号排行响应: {result}")
+            log_payload(logger, "刀具型号排行响应", result)
             return result
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"获取刀具型号排行失败: {e}")
+        except httpx.HTTPError as e:
+            logger.error("获取刀具型号排行失败: %s", e)
             # 返回模拟数据用于测试
             return {
                 "code": 200,
-                "msg": "模拟数据（外部API不可用）",
+                "msg": MOCK_DATA_MSG,
                 "success": True,
                 "data": {
                     "titleList": ["型号A", "型号B", "型号C", "型号D", "型号E"],
@@ -631,20 +756,25 @@ class OriginalAPIClient:
                 }
             }
 
-    def get_employee_ranking(self, params: Dict[str, Any]) -> Dict[str, Any]:
+    @cached("employee_ranking", ttl=300, cacheable=_is_upstream_result)
+    async def get_employee_ranking(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """
         员工领刀排行
         接口地址: /go/kaife/web/from/mss/statistics/chartslandHunting
         rankingType: 0:批量下拉量 (根据文档推测含义)
         """
+        local = await self._query_local_ranking("employee", params)
+        if local is not None:
+            return local
+
         try:
             # 构建查询参数，过滤掉None值
             query_params = {k: v for k, v in params.items() if v is not None}
 
-            logger.info(f"调用员工领刀排行接口: {self.base_url}/go/kaife/web/from/mss/statistics/chartslandHunting")
-            logger.info(f"请求参数: {query_params}")
+            logger.info("调用员工领刀排行接口: %s/go/kaife/web/from/mss/statistics/chartslandHunting", self.base_url)
+            logger.info("请求参数: %s", query_params)
 
-            response = self.session.get(
+            response = await self.session.get(
                 f"{self.base_url}/go/kaife/web/from/mss/statistics/chartslandHunting",
                 params=query_params,
                 timeout=10
@@ -652,15 +782,15 @@ class OriginalAPIClient:
             response.raise_for_status()
 
             result = response.json()
-            logger.info(f"员工领刀排行响应: {result}")
+            log_payload(logger, "员工领刀排行响应", result)
             return result
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"获取员工领刀排行失败: {e}")
+        except httpx.HTTPError as e:
+            logger.error("获取员工领刀排行失败: %s", e)
             # 返回模拟数据用于测试
             return {
                 "code": 200,
-                "msg": "模拟数据（外部API不可用）",
+                "msg": MOCK_DATA_MSG,
                 "success": True,
                 "data": {
                     "titleList": ["员工A", "员工B", "员工C", "员工D", "员工E"],
@@ -668,20 +798,26 @@ class OriginalAPIClient:
                 }
             }
 
-    def get_error_return_ranking(self, params: Dict[str, Any]) -> Dict[str, Any]:
+    @cached("error_return_ranking", ttl=300, cacheable=_is_upstream_result)
+    async def get_error_return_ranking(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """
         异常还刀排行
         接口地址: /ou/knife/web/from/news/statsstics/dhatsErrorBorrow
         rankingType: 0:批量 1:金额
         """
+        # 本地计算：按员工统计违规还刀记录
+        local = await self._query_local_ranking("employee", {**params, "recordStatus": ERROR_RETURN_STATUS})
+        if local is not None:
+            return local
+
         try:
             # 构建查询参数，过滤掉None值
             query_params = {k: v for k, v in params.items() if v is not None}
 
-            logger.info(f"调用异常还刀排行接口: {self.base_url}/ou/knife/web/from/news/statsstics/dhatsErrorBorrow")
-            logger.info(f"请求参数: {query_params}")
+            logger.info("调用异常还刀排行接口: %s/ou/knife/web/from/news/statsstics/dhatsErrorBorrow", self.base_url)
+            logger.info("请求参数: %s", query_params)
 
-            response = self.session.get(
+            response = await self.session.get(
                 f"{self.base_url}/ou/knife/web/from/news/statsstics/dhatsErrorBorrow",
                 params=query_params,
                 timeout=10
@@ -689,15 +825,15 @@ class OriginalAPIClient:
             response.raise_for_status()
 
             result = response.json()
-            logger.info(f"异常还刀排行响应: {result}")
+            log_payload(logger, "异常还刀排行响应", result)
             return result
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"获取异常还刀排行失败: {e}")
+        except httpx.HTTPError as e:
+            logger.error("获取异常还刀排行失败: %s", e)
             # 返回模拟数据用于测试
             return {
                 "code": 200,
-                "msg": "模拟数据（外部API不可用）",
+                "msg": MOCK_DATA_MSG,
                 "success": True,
                 "data": {
                     "titleList": ["异常类型A", "异常类型B", "异常类型C", "异常类型D"],
@@ -712,7 +848,7 @@ class OriginalAPIClient:
     # 来源: auditor_record/services/api_client.py
 
     # 补货记录API客户端
-    def get_replenish_records(self,
+    async def get_replenish_records(self,
                               current: Optional[int] = None,
                               endTime: Optional[str] = None,
                               order: Optional[int] = None,
@@ -735,6 +871,18 @@ class OriginalAPIClient:
         Returns:
             Dict: API响应结果
         """
+        local = await self._query_local_records(
+            "replenish",
+            order is None and rankingType is None,
+            current=current or 1,
+            size=size or 10,
+            startTime=startTime,
+            endTime=endTime,
+            status=recordStatus
+        )
+        if local is not None:
+            return local
+
         url = urljoin(self.base_url, "/qw/knife/web/from/mes/record/replenishList")
 
         params = {}
@@ -756,10 +904,10 @@ class OriginalAPIClient:
             params["startTime"] = startTime
 
         try:
-            response = self.session.get(url, params=params)
+            response = await self.session.get(url, params=params)
             response.raise_for_status()
             return response.json()
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             return {
                 "code": -1,
                 "msg": f"请求失败: {str(e)}",
@@ -775,12 +923,12 @@ class OriginalAPIClient:
                 "success": False
             }
 
-    def export_replenish_records(self,
+    async def export_replenish_records(self,
                                  endTime: Optional[str] = None,
                                  order: Optional[int] = None,
                                  rankingType: Optional[int] = None,
                                  recordStatus: Optional[int] = None,
-                                 startTime: Optional[str] = None) -> bytes:
+                                 startTime: Optional[str] = None) -> AsyncIterator[bytes]:
         """
         导出补货记录
 
@@ -792,7 +940,7 @@ class OriginalAPIClient:
             startTime: 开始时间
 
         Returns:
-            bytes: 导出的Excel文件内容
+            AsyncIterator[bytes]: 分块读取的Excel文件内容
         """
         url = urljoin(self.base_url, "/qw/knife/web/from/mes/record/exportReplenishRecord")
 
@@ -811,14 +959,14 @@ class OriginalAPIClient:
             params["startTime"] = startTime
 
         try:
-            response = self.session.get(url, params=params)
-            response.raise_for_status()
-            return response.content
-        except requests.RequestException as e:
+            # 流式读取上游文件，内存占用与文件大小无关
+            response = await self.session.open_stream(url, params=params)
+            return iter_stream(response)
+        except httpx.HTTPError as e:
             raise Exception(f"导出失败: {str(e)}")
 
     # 领刀记录API客户端
-    def get_lend_records(self,
+    async def get_lend_records(self,
                          current: int = 1,
                          size: int = 20,
                          keyword: Optional[str] = None,
@@ -845,6 +993,19 @@ class OriginalAPIClient:
         Returns:
             Dict: API响应结果
         """
+        local = await self._query_local_records(
+            "lend",
+            not keyword and order is None and rankingType is None,
+            current=current,
+            size=size,
+            startTime=startTime,
+            endTime=endTime,
+            status=recordStatus,
+            department=department or None
+        )
+        if local is not None:
+            return local
+
         url = urljoin(self.base_url, "/qw/knife/web/from/mes/record/lendList")
 
         params = {
@@ -869,10 +1030,10 @@ class OriginalAPIClient:
             params["recordStatus"] = recordStatus
 
         try:
-            response = self.session.get(url, params=params)
+            response = await self.session.get(url, params=params)
             response.raise_for_status()
             return response.json()
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             return {
                 "code": -1,
                 "msg": f"请求失败: {str(e)}",
@@ -888,12 +1049,12 @@ class OriginalAPIClient:
                 "success": False
             }
 
-    def export_lend_records(self,
+    async def export_lend_records(self,
                             endTime: Optional[str] = None,
                             order: Optional[int] = None,
                             rankingType: Optional[int] = None,
                             recordStatus: Optional[int] = None,
-                            startTime: Optional[str] = None) -> bytes:
+                            startTime: Optional[str] = None) -> AsyncIterator[bytes]:
         """
         导出领刀记录
 
@@ -905,7 +1066,7 @@ class OriginalAPIClient:
             startTime: 开始时间
 
         Returns:
-            bytes: 导出的文件内容
+            AsyncIterator[bytes]: 分块读取的导出文件内容
         """
         url = urljoin(self.base_url, "/qw/knife/web/from/mes/record/exportLendRecord")
 
@@ -924,14 +1085,14 @@ class OriginalAPIClient:
             params["startTime"] = startTime
 
         try:
-            response = self.session.get(url, params=params)
-            response.raise_for_status()
-            return response.content
-        except requests.RequestException as e:
+            # 流式读取上游文件，内存占用与文件大小无关
+            response = await self.session.open_stream(url, params=params)
+            return iter_stream(response)
+        except httpx.HTTPError as e:
             raise Exception(f"导出失败: {str(e)}")
 
     # 告警预警API客户端
-    def list_alarm_warning(self,
+    async def list_alarm_warning(self,
                            locSurplus: Optional[int] = None,
                            alarmLevel: Optional[int] = None,
                            deviceType: Optional[str] = None,
@@ -979,10 +1140,10 @@ class OriginalAPIClient:
             params["size"] = size
 
         try:
-            response = self.session.get(url, params=params)
+            response = await self.session.get(url, params=params)
             response.raise_for_status()
             return response.json()
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             return {
                 "code": -1,
                 "msg": f"请求失败: {str(e)}",
@@ -998,7 +1159,8 @@ class OriginalAPIClient:
                 "success": False
             }
 
-    def get_alarm_statistics(self) -> Dict[str, Any]:
+    @cached("alarm_statistics", ttl=30)
+    async def get_alarm_statistics(self) -> Dict[str, Any]:
         """
         获取告警统计信息
 
@@ -1008,10 +1170,10 @@ class OriginalAPIClient:
         url = urljoin(self.base_url, "/qw/knife/web/from/mes/alarm/warning/statistics")
 
         try:
-            response = self.session.get(url)
+            response = await self.session.get(url)
             response.raise_for_status()
             return response.json()
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             return {
                 "code": -1,
                 "msg": f"请求失败: {str(e)}",
@@ -1024,7 +1186,7 @@ class OriginalAPIClient:
                 "success": False
             }
 
-    def update_alarm_threshold(self,
+    async def update_alarm_threshold(self,
                                locSurplus: int,
                                alarmThreshold: int) -> Dict[str, Any]:
         """
@@ -1045,10 +1207,12 @@ class OriginalAPIClient:
         }
 
         try:
-            response = self.session.post(url, json=data)
+            response = await self.session.post(url, json=data)
             response.raise_for_status()
+            # 告警状态变化后，告警统计缓存失效
+            self.response_cache.invalidate("alarm_statistics")
             return response.json()
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             return {
                 "code": -1,
                 "msg": f"请求失败: {str(e)}",
@@ -1056,7 +1220,7 @@ class OriginalAPIClient:
                 "success": False
             }
 
-    def handle_alarm_warning(self,
+    async def handle_alarm_warning(self,
                              id: int,
                              handleStatus: int,
                              handleRemark: Optional[str] = None) -> Dict[str, Any]:
@@ -1081,10 +1245,12 @@ class OriginalAPIClient:
             data["handleRemark"] = handleRemark
 
         try:
-            response = self.session.post(url, json=data)
+            response = await self.session.post(url, json=data)
             response.raise_for_status()
+            # 告警状态变化后，告警统计缓存失效
+            self.response_cache.invalidate("alarm_statistics")
             return response.json()
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             return {
                 "code": -1,
                 "msg": f"请求失败: {str(e)}",
@@ -1092,7 +1258,7 @@ class OriginalAPIClient:
                 "success": False
             }
 
-    def batch_handle_alarm_warning(self,
+    async def batch_handle_alarm_warning(self,
                                    ids: List[int],
                                    handleStatus: int,
                                    handleRemark: Optional[str] = None) -> Dict[str, Any]:
@@ -1118,10 +1284,12 @@ class OriginalAPIClient:
             data["handleRemark"] = handleRemark
 
         try:
-            response = self.session.post(url, json=data)
+            response = await self.session.post(url, json=data)
             response.raise_for_status()
+            # 告警状态变化后，告警统计缓存失效
+            self.response_cache.invalidate("alarm_statistics")
             return response.json()
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             return {
                 "code": -1,
                 "msg": f"请求失败: {str(e)}",
@@ -1129,13 +1297,13 @@ class OriginalAPIClient:
                 "success": False
             }
 
-    def export_alarm_warning(self,
+    async def export_alarm_warning(self,
                              locSurplus: Optional[int] = None,
                              alarmLevel: Optional[int] = None,
                              deviceType: Optional[str] = None,
                              cabinetCode: Optional[str] = None,
                              brandName: Optional[str] = None,
-                             handleStatus: Optional[int] = None) -> bytes:
+                             handleStatus: Optional[int] = None) -> AsyncIterator[bytes]:
         """
         导出告警预警
 
@@ -1148,7 +1316,7 @@ class OriginalAPIClient:
             handleStatus: 处理状态
 
         Returns:
-            bytes: 导出的文件内容
+            AsyncIterator[bytes]: 分块读取的导出文件内容
         """
         url = urljoin(self.base_url, "/qw/knife/web/from/mes/alarm/warning/export")
 
@@ -1169,14 +1337,14 @@ class OriginalAPIClient:
             params["handleStatus"] = handleStatus
 
         try:
-            response = self.session.get(url, params=params)
-            response.raise_for_status()
-            return response.content
-        except requests.RequestException as e:
+            # 流式读取上游文件，内存占用与文件大小无关
+            response = await self.session.open_stream(url, params=params)
+            return iter_stream(response)
+        except httpx.HTTPError as e:
             raise Exception(f"导出失败: {str(e)}")
 
     # 公共暂存记录API客户端
-    def get_storage_records(self,
+    async def get_storage_records(self,
                             current: Optional[int] = None,
                             endTime: Optional[str] = None,
                             order: Optional[int] = None,
@@ -1199,6 +1367,18 @@ class OriginalAPIClient:
         Returns:
             Dict: API响应结果
         """
+        local = await self._query_local_records(
+            "storage",
+            order is None and rankingType is None,
+            current=current or 1,
+            size=size or 10,
+            startTime=startTime,
+            endTime=endTime,
+            status=recordStatus
+        )
+        if local is not None:
+            return local
+
         url = urljoin(self.base_url, "/qw/knife/web/from/mes/record/storageList")
 
         params = {}
@@ -1220,10 +1400,10 @@ class OriginalAPIClient:
             params["startTime"] = startTime
 
         try:
-            response = self.session.get(url, params=params)
+            response = await self.session.get(url, params=params)
             response.raise_for_status()
             return response.json()
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             return {
                 "code": -1,
                 "msg": f"请求失败: {str(e)}",
@@ -1239,12 +1419,12 @@ class OriginalAPIClient:
                 "success": False
             }
 
-    def export_storage_records(self,
+    async def export_storage_records(self,
                                endTime: Optional[str] = None,
                                order: Optional[int] = None,
                                rankingType: Optional[int] = None,
                                recordStatus: Optional[int] = None,
-                               startTime: Optional[str] = None) -> bytes:
+                               startTime: Optional[str] = None) -> AsyncIterator[bytes]:
         """
         导出公共暂存记录
 
@@ -1256,7 +1436,7 @@ class OriginalAPIClient:
             startTime: 开始时间
 
         Returns:
-            bytes: 导出的文件内容
+            AsyncIterator[bytes]: 分块读取的导出文件内容
         """
         url = urljoin(self.base_url, "/qw/knife/web/from/mes/record/exportStorageRecord")
 
@@ -1275,10 +1455,10 @@ class OriginalAPIClient:
             params["startTime"] = startTime
 
         try:
-            response = self.session.get(url, params=params)
-            response.raise_for_status()
-            return response.content
-        except requests.RequestException as e:
+            # 流式读取上游文件，内存占用与文件大小无关
+            response = await self.session.open_stream(url, params=params)
+            return iter_stream(response)
+        except httpx.HTTPError as e:
             raise Exception(f"导出失败: {str(e)}")
 
 
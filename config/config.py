@@ -17,6 +17,152 @@ class Settings:
     
     # Token文件配置
     TOKEN_FILE_PATH: str = os.getenv("TOKEN_FILE_PATH", "token.txt")
+    # Token自动刷新：配置登录账号（密码为MD5）后按 expires_in 在过期前 TOKEN_REFRESH_MARGIN 秒重新登录，
+    # 未配置账号时刷新改为重新读取Token文件
+    MES_LOGIN_URL: str = os.getenv("MES_LOGIN_URL", "https://www.weiliansmartcabinet.com/api/blade-auth/oauth/token")
+    MES_USERNAME: str = os.getenv("MES_USERNAME", "")
+    MES_PASSWORD: str = os.getenv("MES_PASSWORD", "")
+    TOKEN_REFRESH_MARGIN: float = float(os.getenv("TOKEN_REFRESH_MARGIN", "300"))
+
+    # 上游连接池配置
+    UPSTREAM_TIMEOUT: float = float(os.getenv("UPSTREAM_TIMEOUT", "10"))
+    UPSTREAM_MAX_CONNECTIONS: int = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+    UPSTREAM_MAX_KEEPALIVE: int = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "20"))
+    UPSTREAM_KEEPALIVE_EXPIRY: float = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "30"))
+    # 并发的相同GET请求合并为一次上游调用
+    UPSTREAM_COALESCE_GET: bool = os.getenv("UPSTREAM_COALESCE_GET", "True").lower() == "true"
+    # 按接口配置延迟预算（秒），作为该接口的超时时间，格式：路径或路径末段=秒
+    # 例如 lendList=3,/qw/knife/web/from/mes/alarm/warning/statistics=2
+    UPSTREAM_LATENCY_BUDGETS: str = os.getenv("UPSTREAM_LATENCY_BUDGETS", "")
+    # 上游并发上限（各角色共用，超出时按优先级排队；0 表示不限制）
+    # 为一个服务所有 worker 的合计，每个进程取 1/UPSTREAM_LIMIT_PROCESSES，自适应的上下限同样分摊
+    UPSTREAM_CONCURRENCY_LIMIT: int = int(os.getenv("UPSTREAM_CONCURRENCY_LIMIT", "32"))
+    # 分摊上游并发上限的进程数，utils.launcher 启动时自动设置为 worker 数
+    UPSTREAM_LIMIT_PROCESSES: int = int(os.getenv("UPSTREAM_LIMIT_PROCESSES", "1"))
+    # 并发上限自适应（AIMD）：上限在 MIN~MAX 之间调整，耗时超过 LATENCY_TARGET 秒或出错时乘以 BACKOFF
+    UPSTREAM_ADAPTIVE_LIMIT: bool = os.getenv("UPSTREAM_ADAPTIVE_LIMIT", "True").lower() == "true"
+    UPSTREAM_MIN_CONCURRENCY: int = int(os.getenv("UPSTREAM_MIN_CONCURRENCY", "4"))
+    UPSTREAM_MAX_CONCURRENCY: int = int(os.getenv("UPSTREAM_MAX_CONCURRENCY", "100"))
+    UPSTREAM_LATENCY_TARGET: float = float(os.getenv("UPSTREAM_LATENCY_TARGET", "2"))
+    UPSTREAM_AIMD_BACKOFF: float = float(os.getenv("UPSTREAM_AIMD_BACKOFF", "0.7"))
+    # 幂等GET重试：总尝试次数（含第一次）、退避基数和单次上限（秒，全抖动）
+    UPSTREAM_RETRY_ATTEMPTS: int = int(os.getenv("UPSTREAM_RETRY_ATTEMPTS", "2"))
+    UPSTREAM_RETRY_BACKOFF: float = float(os.getenv("UPSTREAM_RETRY_BACKOFF", "0.1"))
+    UPSTREAM_RETRY_BACKOFF_MAX: float = float(os.getenv("UPSTREAM_RETRY_BACKOFF_MAX", "2"))
+    # 幂等GET对冲请求：超过接口耗时分位数仍未返回时再发一个请求，对冲比例不超过 MAX_RATE
+    UPSTREAM_HEDGE_ENABLED: bool = os.getenv("UPSTREAM_HEDGE_ENABLED", "False").lower() == "true"
+    UPSTREAM_HEDGE_QUANTILE: float = float(os.getenv("UPSTREAM_HEDGE_QUANTILE", "0.95"))
+    UPSTREAM_HEDGE_MAX_RATE: float = float(os.getenv("UPSTREAM_HEDGE_MAX_RATE", "0.05"))
+    UPSTREAM_HEDGE_MIN_SAMPLES: int = int(os.getenv("UPSTREAM_HEDGE_MIN_SAMPLES", "20"))
+    UPSTREAM_HEDGE_MIN_DELAY: float = float(os.getenv("UPSTREAM_HEDGE_MIN_DELAY", "0.05"))
+    # 导出文件流式转发的分块大小（字节）
+    UPSTREAM_STREAM_CHUNK_SIZE: int = int(os.getenv("UPSTREAM_STREAM_CHUNK_SIZE", "65536"))
+
+    # 上游熔断配置：连续失败次数达到阈值后熔断，熔断时长结束后放行少量试探请求
+    CIRCUIT_BREAKER_ENABLED: bool = os.getenv("CIRCUIT_BREAKER_ENABLED", "True").lower() == "true"
+    CIRCUIT_FAILURE_THRESHOLD: int = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+    CIRCUIT_OPEN_SECONDS: float = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))
+    CIRCUIT_HALF_OPEN_CALLS: int = int(os.getenv("CIRCUIT_HALF_OPEN_CALLS", "1"))
+
+    # 多进程共享状态（SQLite文件）：同机多个 worker 共用上游Token和响应缓存
+    SHARED_STATE_ENABLED: bool = os.getenv("SHARED_STATE_ENABLED", "True").lower() == "true"
+    SHARED_STATE_PATH: str = os.getenv("SHARED_STATE_PATH", "shared_state.db")
+    SHARED_STATE_BUSY_TIMEOUT: float = float(os.getenv("SHARED_STATE_BUSY_TIMEOUT", "2"))
+    # 共享缓存条目的保留时间（秒），应不小于最长的 TTL + RESPONSE_CACHE_STALE_TTL
+    SHARED_STATE_CACHE_RETENTION: float = float(os.getenv("SHARED_STATE_CACHE_RETENTION", "3600"))
+    # 共享缓存的进程内热点层：条目在该秒数内直接从内存返回，不读取共享库（其他 worker 的更新最多延迟这么久可见）
+    SHARED_STATE_LOCAL_TTL: float = float(os.getenv("SHARED_STATE_LOCAL_TTL", "1"))
+
+    # 统计类接口响应缓存配置
+    RESPONSE_CACHE_ENABLED: bool = os.getenv("RESPONSE_CACHE_ENABLED", "True").lower() == "true"
+    RESPONSE_CACHE_MAX_ENTRIES: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+    # 过期后仍可返回旧值的时长（秒），期间后台刷新
+    RESPONSE_CACHE_STALE_TTL: float = float(os.getenv("RESPONSE_CACHE_STALE_TTL", "600"))
+    # 按接口覆盖TTL，格式：endpoint=秒,endpoint=秒（例如 alarm_statistics=30,charts_lend_by_year=300）
+    RESPONSE_CACHE_TTLS: str = os.getenv("RESPONSE_CACHE_TTLS", "")
+
+    # 刀具耗材目录本地镜像配置
+    CUTTER_CATALOG_ENABLED: bool = os.getenv("CUTTER_CATALOG_ENABLED", "True").lower() == "true"
+    CUTTER_CATALOG_SYNC_INTERVAL: float = float(os.getenv("CUTTER_CATALOG_SYNC_INTERVAL", "60"))
+    CUTTER_CATALOG_PAGE_SIZE: int = int(os.getenv("CUTTER_CATALOG_PAGE_SIZE", "200"))
+    # 超过该时长未同步成功则回退为直接请求上游（秒）
+    CUTTER_CATALOG_MAX_STALENESS: float = float(os.getenv("CUTTER_CATALOG_MAX_STALENESS", "300"))
+
+    # 异步导出任务配置
+    EXPORT_JOB_DIR: str = os.getenv("EXPORT_JOB_DIR", "exports")
+    EXPORT_JOB_WORKERS: int = int(os.getenv("EXPORT_JOB_WORKERS", "2"))
+    # 导出文件有效期（秒），期间相同查询直接复用
+    EXPORT_JOB_TTL: float = float(os.getenv("EXPORT_JOB_TTL", "3600"))
+    # 进行中任务刷新状态文件和租约的间隔（秒），超过3个间隔未刷新视为所在进程已退出
+    EXPORT_JOB_HEARTBEAT: float = float(os.getenv("EXPORT_JOB_HEARTBEAT", "10"))
+
+    # 时间分片并发导出配置
+    SLICED_EXPORT_SLICE_DAYS: float = float(os.getenv("SLICED_EXPORT_SLICE_DAYS", "7"))
+    SLICED_EXPORT_CONCURRENCY: int = int(os.getenv("SLICED_EXPORT_CONCURRENCY", "4"))
+    SLICED_EXPORT_PAGE_SIZE: int = int(os.getenv("SLICED_EXPORT_PAGE_SIZE", "500"))
+    # 单次导出的时间分片数上限（超过时返回400）
+    SLICED_EXPORT_MAX_SLICES: int = int(os.getenv("SLICED_EXPORT_MAX_SLICES", "500"))
+
+    # 记录本地分析库配置（SQLite）
+    ANALYTICS_ENABLED: bool = os.getenv("ANALYTICS_ENABLED", "True").lower() == "true"
+    ANALYTICS_DB_PATH: str = os.getenv("ANALYTICS_DB_PATH", "analytics.db")
+    # 多个进程同时写入分析库时，等待写锁的最长秒数
+    ANALYTICS_BUSY_TIMEOUT: float = float(os.getenv("ANALYTICS_BUSY_TIMEOUT", "30"))
+    ANALYTICS_SYNC_INTERVAL: float = float(os.getenv("ANALYTICS_SYNC_INTERVAL", "60"))
+    # 增量同步时从水位向前回看的小时数，用于获取近期记录的状态变化（如还刀、收刀）
+    ANALYTICS_SYNC_LOOKBACK_HOURS: float = float(os.getenv("ANALYTICS_SYNC_LOOKBACK_HOURS", "72"))
+    ANALYTICS_PAGE_SIZE: int = int(os.getenv("ANALYTICS_PAGE_SIZE", "500"))
+    # 超过该时长未同步成功则回退为直接请求上游（秒）
+    ANALYTICS_MAX_STALENESS: float = float(os.getenv("ANALYTICS_MAX_STALENESS", "600"))
+    # 本地计算排行时返回的条数
+    ANALYTICS_RANKING_TOP_K: int = int(os.getenv("ANALYTICS_RANKING_TOP_K", "10"))
+    # 核对预聚合与原始记录条数的间隔（秒），不一致时重建；0 为不核对
+    ANALYTICS_VERIFY_INTERVAL: float = float(os.getenv("ANALYTICS_VERIFY_INTERVAL", "3600"))
+
+    # 接口准入控制（过载保护）：每个路由的并发处理数、最大排队数、最长排队秒数，
+    # 超过时返回 503，Retry-After 不小于 ADMISSION_RETRY_AFTER 秒
+    ADMISSION_ENABLED: bool = os.getenv("ADMISSION_ENABLED", "True").lower() == "true"
+    ADMISSION_ROUTE_CONCURRENCY: int = int(os.getenv("ADMISSION_ROUTE_CONCURRENCY", "64"))
+    ADMISSION_QUEUE_DEPTH: int = int(os.getenv("ADMISSION_QUEUE_DEPTH", "128"))
+    ADMISSION_MAX_WAIT: float = float(os.getenv("ADMISSION_MAX_WAIT", "5"))
+    ADMISSION_RETRY_AFTER: int = int(os.getenv("ADMISSION_RETRY_AFTER", "1"))
+
+    # 合并网关（gateway/main.py）挂载的角色，逗号分隔；只导入列出角色的路由和客户端
+    GATEWAY_ROLES: str = os.getenv("GATEWAY_ROLES", "teamleader,auditor,operator,administrator")
+
+    # 响应头 Server-Timing：准入排队、上游排队、上游请求、接口函数、响应模型校验、JSON序列化的耗时拆分
+    SERVER_TIMING_ENABLED: bool = os.getenv("SERVER_TIMING_ENABLED", "True").lower() == "true"
+
+    # 事件循环阻塞检测（默认关闭）：事件循环超过阈值（秒）未响应时记录阻塞的调用栈、路由和上游接口
+    LOOP_WATCHDOG_ENABLED: bool = os.getenv("LOOP_WATCHDOG_ENABLED", "False").lower() == "true"
+    LOOP_WATCHDOG_THRESHOLD: float = float(os.getenv("LOOP_WATCHDOG_THRESHOLD", "0.2"))
+    LOOP_WATCHDOG_INTERVAL: float = float(os.getenv("LOOP_WATCHDOG_INTERVAL", "0.05"))
+
+    # 日志：LOG_FORMAT 为 text 或 json；LOG_ASYNC 时经有界队列（LOG_QUEUE_SIZE 条）由后台线程写出，队列满时丢弃
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "text")
+    LOG_ASYNC: bool = os.getenv("LOG_ASYNC", "True").lower() == "true"
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    # 上游报文日志：单条最多 LOG_PAYLOAD_MAX_CHARS 字符；每个接口每秒 LOG_PAYLOAD_RATE 条，最多积累 LOG_PAYLOAD_BURST 条（0 表示不限速）
+    LOG_PAYLOAD_MAX_CHARS: int = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "2000"))
+    LOG_PAYLOAD_RATE: float = float(os.getenv("LOG_PAYLOAD_RATE", "1"))
+    LOG_PAYLOAD_BURST: int = int(os.getenv("LOG_PAYLOAD_BURST", "5"))
+
+    # OpenAPI 文档缓存：生成后保存到该目录，各 worker 和重启后的进程直接读取，模型定义变化时自动重新生成
+    OPENAPI_CACHE_ENABLED: bool = os.getenv("OPENAPI_CACHE_ENABLED", "True").lower() == "true"
+    OPENAPI_CACHE_DIR: str = os.getenv("OPENAPI_CACHE_DIR", "openapi_cache")
+
+    # 生产环境启动（utils/launcher.py）：worker 数（0 表示按可用CPU数）、事件循环（auto/asyncio/uvloop）、
+    # HTTP解析器（auto/h11/httptools）、监听队列长度、keep-alive 超时（应大于前置负载均衡的空闲超时）、
+    # 优雅退出时等待进行中请求的最长秒数、是否输出访问日志、信任 X-Forwarded-* 的代理地址
+    SERVER_WORKERS: int = int(os.getenv("SERVER_WORKERS", "0"))
+    SERVER_LOOP: str = os.getenv("SERVER_LOOP", "auto")
+    SERVER_HTTP: str = os.getenv("SERVER_HTTP", "auto")
+    SERVER_BACKLOG: int = int(os.getenv("SERVER_BACKLOG", "2048"))
+    SERVER_KEEPALIVE_TIMEOUT: int = int(os.getenv("SERVER_KEEPALIVE_TIMEOUT", "65"))
+    SERVER_GRACEFUL_TIMEOUT: int = int(os.getenv("SERVER_GRACEFUL_TIMEOUT", "30"))
+    SERVER_ACCESS_LOG: bool = os.getenv("SERVER_ACCESS_LOG", "False").lower() == "true"
+    SERVER_FORWARDED_ALLOW_IPS: str = os.getenv("SERVER_FORWARDED_ALLOW_IPS", "127.0.0.1")
 
     # 应用配置
     DEBUG: bool = os.getenv("DEBUG", "False").lower() == "true"
@@ -0,0 +1 @@
+# Gateway module
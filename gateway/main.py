@@ -0,0 +1,234 @@
+import sys
+import os
+import importlib
+import logging
+import traceback
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+# 将项目根目录添加到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.config import settings
+from utils.admission import AdmissionController, AdmissionMiddleware
+from utils.log_pipeline import setup_logging
+from utils.loop_watchdog import install_loop_watchdog
+from utils.metrics import install_metrics
+from utils.openapi_cache import install_openapi_cache
+from utils.server_timing import ServerTimingMiddleware
+
+# 日志：经队列由后台线程写出，级别和格式见 LOG_* 配置
+setup_logging()
+
+# 各角色的路径前缀（角色之间只通过前缀区分，互不重叠）
+TEAMLEADER_PREFIX = "/api/v1"               # 路由自带 /teamleader
+AUDITOR_PREFIX = "/api/v1/auditor"
+OPERATOR_PREFIX = "/api/v1/operator"
+ADMINISTRATOR_PREFIX = "/api/v1/administrator"
+
+# 角色 -> (路径前缀, [(路由模块, tags)])
+ROLE_ROUTERS = {
+    "teamleader": (TEAMLEADER_PREFIX, [("routers.teamleader_router", None)]),
+    "auditor": (AUDITOR_PREFIX, [("routers.auditor_router", None)]),
+    "operator": (OPERATOR_PREFIX, [("routers.operator_router", None)]),
+    "administrator": (ADMINISTRATOR_PREFIX, [
+        ("routers.data_router", ["数据接口"]),
+        ("administrator.routers.lend_record_router", ["借出记录"]),
+    ]),
+}
+
+
+def enabled_roles():
+    """GATEWAY_ROLES 中配置的角色（未知角色忽略）"""
+    roles = [role.strip() for role in settings.GATEWAY_ROLES.split(",") if role.strip()]
+    unknown = [role for role in roles if role not in ROLE_ROUTERS]
+    if unknown:
+        logger.warning("GATEWAY_ROLES 中的未知角色已忽略: %s", unknown)
+    return [role for role in roles if role in ROLE_ROUTERS]
+
+
+# 只导入启用角色的路由模块（及其客户端、模型），未启用的角色不占用启动时间和内存
+router_modules = {
+    role: [(importlib.import_module(module), tags) for module, tags in ROLE_ROUTERS[role][1]]
+    for role in enabled_roles()
+}
+
+
+def _role_clients():
+    """已启用角色的上游客户端 (角色, 客户端)（班组长、审计员的异步客户端）"""
+    for role, modules in router_modules.items():
+        for module, _ in modules:
+            client = getattr(module, "api_client", None)
+            if getattr(client, "token_provider", None) is not None:
+                yield role, client
+
+
+def _closable_clients():
+    """已启用角色中使用异步上游会话、退出时需要关闭的客户端（含没有Token刷新的管理员客户端）"""
+    clients = []
+    for modules in router_modules.values():
+        for module, _ in modules:
+            for name in ("api_client", "original_api_client"):
+                client = getattr(module, name, None)
+                if hasattr(client, "aclose") and all(client is not c for c in clients):
+                    clients.append(client)
+    return clients
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    应用生命周期：启动各角色的Token自动刷新和后台同步，退出时取消导出任务并关闭上游连接池
+
+    班组长、审计员和管理员客户端共用进程内的上游连接池、调度器和共享状态库，
+    最后一个客户端关闭时连接池才真正关闭；操作员的同步路由在线程池中执行，同样经过上游调度器
+    """
+    clients = [client for _, client in _role_clients()]
+    for client in clients:
+        client.token_provider.start()
+        for task_name in ("cutter_catalog", "analytics"):
+            task = getattr(client, task_name, None)
+            if task is not None:
+                task.start()
+    yield
+    for modules in router_modules.values():
+        for module, _ in modules:
+            export_jobs = getattr(module, "export_jobs", None)
+            if export_jobs is not None:
+                await export_jobs.aclose()
+    for client in _closable_clients():
+        await client.aclose()
+
+
+# 创建FastAPI应用实例
+app = FastAPI(
+    title="刀具管理系统 - 合并网关",
+    description="""
+    ## 合并网关服务
+
+    在一个进程内提供所有角色的接口，适合单机部署；各角色也可以继续单独启动。
+
+    ### 路径前缀：
+    - 班组长：`/api/v1/teamleader`
+    - 审计员：`/api/v1/auditor`
+    - 操作员：`/api/v1/operator`
+    - 管理员：`/api/v1/administrator`
+
+    ### 说明：
+    - 班组长、审计员接口路径与单独部署时相同；操作员、管理员接口增加了角色前缀
+    - 所有角色共用一个上游连接池、并发调度器和缓存库
+    - 端口：`8000`
+    """,
+    version="1.0.0",
+    contact={
+        "name": "刀具管理系统开发团队",
+        "email": "support@example.com",
+    },
+    license_info={
+        "name": "内部使用",
+    },
+    lifespan=lifespan,
+    openapi_tags=[
+        {
+            "name": "系统接口",
+            "description": "系统级别的接口，如健康检查等",
+        },
+    ]
+)
+
+# 接口准入控制：按路由（含角色前缀）限制并发和排队，过载时返回 503 + Retry-After
+admission = AdmissionController()
+app.add_middleware(AdmissionMiddleware, controller=admission)
+# Server-Timing 响应头（在准入控制之外，包含准入排队时间）
+app.add_middleware(ServerTimingMiddleware)
+
+# 事件循环阻塞检测（LOOP_WATCHDOG_ENABLED 时启用）
+install_loop_watchdog(app)
+
+# 包含路由
+for role, modules in router_modules.items():
+    for module, tags in modules:
+        app.include_router(module.router, prefix=ROLE_ROUTERS[role][0], tags=tags)
+
+# OpenAPI 文档按模型定义哈希缓存到磁盘，各 worker 共用
+install_openapi_cache(app, "gateway")
+
+# Prometheus 指标：按客户端方法的耗时分布、失败/超时、缓存命中、传输字节及各组件统计
+install_metrics(app, admission, clients=dict(_role_clients()))
+
+# 根路径路由
+@app.get("/", tags=["系统接口"], summary="服务根路径")
+async def root():
+    """
+    服务根路径，用于验证服务是否正常运行
+
+    **返回示例**:
+    ```json
+    {
+        "message": "合并网关服务已启动",
+        "status": "success",
+        "roles": {"teamleader": "/api/v1/teamleader", "...": "..."}
+    }
+    ```
+    """
+    return {
+        "message": "合并网关服务已启动",
+        "status": "success",
+        "roles": {
+            role: f"{TEAMLEADER_PREFIX}/teamleader" if role == "teamleader" else ROLE_ROUTERS[role][0]
+            for role in router_modules
+        }
+    }
+
+# 健康检查端点
+@app.get("/health", tags=["系统接口"], summary="健康检查")
+async def health_check():
+    """
+    服务健康检查接口
+
+    **用途**: 用于监控系统、负载均衡器等检查服务状态
+
+    **返回示例**:
+    ```json
+    {
+        "status": "healthy",
+        "service": "gateway"
+    }
+    ```
+    """
+    return {
+        "status": "healthy",
+        "service": "gateway"
+    }
+
+
+@app.exception_handler(Exception)
+async def global_exception_handler(request: Request, exc: Exception):
+    """全局异常处理器（与审计员服务一致）"""
+    logger.error("全局异常: %s", exc)
+    logger.error("请求URL: %s", request.url)
+    logger.error("请求方法: %s", request.method)
+    logger.error("异常堆栈: %s", traceback.format_exc())
+
+    return JSONResponse(
+        status_code=500,
+        content={
+            "code": 500,
+            "msg": f"服务器内部错误: {str(exc)}",
+            "success": False,
+            "data": None
+        }
+    )
+
+# 支持直接运行
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(
+        "gateway.main:app",
+        host="0.0.0.0",
+        port=8000,
+        reload=True
+    )
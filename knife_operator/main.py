@@ -5,8 +5,17 @@ from fastapi import FastAPI
 # 将项目根目录添加到 Python 路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from utils.admission import AdmissionController, AdmissionMiddleware
+from utils.log_pipeline import setup_logging
+from utils.loop_watchdog import install_loop_watchdog
+from utils.metrics import install_metrics
+from utils.openapi_cache import install_openapi_cache
+from utils.server_timing import ServerTimingMiddleware
 from routers.operator_router import router as operator_router
 
+# 日志：经队列由后台线程写出，级别和格式见 LOG_* 配置
+setup_logging()
+
 # 创建FastAPI应用实例
 app = FastAPI(
     title="刀具管理系统 - 操作员接口",
@@ -73,9 +82,24 @@ app = FastAPI(
     ]
 )
 
+# 接口准入控制：按路由限制并发和排队，过载时返回 503 + Retry-After
+admission = AdmissionController()
+app.add_middleware(AdmissionMiddleware, controller=admission)
+# Server-Timing 响应头（在准入控制之外，包含准入排队时间）
+app.add_middleware(ServerTimingMiddleware)
+
+# 事件循环阻塞检测（LOOP_WATCHDOG_ENABLED 时启用）
+install_loop_watchdog(app)
+
 # 包含路由（不再使用tags参数，因为每个路由已经在内部定义）
 app.include_router(operator_router, prefix="/api/v1")
 
+# OpenAPI 文档按模型定义哈希缓存到磁盘，各 worker 共用
+install_openapi_cache(app, "operator")
+
+# Prometheus 指标：按客户端方法的耗时分布、失败/超时、缓存命中、传输字节及各组件统计
+install_metrics(app, admission)
+
 # 根路径路由
 @app.get("/", tags=["系统接口"], summary="服务根路径")
 async def root():
@@ -1,17 +1,49 @@
 import requests
 import logging
+import time
 from typing import Dict, Any, Optional
 from datetime import datetime
 
+from utils.loop_watchdog import WatchedSession
+from utils.metrics import instrument_client, record_request, status_class
+from utils.server_timing import add_timing, add_upstream_timing
+from utils.upstream_scheduler import PRIORITY_OPERATOR, PRIORITY_WRITE, upstream_scheduler
+
 logger = logging.getLogger(__name__)
 
 
+class ScheduledSession(WatchedSession):
+    """经上游调度器排队的会话：归还、暂存等写操作最先放行，查询按操作员终端优先级"""
+
+    def request(self, method, url, *args, **kwargs):
+        priority = PRIORITY_OPERATOR if method.upper() == "GET" else PRIORITY_WRITE
+        queued = time.monotonic()
+        with upstream_scheduler.slot_sync(priority):
+            started = time.monotonic()
+            add_timing("upstream-queue", started - queued)
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                latency = time.monotonic() - started
+                add_upstream_timing(latency)
+                upstream_scheduler.record(latency, failed=True)
+                record_request(latency, "timeout" if isinstance(e, requests.exceptions.Timeout) else "error")
+                raise
+            latency = time.monotonic() - started
+            add_upstream_timing(latency)
+            upstream_scheduler.record(latency, failed=response.status_code >= 500)
+            record_request(latency, status_class(response.status_code),
+                           int(response.request.headers.get("Content-Length", 0)), len(response.content))
+            return response
+
+
+@instrument_client("operator")
 class OriginalAPIClient:
     """封装对原始API的调用"""
 
     def __init__(self, base_url: str, api_key: Optional[str] = None):
         self.base_url = base_url
-        self.session = requests.Session()
+        self.session = ScheduledSession()
         self.session.headers.update({
             "Content-Type": "application/json",
             "User-Agent": "Secondary-API-Wrapper/1.0"
@@ -159,7 +191,7 @@ class OriginalAPIClient:
             response.raise_for_status()  # 如果HTTP请求返回不成功状态码则抛出异常
             return response.json()
         except requests.exceptions.RequestException as e:
-            logger.error(f"获取用户数据失败: {e}")
+            logger.error("获取用户数据失败: %s", e)
             raise
 
     def get_user_posts(self, user_id: int) -> Dict[str, Any]:
@@ -169,7 +201,7 @@ class OriginalAPIClient:
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            logger.error(f"获取用户帖子失败: {e}")
+            logger.error("获取用户帖子失败: %s", e)
             raise
 
     def get_lend_records(self, params: Optional[Dict] = None) -> Dict[str, Any]:
@@ -218,7 +250,7 @@ class OriginalAPIClient:
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            logger.error(f"获取借出记录列表失败: {e}")
+            logger.error("获取借出记录列表失败: %s", e)
             raise
 
     def create_lend_record(self, lend_record_data: Dict) -> Dict[str, Any]:
@@ -276,7 +308,7 @@ class OriginalAPIClient:
             return response.json()
 
         except requests.exceptions.RequestException as e:
-            logger.error(f"创建借出记录失败: {e}")
+            logger.error("创建借出记录失败: %s", e)
             raise
 
     def process_batch_return(self, request_data: Dict) -> Dict[str, Any]:
@@ -350,7 +382,7 @@ class OriginalAPIClient:
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            logger.error(f"批量归还处理失败: {e}")
+            logger.error("批量归还处理失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"批量归还处理失败: {str(e)}",
@@ -433,7 +465,7 @@ class OriginalAPIClient:
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            logger.error(f"暂存刀头批量归还处理失败: {e}")
+            logger.error("暂存刀头批量归还处理失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"暂存刀头批量归还处理失败: {str(e)}",
@@ -506,7 +538,7 @@ class OriginalAPIClient:
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            logger.error(f"更新借出记录失败: {e}")
+            logger.error("更新借出记录失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"更新借出记录失败: {str(e)}",
@@ -568,7 +600,7 @@ class OriginalAPIClient:
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            logger.error(f"处理刀头归还失败: {e}")
+            logger.error("处理刀头归还失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"处理刀头归还失败: {str(e)}",
@@ -633,7 +665,7 @@ class OriginalAPIClient:
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            logger.error(f"处理刀头暂存失败: {e}")
+            logger.error("处理刀头暂存失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"处理刀头暂存失败: {str(e)}",
@@ -694,7 +726,7 @@ class OriginalAPIClient:
                 "data": data
             }
         except requests.exceptions.RequestException as e:
-            logger.error(f"获取借出记录详情失败: {e}")
+            logger.error("获取借出记录详情失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"获取借出记录详情失败: {str(e)}",
@@ -747,7 +779,7 @@ class OriginalAPIClient:
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            logger.error(f"获取刀柄借出记录列表失败: {e}")
+            logger.error("获取刀柄借出记录列表失败: %s", e)
             raise
 
     def create_handle_lend_record(self, handle_record_data: Dict) -> Dict[str, Any]:
@@ -791,7 +823,7 @@ class OriginalAPIClient:
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            logger.error(f"创建刀柄借出记录失败: {e}")
+            logger.error("创建刀柄借出记录失败: %s", e)
             raise
 
     def update_handle_lend_record(self, handle_id: int, handle_record_data: Dict, current_user: Dict) -> Dict[str, Any]:
@@ -850,7 +882,7 @@ class OriginalAPIClient:
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            logger.error(f"更新刀柄借出记录失败: {e}")
+            logger.error("更新刀柄借出记录失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"更新刀柄借出记录失败: {str(e)}",
@@ -895,7 +927,7 @@ class OriginalAPIClient:
                 "data": data
             }
         except requests.exceptions.RequestException as e:
-            logger.error(f"获取刀柄借出记录详情失败: {e}")
+            logger.error("获取刀柄借出记录详情失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"获取刀柄借出记录详情失败: {str(e)}",
@@ -973,7 +1005,7 @@ class OriginalAPIClient:
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            logger.error(f"刀柄批量归还处理失败: {e}")
+            logger.error("刀柄批量归还处理失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"刀柄批量归还处理失败: {str(e)}",
@@ -1035,7 +1067,7 @@ class OriginalAPIClient:
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            logger.error(f"处理刀柄归还失败: {e}")
+            logger.error("处理刀柄归还失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"处理刀柄归还失败: {str(e)}",
@@ -1088,7 +1120,7 @@ class OriginalAPIClient:
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            logger.error(f"处理刀柄暂存失败: {e}")
+            logger.error("处理刀柄暂存失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"处理刀柄暂存失败: {str(e)}",
@@ -1148,7 +1180,7 @@ class OriginalAPIClient:
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            logger.error(f"获取刀头暂存记录列表失败: {e}")
+            logger.error("获取刀头暂存记录列表失败: %s", e)
             raise
 
     def create_temp_store_record(self, temp_store_data: Dict) -> Dict[str, Any]:
@@ -1212,7 +1244,7 @@ class OriginalAPIClient:
             return response.json()
 
         except requests.exceptions.RequestException as e:
-            logger.error(f"创建暂存记录失败: {e}")
+            logger.error("创建暂存记录失败: %s", e)
             raise
 
     def get_handle_temp_store_records(self, params: Optional[Dict] = None) -> Dict[str, Any]:
@@ -1265,7 +1297,7 @@ class OriginalAPIClient:
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            logger.error(f"获取刀柄暂存记录列表失败: {e}")
+            logger.error("获取刀柄暂存记录列表失败: %s", e)
             raise
 
     def create_handle_temp_store_record(self, handle_temp_store_data: Dict) -> Dict[str, Any]:
@@ -1327,7 +1359,7 @@ class OriginalAPIClient:
             return response.json()
 
         except requests.exceptions.RequestException as e:
-            logger.error(f"创建刀柄暂存记录失败: {e}")
+            logger.error("创建刀柄暂存记录失败: %s", e)
             raise
 
     def process_handle_temp_store_batch_return(self, request_data: Dict) -> Dict[str, Any]:
@@ -1459,7 +1491,7 @@ class OriginalAPIClient:
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            logger.error(f"刀柄暂存批量归还处理失败: {e}")
+            logger.error("刀柄暂存批量归还处理失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"刀柄暂存批量归还处理失败: {str(e)}",
@@ -1531,7 +1563,7 @@ class OriginalAPIClient:
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            logger.error(f"更新刀柄暂存记录失败: {e}")
+            logger.error("更新刀柄暂存记录失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"更新刀柄暂存记录失败: {str(e)}",
@@ -1600,7 +1632,7 @@ class OriginalAPIClient:
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            logger.error(f"刀柄暂存归还失败: {e}")
+            logger.error("刀柄暂存归还失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"刀柄暂存归还失败: {str(e)}",
@@ -1697,7 +1729,7 @@ class OriginalAPIClient:
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            logger.error(f"创建刀柄暂存失败: {e}")
+            logger.error("创建刀柄暂存失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"创建刀柄暂存失败: {str(e)}",
@@ -1743,7 +1775,7 @@ class OriginalAPIClient:
                 "data": data
             }
         except requests.exceptions.RequestException as e:
-            logger.error(f"获取刀柄暂存记录详情失败: {e}")
+            logger.error("获取刀柄暂存记录详情失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"获取刀柄暂存记录详情失败: {str(e)}",
@@ -9,6 +9,10 @@ logger = logging.getLogger(__name__)
 
 # 导入所需的模块
 from auditor.services.api_client import original_api_client as api_client
+from routers.export_routes import build_export_router
+from utils.http_client import UpstreamStreamingResponse
+from utils.log_pipeline import log_payload
+from utils.server_timing import TimedRoute
 from auditor.schemas.data_schemas import (
     StorageStatisticsResponse,
     ChartsResponse,
@@ -27,10 +31,13 @@ from auditor.schemas.data_schemas import (
     AlarmStatisticsResponse,
     ThresholdSettingRequest,
     ExportReplenishRecordRequest,
-    ExportStorageRecordRequest
+    ExportStorageRecordRequest,
+    ExportJobRequest,
+    ExportJobResponse
 )
 
-router = APIRouter()
+# TimedRoute：Server-Timing 中拆分响应模型校验和JSON序列化耗时
+router = APIRouter(route_class=TimedRoute)
 
 
 # 测试接口
@@ -105,12 +112,12 @@ async def get_storage_statistics(
         }
 
         # 调用API客户端方法获取数据
-        result = api_client.get_storage_statistics(params)
+        result = await api_client.get_storage_statistics(params)
 
         return result
 
     except Exception as e:
-        logger.error(f"获取出入库统计数据失败: {str(e)}")
+        logger.error("获取出入库统计数据失败: %s", e)
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"获取出入库统计数据失败: {str(e)}")
 
@@ -193,27 +200,29 @@ async def export_stock_record(
         }
 
         # 调用API客户端方法获取导出数据
-        result = api_client.export_stock_record(params)
+        result = await api_client.export_stock_record(params)
 
         return result
 
     except Exception as e:
-        logger.error(f"导出出入库记录失败: {str(e)}")
+        logger.error("导出出入库记录失败: %s", e)
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"导出出入库记录失败: {str(e)}")
 
 
 # ==================== 统计图表接口 ====================
 @router.get("/charts-lend-by-year", response_model=ChartsResponse, tags=["统计图表"])
-async def get_charts_lend_by_year():
+async def get_charts_lend_by_year(
+        year: Optional[int] = Query(None, ge=2000, le=2100, description="年份，默认当年")
+):
     """
     获取全年取刀数量统计
 
-    功能：查询全年（12个月）的取刀数量统计数据
+    功能：查询全年（12个月）的取刀数量统计数据，本地分析库已同步时由按月汇总提供，否则查询外部接口
     封装外部接口：/qw/knife/web/from/mes/statistics/chartsLendByYear
 
     请求参数：
-    - 无
+    - year: 年份（可选，默认当年）
 
     返回数据：
     - code: 状态码
@@ -243,24 +252,26 @@ async def get_charts_lend_by_year():
     """
     try:
         # 调用API客户端方法获取数据
-        result = api_client.get_charts_lend_by_year()
+        result = await api_client.get_charts_lend_by_year(year)
         return result
     except Exception as e:
-        logger.error(f"获取全年取刀数量统计失败: {str(e)}")
+        logger.error("获取全年取刀数量统计失败: %s", e)
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"获取全年取刀数量统计失败: {str(e)}")
 
 
 @router.get("/charts-lend-price-by-year", response_model=ChartsResponse, tags=["统计图表"])
-async def get_charts_lend_price_by_year():
+async def get_charts_lend_price_by_year(
+        year: Optional[int] = Query(None, ge=2000, le=2100, description="年份，默认当年")
+):
     """
     获取全年取刀金额统计
 
-    功能：查询全年（12个月）的取刀金额统计数据
+    功能：查询全年（12个月）的取刀金额统计数据，本地分析库已同步时由按月汇总提供，否则查询外部接口
     封装外部接口：/qw/knife/web/from/mes/statistics/chartsLendPriceByYear
 
     请求参数：
-    - 无
+    - year: 年份（可选，默认当年）
 
     返回数据：
     - code: 状态码
@@ -291,10 +302,10 @@ async def get_charts_lend_price_by_year():
     """
     try:
         # 调用API客户端方法获取数据
-        result = api_client.get_charts_lend_price_by_year()
+        result = await api_client.get_charts_lend_price_by_year(year)
         return result
     except Exception as e:
-        logger.error(f"获取全年取刀金额统计失败: {str(e)}")
+        logger.error("获取全年取刀金额统计失败: %s", e)
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"获取全年取刀金额统计失败: {str(e)}")
 
@@ -375,10 +386,10 @@ async def get_charts_accumulated():
     """
     try:
         # 调用API客户端方法获取数据
-        result = api_client.get_charts_accumulated()
+        result = await api_client.get_charts_accumulated()
         return result
     except Exception as e:
-        logger.error(f"获取刀具消耗统计失败: {str(e)}")
+        logger.error("获取刀具消耗统计失败: %s", e)
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"获取刀具消耗统计失败: {str(e)}")
 
@@ -507,12 +518,12 @@ async def get_total_stock(
         }
 
         # 调用API客户端方法获取数据
-        result = api_client.get_total_stock_list(params)
+        result = await api_client.get_total_stock_list(params)
 
         return result
 
     except Exception as e:
-        logger.error(f"获取总库存统计列表失败: {str(e)}")
+        logger.error("获取总库存统计列表失败: %s", e)
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"获取总库存统计列表失败: {str(e)}")
 
@@ -578,12 +589,12 @@ async def get_stock_location_detail(stock_id: int):
     """
     try:
         # 调用API客户端方法获取数据
-        result = api_client.get_stock_location_by_id(stock_id)
+        result = await api_client.get_stock_location_by_id(stock_id)
 
         return result
 
     except Exception as e:
-        logger.error(f"获取库位详情失败: {str(e)}")
+        logger.error("获取库位详情失败: %s", e)
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"获取库位详情失败: {str(e)}")
 
@@ -706,12 +717,12 @@ async def get_waste_knife_recycle(
         }
 
         # 调用API客户端方法获取数据
-        result = api_client.get_waste_knife_recycle_info(params)
+        result = await api_client.get_waste_knife_recycle_info(params)
 
         return result
 
     except Exception as e:
-        logger.error(f"获取废刀回收统计信息失败: {str(e)}")
+        logger.error("获取废刀回收统计信息失败: %s", e)
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"获取废刀回收统计信息失败: {str(e)}")
 
@@ -755,7 +766,7 @@ async def get_device_ranking(
         - usage_efficiency: 使用效率
     """
     try:
-        logger.info(f"调用设备用刀排行接口，参数: {locals()}")
+        logger.info("调用设备用刀排行接口，参数: %s", locals())
         params = {
             "startTime": start_time,
             "endTime": end_time,
@@ -764,12 +775,12 @@ async def get_device_ranking(
             "recordStatus": record_status
         }
 
-        result = api_client.get_device_ranking(params)
-        logger.info(f"设备用刀排行返回结果: {result}")
+        result = await api_client.get_device_ranking(params)
+        log_payload(logger, "设备用刀排行返回结果", result)
         return result
 
     except Exception as e:
-        logger.error(f"获取设备用刀排行失败: {str(e)}")
+        logger.error("获取设备用刀排行失败: %s", e)
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"获取设备用刀排行失败: {str(e)}")
 
@@ -821,10 +832,10 @@ async def get_knife_model_ranking(
             "recordStatus": record_status
         }
 
-        return api_client.get_knife_model_ranking(params)
+        return await api_client.get_knife_model_ranking(params)
 
     except Exception as e:
-        logger.error(f"获取刀具型号排行失败: {str(e)}")
+        logger.error("获取刀具型号排行失败: %s", e)
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"获取刀具型号排行失败: {str(e)}")
 
@@ -875,10 +886,10 @@ async def get_employee_ranking(
             "recordStatus": record_status
         }
 
-        return api_client.get_employee_ranking(params)
+        return await api_client.get_employee_ranking(params)
 
     except Exception as e:
-        logger.error(f"获取员工领刀排行失败: {str(e)}")
+        logger.error("获取员工领刀排行失败: %s", e)
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"获取员工领刀排行失败: {str(e)}")
 
@@ -929,10 +940,10 @@ async def get_error_return_ranking(
             "recordStatus": record_status
         }
 
-        return api_client.get_error_return_ranking(params)
+        return await api_client.get_error_return_ranking(params)
 
     except Exception as e:
-        logger.error(f"获取异常还刀排行失败: {str(e)}")
+        logger.error("获取异常还刀排行失败: %s", e)
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"获取异常还刀排行失败: {str(e)}")
 
@@ -972,7 +983,7 @@ async def get_lend_record_list(
     Returns:
         LendRecordResponse: 领刀记录列表响应
     """
-    result = api_client.get_lend_records(
+    result = await api_client.get_lend_records(
         current=current,
         size=size,
         keyword=keyword,
@@ -1006,10 +1017,10 @@ async def export_lend_records(
         startTime: 开始时间
 
     Returns:
-        Response: 包含导出文件的响应
+        StreamingResponse: 分块转发上游导出文件的响应
     """
     try:
-        file_content = api_client.export_lend_records(
+        file_stream = await api_client.export_lend_records(
             endTime=endTime,
             order=order,
             rankingType=rankingType,
@@ -1017,8 +1028,8 @@ async def export_lend_records(
             startTime=startTime
         )
 
-        return Response(
-            content=file_content,
+        return UpstreamStreamingResponse(
+            file_stream,
             media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             headers={
                 "Content-Disposition": "attachment; filename=lend_records.xlsx"
@@ -1064,7 +1075,7 @@ async def list_alarm_warning(
     Returns:
         AlarmWarningResponse: 告警预警列表响应
     """
-    result = api_client.list_alarm_warning(
+    result = await api_client.list_alarm_warning(
         locSurplus=loc_surplus,
         alarmLevel=alarm_level,
         deviceType=device_type,
@@ -1086,7 +1097,7 @@ async def get_alarm_statistics():
     Returns:
         AlarmStatisticsResponse: 告警统计信息响应
     """
-    result = api_client.get_alarm_statistics()
+    result = await api_client.get_alarm_statistics()
 
     return result
 
@@ -1104,7 +1115,7 @@ async def update_alarm_threshold(
     Returns:
         Response: 更新结果响应
     """
-    result = api_client.update_alarm_threshold(
+    result = await api_client.update_alarm_threshold(
         locSurplus=request.locSurplus,
         alarmThreshold=request.alarmThreshold
     )
@@ -1129,7 +1140,7 @@ async def handle_alarm_warning(
     Returns:
         Response: 处理结果响应
     """
-    result = api_client.handle_alarm_warning(
+    result = await api_client.handle_alarm_warning(
         id=alarm_id,
         handleStatus=handle_status,
         handleRemark=handle_remark
@@ -1155,7 +1166,7 @@ async def batch_handle_alarm_warning(
     Returns:
         Response: 处理结果响应
     """
-    result = api_client.batch_handle_alarm_warning(
+    result = await api_client.batch_handle_alarm_warning(
         ids=ids,
         handleStatus=handle_status,
         handleRemark=handle_remark
@@ -1185,10 +1196,10 @@ async def export_alarm_warning(
         handle_status: 处理状态
 
     Returns:
-        Response: 包含导出文件的响应
+        StreamingResponse: 分块转发上游导出文件的响应
     """
     try:
-        file_content = api_client.export_alarm_warning(
+        file_stream = await api_client.export_alarm_warning(
             locSurplus=loc_surplus,
             alarmLevel=alarm_level,
             deviceType=device_type,
@@ -1197,8 +1208,8 @@ async def export_alarm_warning(
             handleStatus=handle_status
         )
 
-        return Response(
-            content=file_content,
+        return UpstreamStreamingResponse(
+            file_stream,
             media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             headers={
                 "Content-Disposition": "attachment; filename=alarm_warnings.xlsx"
@@ -1267,7 +1278,7 @@ async def get_replenish_record_list(
             - tenantId: 租户ID
             - isDeleted: 是否已删除
     """
-    result = api_client.get_replenish_records(
+    result = await api_client.get_replenish_records(
         current=current,
         endTime=end_time,
         order=order,
@@ -1299,7 +1310,7 @@ async def export_replenish_records(
         start_time: 开始时间
 
     Returns:
-        Response: 包含导出文件的响应，Excel文件包含以下字段：
+        StreamingResponse: 分块转发上游导出文件的响应，Excel文件包含以下字段：
             - lendUserName: 取出人
             - storageUserName: 暂存人
             - brandName: 品牌名称
@@ -1327,7 +1338,7 @@ async def export_replenish_records(
             - isDeleted: 是否已删除
     """
     try:
-        file_content = api_client.export_replenish_records(
+        file_stream = await api_client.export_replenish_records(
             endTime=end_time,
             order=order,
             rankingType=ranking_type,
@@ -1335,8 +1346,8 @@ async def export_replenish_records(
             startTime=start_time
         )
 
-        return Response(
-            content=file_content,
+        return UpstreamStreamingResponse(
+            file_stream,
             media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             headers={
                 "Content-Disposition": "attachment; filename=replenish_records.xlsx"
@@ -1380,7 +1391,7 @@ async def get_storage_record_list(
     Returns:
         StorageRecordModelResponse: 公共暂存记录列表响应
     """
-    result = api_client.get_storage_records(
+    result = await api_client.get_storage_records(
         current=current,
         endTime=end_time,
         order=order,
@@ -1412,10 +1423,10 @@ async def export_storage_records(
         start_time: 开始时间
 
     Returns:
-        Response: 包含导出文件的响应
+        StreamingResponse: 分块转发上游导出文件的响应
     """
     try:
-        file_content = api_client.export_storage_records(
+        file_stream = await api_client.export_storage_records(
             endTime=end_time,
             order=order,
             rankingType=ranking_type,
@@ -1423,8 +1434,8 @@ async def export_storage_records(
             startTime=start_time
         )
 
-        return Response(
-            content=file_content,
+        return UpstreamStreamingResponse(
+            file_stream,
             media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             headers={
                 "Content-Disposition": "attachment; filename=storage_records.xlsx"
@@ -1439,4 +1450,11 @@ async def export_storage_records(
                 "success": False
             }, ensure_ascii=False),
             media_type="application/json"
-        )
\ No newline at end of file
+        )
+
+
+# ==================== 异步导出任务与时间分片导出 ====================
+export_router, export_jobs = build_export_router(
+    "auditor", api_client, ExportJobRequest, ExportJobResponse, tag="导出任务"
+)
+router.include_router(export_router)
@@ -1,11 +1,14 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
 from typing import List, Optional
+import asyncio
 import time
 
 from administrator.services.api_client import original_api_client
 from administrator.schemas.data_schemas import EnhancedUserResponse, OriginalUserResponse
+from utils.server_timing import TimedRoute
 
-router = APIRouter()
+# TimedRoute：Server-Timing 中拆分响应模型校验和JSON序列化耗时
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.get("/users/{user_id}", response_model=EnhancedUserResponse)
@@ -17,9 +20,11 @@ async def get_enhanced_user_data(user_id: int):
     - 进行数据整合和增强
     """
     try:
-        # 并行获取用户数据和帖子数据（在实际应用中可以使用异步优化）
-        user_data = original_api_client.get_user_data(user_id)
-        user_posts = original_api_client.get_user_posts(user_id)
+        # 并行获取用户数据和帖子数据
+        user_data, user_posts = await asyncio.gather(
+            original_api_client.get_user_data(user_id),
+            original_api_client.get_user_posts(user_id)
+        )
 
         # 在这里进行你的二次封装逻辑
         enhanced_data = {
@@ -47,7 +52,7 @@ async def get_original_user_data(user_id: int):
     直接返回从原始API获取的用户数据（示例：直接透传）
     """
     try:
-        user_data = original_api_client.get_user_data(user_id)
+        user_data = await original_api_client.get_user_data(user_id)
         return user_data
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取原始数据失败: {str(e)}")
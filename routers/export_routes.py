@@ -0,0 +1,223 @@
+"""
+导出任务与时间分片导出路由
+班组长和审计员共用的导出接口：异步导出任务（提交/查询/下载）和时间分片并发导出，
+按角色生成各自的路由、任务管理器和文档标签
+"""
+import json
+import os
+from typing import Any, Optional, Tuple, Type
+
+from fastapi import APIRouter, Body, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel
+
+from config.config import settings
+from utils.export_jobs import ExportJob, ExportJobManager, JOB_DONE
+from utils.server_timing import TimedRoute
+from utils.sliced_export import (
+    EXPORT_COLUMNS, MIN_SLICE_DAYS, SlicedExport, split_time_range, write_csv, write_xlsx
+)
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# 导出任务允许的查询参数
+RECORD_EXPORT_FIELDS = ("startTime", "endTime", "order", "rankingType", "recordStatus")
+ALARM_EXPORT_FIELDS = ("locSurplus", "alarmLevel", "deviceType", "cabinetCode", "brandName", "handleStatus")
+
+
+def _error_response(e: Exception) -> Response:
+    return Response(
+        content=json.dumps({
+            "code": -1,
+            "msg": f"导出失败: {str(e)}",
+            "data": None,
+            "success": False
+        }, ensure_ascii=False),
+        media_type="application/json"
+    )
+
+
+def build_export_router(role: str, api_client: Any, request_model: Type[BaseModel],
+                        response_model: Type[BaseModel], tag: str) -> Tuple[APIRouter, ExportJobManager]:
+    """
+    生成某个角色的导出路由
+
+    参数：
+        role: 角色名，用于导出文件目录和路由名称（合并网关中各角色的下载地址互不冲突）
+        api_client: 角色的API客户端，需提供 export_* 导出方法和 get_*_records 分页列表方法
+        request_model/response_model: 角色的导出任务请求、响应模型
+        tag: 文档标签
+    返回：
+        (路由, 导出任务管理器)；任务管理器需在应用退出时 aclose()
+    """
+    router = APIRouter(route_class=TimedRoute)
+    export_jobs = ExportJobManager(os.path.join(settings.EXPORT_JOB_DIR, role))
+    download_route = f"{role}_download_export_job"
+
+    # 导出类型 -> (客户端导出方法, 下载文件名, 允许的查询参数)
+    export_job_types = {
+        "lend": (api_client.export_lend_records, "lend_records.xlsx", RECORD_EXPORT_FIELDS),
+        "replenish": (api_client.export_replenish_records, "replenish_records.xlsx", RECORD_EXPORT_FIELDS),
+        "storage": (api_client.export_storage_records, "storage_records.xlsx", RECORD_EXPORT_FIELDS),
+        "alarm": (api_client.export_alarm_warning, "alarm_warnings.xlsx", ALARM_EXPORT_FIELDS),
+    }
+    # 导出类型 -> (分页列表方法, 下载文件名前缀)
+    sliced_export_types = {
+        "lend": (api_client.get_lend_records, "lend_records"),
+        "replenish": (api_client.get_replenish_records, "replenish_records"),
+        "storage": (api_client.get_storage_records, "storage_records"),
+    }
+
+    def export_job_response(request: Request, job: ExportJob, msg: str = "操作成功") -> dict:
+        data = job.to_dict()
+        if job.status == JOB_DONE:
+            data["downloadUrl"] = str(request.url_for(download_route, job_id=job.job_id))
+        return {
+            "code": 200,
+            "msg": msg,
+            "success": True,
+            "data": data
+        }
+
+    @router.post("/export_jobs", response_model=response_model, tags=[tag])
+    async def submit_export_job(request: Request, job_request: request_model = Body(...)):
+        """
+        提交异步导出任务
+
+        适用于耗时较长的导出：提交后立即返回任务ID，通过任务状态接口轮询进度，
+        完成后从 downloadUrl 下载。相同查询在有效期内复用已生成的文件
+
+        Args:
+            job_request: 导出类型（lend/replenish/storage/alarm）及对应的查询参数
+
+        Returns:
+            ExportJobResponse: 任务状态
+        """
+        if job_request.exportType not in export_job_types:
+            raise HTTPException(
+                status_code=400,
+                detail=f"不支持的导出类型: {job_request.exportType}，可选: {', '.join(export_job_types)}"
+            )
+        export_method, filename, fields = export_job_types[job_request.exportType]
+
+        # 只保留该导出类型支持的参数
+        params = {k: v for k, v in job_request.model_dump().items() if k in fields and v is not None}
+
+        job = await export_jobs.submit(
+            job_request.exportType,
+            params,
+            lambda: export_method(**params),
+            filename=filename,
+            scope=api_client.session.identity_scope()
+        )
+        return export_job_response(request, job, msg="导出任务已提交")
+
+    @router.get("/export_jobs/{job_id}", response_model=response_model, tags=[tag])
+    async def get_export_job(request: Request, job_id: str):
+        """
+        查询异步导出任务状态
+
+        Args:
+            job_id: 任务ID
+
+        Returns:
+            ExportJobResponse: 任务状态（pending/running/done/failed）及已写入字节数
+        """
+        job = await export_jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="导出任务不存在或已过期")
+        return export_job_response(request, job)
+
+    @router.get("/export_jobs/{job_id}/download", name=download_route, tags=[tag])
+    async def download_export_job(job_id: str):
+        """
+        下载异步导出任务生成的文件
+
+        Args:
+            job_id: 任务ID
+
+        Returns:
+            FileResponse: 导出文件
+        """
+        job = await export_jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="导出任务不存在或已过期")
+        if job.status != JOB_DONE:
+            raise HTTPException(status_code=409, detail=f"导出任务尚未完成，当前状态: {job.status}")
+        return FileResponse(job.path, media_type=XLSX_MEDIA_TYPE, filename=job.filename)
+
+    @router.get("/export_sliced", tags=[tag])
+    async def export_sliced_records(
+            exportType: str = Query(..., description="导出类型：lend 领刀记录, replenish 补货记录, storage 公共暂存记录"),
+            startTime: str = Query(..., description="开始时间（YYYY-MM-DD HH:mm:ss 或 YYYY-MM-DD）"),
+            endTime: str = Query(..., description="结束时间（YYYY-MM-DD HH:mm:ss 或 YYYY-MM-DD）"),
+            recordStatus: Optional[int] = Query(None, description="0: 取刀 1: 还刀 2: 收刀 3: 暂存 4: 完成 5：违规还刀"),
+            fileFormat: str = Query("xlsx", description="文件格式：csv 或 xlsx"),
+            sliceDays: Optional[float] = Query(None, ge=MIN_SLICE_DAYS,
+                                              description="每个时间分片的天数（不小于1小时），默认取配置")
+    ):
+        """
+        时间分片并发导出
+
+        将时间区间拆分为多个分片，并发分页拉取列表接口，按时间先后合并后直接生成文件流，
+        适用于时间跨度较长、上游导出接口过慢的场景。结果按时间分片先后排列
+
+        Args:
+            exportType: 导出类型
+            startTime: 开始时间
+            endTime: 结束时间
+            recordStatus: 记录状态
+            fileFormat: 文件格式 csv/xlsx
+            sliceDays: 每个时间分片的天数
+
+        Returns:
+            StreamingResponse: 边拉取边输出的导出文件
+        """
+        if exportType not in sliced_export_types:
+            raise HTTPException(
+                status_code=400,
+                detail=f"不支持的导出类型: {exportType}，可选: {', '.join(sliced_export_types)}"
+            )
+        if fileFormat not in ("csv", "xlsx"):
+            raise HTTPException(status_code=400, detail="文件格式只支持 csv 或 xlsx")
+        try:
+            ranges = split_time_range(startTime, endTime, sliceDays or settings.SLICED_EXPORT_SLICE_DAYS)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"时间参数错误: {str(e)}")
+
+        list_method, filename = sliced_export_types[exportType]
+
+        async def fetch_page(current: int, size: int, slice_start: str, slice_end: str):
+            return await list_method(
+                current=current,
+                size=size,
+                startTime=slice_start,
+                endTime=slice_end,
+                recordStatus=recordStatus
+            )
+
+        try:
+            export = SlicedExport(fetch_page, ranges)
+            # 先拉取各分片首页，上游异常时返回JSON错误而不是残缺文件
+            await export.prepare()
+        except Exception as e:
+            return _error_response(e)
+
+        columns = EXPORT_COLUMNS[exportType]
+        if fileFormat == "csv":
+            stream = write_csv(export.records(), columns)
+            media_type = "text/csv; charset=utf-8"
+        else:
+            stream = write_xlsx(export.records(), columns)
+            media_type = XLSX_MEDIA_TYPE
+
+        return StreamingResponse(
+            stream,
+            media_type=media_type,
+            headers={
+                "Content-Disposition": f"attachment; filename={filename}.{fileFormat}",
+                "X-Total-Count": str(export.total)
+            }
+        )
+
+    return router, export_jobs
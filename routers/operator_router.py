@@ -5,6 +5,7 @@ from typing import Optional, Dict, Any
 
 # 导入所需的模块
 from knife_operator.services.api_client import OriginalAPIClient
+from utils.server_timing import TimedRoute
 from knife_operator.schemas.data_schemas import (
     LendRecordListResponse,
     CreateLendRecordRequest,
@@ -38,10 +39,13 @@ from knife_operator.schemas.data_schemas import (
 # 创建API客户端实例
 api_client = OriginalAPIClient(base_url="mock")
 
-router = APIRouter()
+# TimedRoute：Server-Timing 中拆分响应模型校验和JSON序列化耗时
+# 操作员客户端使用同步 requests 会话，路由定义为普通函数，由 FastAPI 放到线程池执行：
+# 上游调度器名额用满时在工作线程中排队等待，不阻塞事件循环，也不会绕过优先级直接放行
+router = APIRouter(route_class=TimedRoute)
 
 @router.get("/temp-store-records", response_model=TempStoreRecordListResponse)
-async def get_temp_store_records(
+def get_temp_store_records(
     temp_store_code: Optional[str] = Query(None, alias="tempStoreCode", description="暂存单号"),
     store_person: Optional[str] = Query(None, alias="storePerson", description="暂存人"),
     store_person_code: Optional[str] = Query(None, alias="storePersonCode", description="暂存人编号"),
@@ -91,7 +95,7 @@ async def get_temp_store_records(
         raise HTTPException(status_code=500, detail=f"获取刀头暂存记录列表失败: {str(e)}")
 
 @router.post("/temp-store-records", status_code=201, response_model=BaseResponse)
-async def create_temp_store_record(
+def create_temp_store_record(
     temp_store: CreateTempStoreRequest = Body(...)
 ):
     """
@@ -131,7 +135,7 @@ async def create_temp_store_record(
         raise HTTPException(status_code=500, detail=f"创建刀头暂存记录失败: {str(e)}")
 
 @router.get("/lend-records", response_model=LendRecordListResponse)
-async def get_lend_records(
+def get_lend_records(
     lend_code: Optional[str] = Query(None, alias="lendCode", description="借出单号"),
     lend_user: Optional[str] = Query(None, alias="lendUser", description="借出人"),
     brand_code: Optional[str] = Query(None, alias="brandCode", description="品牌"),
@@ -178,7 +182,7 @@ async def get_lend_records(
         raise HTTPException(status_code=500, detail=f"获取借出记录列表失败: {str(e)}")
 
 @router.post("/lend-records", status_code=201)
-async def create_lend_record(
+def create_lend_record(
     lend_record: CreateLendRecordRequest = Body(...)
 ):
     """
@@ -194,7 +198,7 @@ async def create_lend_record(
         raise HTTPException(status_code=500, detail=f"创建借出记录失败: {str(e)}")
 
 @router.post("/batch-return", response_model=BatchReturnResponse)
-async def batch_return_knife_heads(
+def batch_return_knife_heads(
     request: BatchReturnRequest = Body(...)
 ):
     """
@@ -211,7 +215,7 @@ async def batch_return_knife_heads(
         raise HTTPException(status_code=500, detail=f"批量归还处理失败: {str(e)}")
 
 @router.post("/temp-store-batch-return", response_model=BatchReturnResponse)
-async def temp_store_batch_return_knife_heads(
+def temp_store_batch_return_knife_heads(
     request: TempStoreBatchReturnRequest = Body(...)
 ):
     """
@@ -228,7 +232,7 @@ async def temp_store_batch_return_knife_heads(
         raise HTTPException(status_code=500, detail=f"暂存刀头批量归还处理失败: {str(e)}")
 
 @router.put("/lend-records/{borrow_id}", response_model=BaseResponse)
-async def update_borrow_record(
+def update_borrow_record(
     borrow_id: int,
     request: UpdateBorrowRequest = Body(...)
 ):
@@ -246,7 +250,7 @@ async def update_borrow_record(
         raise HTTPException(status_code=500, detail=f"更新借出记录失败: {str(e)}")
 
 @router.post("/return", response_model=BatchReturnResponse)
-async def return_knife_head(
+def return_knife_head(
     request: ReturnRequest = Body(...)
 ):
     """
@@ -263,7 +267,7 @@ async def return_knife_head(
         raise HTTPException(status_code=500, detail=f"归还刀头处理失败: {str(e)}")
 
 @router.post("/temp-store", response_model=BaseResponse)
-async def temp_store_knife_head(
+def temp_store_knife_head(
     request: TempStoreRequest = Body(...)
 ):
     """
@@ -281,7 +285,7 @@ async def temp_store_knife_head(
         raise HTTPException(status_code=500, detail=f"暂存刀头处理失败: {str(e)}")
 
 @router.get("/lend-records/{borrow_id}", response_model=BorrowDetailResponse)
-async def get_borrow_detail(
+def get_borrow_detail(
     borrow_id: int
 ):
     """
@@ -297,7 +301,7 @@ async def get_borrow_detail(
 
 # 刀柄相关路由
 @router.get("/handle/lend-records", response_model=HandleLendRecordListResponse)
-async def get_handle_lend_records(
+def get_handle_lend_records(
     handle_code: Optional[str] = Query(None, alias="handleCode", description="刀柄编码"),
     borrower_name: Optional[str] = Query(None, alias="borrowerName", description="借出人"),
     brand: Optional[str] = Query(None, description="品牌"),
@@ -338,7 +342,7 @@ async def get_handle_lend_records(
         raise HTTPException(status_code=500, detail=f"获取刀柄借出记录列表失败: {str(e)}")
 
 @router.post("/handle/lend-records", status_code=201)
-async def create_handle_lend_record(
+def create_handle_lend_record(
     handle_record: CreateHandleLendRecordRequest = Body(...)
 ):
     """
@@ -354,7 +358,7 @@ async def create_handle_lend_record(
         raise HTTPException(status_code=500, detail=f"创建刀柄借出记录失败: {str(e)}")
 
 @router.put("/handle/lend-records/{handle_id}", response_model=BaseResponse)
-async def update_handle_lend_record(
+def update_handle_lend_record(
     handle_id: int,
     request: UpdateHandleLendRecordRequest = Body(...)
 ):
@@ -372,7 +376,7 @@ async def update_handle_lend_record(
         raise HTTPException(status_code=500, detail=f"更新刀柄借出记录失败: {str(e)}")
 
 @router.get("/handle/lend-records/{handle_id}", response_model=BorrowDetailResponse)
-async def get_handle_lend_record_detail(
+def get_handle_lend_record_detail(
     handle_id: int
 ):
     """
@@ -387,7 +391,7 @@ async def get_handle_lend_record_detail(
         raise HTTPException(status_code=500, detail=f"获取刀柄借出记录详情失败: {str(e)}")
 
 @router.post("/handle/batch-return", response_model=BatchReturnResponse)
-async def batch_return_handles(
+def batch_return_handles(
     request: HandleBatchReturnRequest = Body(...)
 ):
     """
@@ -404,7 +408,7 @@ async def batch_return_handles(
         raise HTTPException(status_code=500, detail=f"刀柄批量归还处理失败: {str(e)}")
 
 @router.post("/handle/return", response_model=BatchReturnResponse)
-async def return_handle(
+def return_handle(
     request: HandleReturnRequest = Body(...)
 ):
     """
@@ -421,7 +425,7 @@ async def return_handle(
         raise HTTPException(status_code=500, detail=f"刀柄归还处理失败: {str(e)}")
 
 @router.post("/handle/temp-store", response_model=BaseResponse)
-async def temp_store_handle(
+def temp_store_handle(
     request: HandleTempStoreRequest = Body(...)
 ):
     """
@@ -438,7 +442,7 @@ async def temp_store_handle(
         raise HTTPException(status_code=500, detail=f"刀柄暂存处理失败: {str(e)}")
 
 @router.get("/handle/temp-store-records", response_model=HandleTempStoreRecordListResponse)
-async def get_handle_temp_store_records(
+def get_handle_temp_store_records(
     storage_code: Optional[str] = Query(None, alias="storageCode", description="暂存单号"),
     borrower_name: Optional[str] = Query(None, alias="borrowerName", description="暂存人姓名"),
     storage_user: Optional[str] = Query(None, alias="storageUser", description="暂存人编号"),
@@ -485,7 +489,7 @@ async def get_handle_temp_store_records(
         raise HTTPException(status_code=500, detail=f"获取刀柄暂存记录列表失败: {str(e)}")
 
 @router.post("/handle/temp-store-records", status_code=201, response_model=BaseResponse)
-async def create_handle_temp_store_record(
+def create_handle_temp_store_record(
     handle_temp_store: CreateHandleTempStoreRequest = Body(...)
 ):
     """
@@ -525,7 +529,7 @@ async def create_handle_temp_store_record(
         raise HTTPException(status_code=500, detail=f"创建刀柄暂存记录失败: {str(e)}")
 
 @router.post("/handle/temp-store-batch-return", response_model=HandleTempStoreBatchReturnResponse)
-async def handle_temp_store_batch_return(
+def handle_temp_store_batch_return(
     request: HandleTempStoreBatchReturnRequest = Body(...)
 ):
     """
@@ -578,7 +582,7 @@ async def handle_temp_store_batch_return(
         raise HTTPException(status_code=500, detail=f"刀柄暂存批量归还处理失败: {str(e)}")
 
 @router.put("/handle/temp-store/{record_id}", response_model=BaseResponse)
-async def update_handle_temp_store_record(
+def update_handle_temp_store_record(
     record_id: int,
     request: UpdateHandleTempStoreRequest = Body(...)
 ):
@@ -620,7 +624,7 @@ async def update_handle_temp_store_record(
         raise HTTPException(status_code=500, detail=f"编辑刀柄暂存记录失败: {str(e)}")
 
 @router.post("/handle/return", response_model=BaseResponse)
-async def return_handle_temp_store(
+def return_handle_temp_store(
     request: HandleTempStoreReturnRequest = Body(...)
 ):
     """
@@ -658,7 +662,7 @@ async def return_handle_temp_store(
         raise HTTPException(status_code=500, detail=f"刀柄暂存归还失败: {str(e)}")
 
 @router.post("/handle/temp-store", response_model=BaseResponse)
-async def create_handle_temp_store_from_borrow(
+def create_handle_temp_store_from_borrow(
     request: CreateHandleTempStoreFromBorrowRequest = Body(...)
 ):
     """
@@ -698,7 +702,7 @@ async def create_handle_temp_store_from_borrow(
         raise HTTPException(status_code=500, detail=f"创建刀柄暂存失败: {str(e)}")
 
 @router.get("/handle/temp-store/{record_id}", response_model=HandleTempStoreDetailResponse)
-async def get_handle_temp_store_detail(
+def get_handle_temp_store_detail(
     record_id: int
 ):
     """
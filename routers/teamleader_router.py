@@ -43,14 +43,21 @@ from teamleader.schemas.data_schemas import (
     TotalStockQueryParams,
     TotalStockResponse,
     StockLocationDetailResponse,
-    WasteKnifeRecycleResponse
+    WasteKnifeRecycleResponse,
+    ExportJobRequest,
+    ExportJobResponse
 )
 from teamleader.services.api_client import TeamLeaderAPIClient
 from config.config import settings
+from routers.export_routes import build_export_router
+from utils.http_client import UpstreamStreamingResponse
+from utils.server_timing import TimedRoute
 
 # 创建路由器
+# TimedRoute：Server-Timing 中拆分响应模型校验和JSON序列化耗时
 router = APIRouter(
     prefix="/teamleader",
+    route_class=TimedRoute,
     tags=["TeamLeader-班组长"],
     responses={404: {"description": "Not found"}}
 )
@@ -116,7 +123,7 @@ async def query_cutters(
 
     # 调用原始API
     try:
-        result = api_client.get_cutter_list(query_params.model_dump(exclude_none=False))
+        result = await api_client.get_cutter_list(query_params.model_dump(exclude_none=False))
 
         # 检查响应状态
         if not result.get("success"):
@@ -205,7 +212,7 @@ async def create_cutter(request: CreateCutterRequest):
 
     # 调用原始API
     try:
-        result = api_client.create_cutter(request.model_dump())
+        result = await api_client.create_cutter(request.model_dump())
 
         # 检查响应状态
         if not result.get("success"):
@@ -261,7 +268,7 @@ async def update_cutter(cutter_id: int, request: UpdateCutterRequest):
     # 调用原始API
     try:
         # 只传递非空字段
-        result = api_client.update_cutter(request.model_dump(exclude_none=True))
+        result = await api_client.update_cutter(request.model_dump(exclude_none=True))
 
         # 检查响应状态
         if not result.get("success"):
@@ -318,7 +325,7 @@ async def delete_cutters(
 
     # 调用原始API
     try:
-        result = api_client.delete_cutters(ids)
+        result = await api_client.delete_cutters(ids)
 
         # 检查响应状态
         if not result.get("success"):
@@ -397,7 +404,7 @@ async def query_brands(
 
     # 调用原始API
     try:
-        result = api_client.get_brand_list(query_params.model_dump(exclude_none=False))
+        result = await api_client.get_brand_list(query_params.model_dump(exclude_none=False))
 
         # 检查响应状态
         if not result.get("success"):
@@ -452,7 +459,7 @@ async def create_brand(request: SubmitBrandRequest):
 
     # 调用原始API
     try:
-        result = api_client.submit_brand(request.model_dump())
+        result = await api_client.submit_brand(request.model_dump())
 
         # 检查响应状态
         if not result.get("success"):
@@ -507,7 +514,7 @@ async def update_brand(brand_id: int, request: SubmitBrandRequest):
 
     # 调用原始API
     try:
-        result = api_client.submit_brand(request.model_dump())
+        result = await api_client.submit_brand(request.model_dump())
 
         # 检查响应状态
         if not result.get("success"):
@@ -565,7 +572,7 @@ async def delete_brands(
 
     # 调用原始API
     try:
-        result = api_client.delete_brands(ids)
+        result = await api_client.delete_brands(ids)
 
         # 检查响应状态
         if not result.get("success"):
@@ -640,7 +647,7 @@ async def query_stock_put_cabinets(
 
     # 调用原始API
     try:
-        result = api_client.get_stock_put_list(query_params.model_dump(exclude_none=False))
+        result = await api_client.get_stock_put_list(query_params.model_dump(exclude_none=False))
 
         # 检查响应状态
         if not result.get("success"):
@@ -683,7 +690,7 @@ async def unbind_stock_cutter(stock_id: int):
     """
     # 调用原始API
     try:
-        result = api_client.unbind_stock_cutter(stock_id)
+        result = await api_client.unbind_stock_cutter(stock_id)
 
         # 检查响应状态
         if not result.get("success"):
@@ -730,7 +737,7 @@ async def change_stock_ban_status(
     """
     # 调用原始API
     try:
-        result = api_client.change_stock_ban_status(stock_id, is_ban)
+        result = await api_client.change_stock_ban_status(stock_id, is_ban)
 
         # 检查响应状态
         if not result.get("success"):
@@ -795,7 +802,7 @@ async def get_stock_statistics(
 
     # 调用原始API
     try:
-        result = api_client.get_stock_statistical_num(query_params.model_dump(exclude_none=False))
+        result = await api_client.get_stock_statistical_num(query_params.model_dump(exclude_none=False))
 
         # 检查响应状态
         if not result.get("success"):
@@ -877,7 +884,7 @@ async def query_stock_take_cabinets(
 
     # 调用原始API
     try:
-        result = api_client.get_stock_take_list(query_params.model_dump(exclude_none=False))
+        result = await api_client.get_stock_take_list(query_params.model_dump(exclude_none=False))
 
         # 检查响应状态
         if not result.get("success"):
@@ -921,7 +928,7 @@ async def unbind_stock_take_cutter(stock_id: int):
     """
     # 调用原始API（与收刀柜使用相同API）
     try:
-        result = api_client.unbind_stock_cutter(stock_id)
+        result = await api_client.unbind_stock_cutter(stock_id)
 
         # 检查响应状态
         if not result.get("success"):
@@ -969,7 +976,7 @@ async def change_stock_take_ban_status(
     """
     # 调用原始API（与收刀柜使用相同API）
     try:
-        result = api_client.change_stock_ban_status(stock_id, is_ban)
+        result = await api_client.change_stock_ban_status(stock_id, is_ban)
 
         # 检查响应状态
         if not result.get("success"):
@@ -1021,7 +1028,7 @@ async def pre_batch_plug(cabinet_code: str):
     """
     # 调用原始API
     try:
-        result = api_client.pre_batch_plug(cabinet_code)
+        result = await api_client.pre_batch_plug(cabinet_code)
 
         # 检查响应状态
         if not result.get("success"):
@@ -1071,7 +1078,7 @@ async def on_pre_batch_plug(cabinet_code: str):
     """
     # 调用原始API
     try:
-        result = api_client.on_pre_batch_plug(cabinet_code)
+        result = await api_client.on_pre_batch_plug(cabinet_code)
 
         # 检查响应状态
         if not result.get("success"):
@@ -1157,7 +1164,7 @@ async def get_storage_statistics(
         }
 
         # 调用API客户端方法获取数据
-        result = api_client.get_storage_statistics(params)
+        result = await api_client.get_storage_statistics(params)
 
         return result
 
@@ -1245,7 +1252,7 @@ async def export_stock_record(
         }
 
         # 调用API客户端方法获取导出数据
-        result = api_client.export_stock_record(params)
+        result = await api_client.export_stock_record(params)
 
         return result
 
@@ -1294,7 +1301,7 @@ async def get_charts_accumulated():
     """
     try:
         # 调用API客户端方法获取数据
-        result = api_client.get_charts_accumulated()
+        result = await api_client.get_charts_accumulated()
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取刀具消耗统计失败: {str(e)}")
@@ -1370,7 +1377,7 @@ async def get_total_stock(
         }
 
         # 调用API客户端方法获取数据
-        result = api_client.get_total_stock_list(params)
+        result = await api_client.get_total_stock_list(params)
 
         return result
 
@@ -1407,7 +1414,7 @@ async def get_stock_location_detail(stock_id: int):
     """
     try:
         # 调用API客户端方法获取数据
-        result = api_client.get_stock_location_by_id(stock_id)
+        result = await api_client.get_stock_location_by_id(stock_id)
 
         return result
 
@@ -1475,7 +1482,7 @@ async def get_waste_knife_recycle(
         }
 
         # 调用API客户端方法获取数据
-        result = api_client.get_waste_knife_recycle_info(params)
+        result = await api_client.get_waste_knife_recycle_info(params)
 
         return result
 
@@ -1517,7 +1524,7 @@ async def get_lend_record_list(
     Returns:
         LendRecordResponse: 领刀记录列表响应
     """
-    result = api_client.get_lend_records(
+    result = await api_client.get_lend_records(
         current=current,
         size=size,
         keyword=keyword,
@@ -1551,10 +1558,10 @@ async def export_lend_records(
         startTime: 开始时间
 
     Returns:
-        Response: 包含导出文件的响应
+        StreamingResponse: 分块转发上游导出文件的响应
     """
     try:
-        file_content = api_client.export_lend_records(
+        file_stream = await api_client.export_lend_records(
             endTime=endTime,
             order=order,
             rankingType=rankingType,
@@ -1562,8 +1569,8 @@ async def export_lend_records(
             startTime=startTime
         )
 
-        return Response(
-            content=file_content,
+        return UpstreamStreamingResponse(
+            file_stream,
             media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             headers={
                 "Content-Disposition": "attachment; filename=lend_records.xlsx"
@@ -1609,7 +1616,7 @@ async def list_alarm_warning(
     Returns:
         AlarmWarningResponse: 告警预警列表响应
     """
-    result = api_client.list_alarm_warning(
+    result = await api_client.list_alarm_warning(
         locSurplus=loc_surplus,
         alarmLevel=alarm_level,
         deviceType=device_type,
@@ -1631,7 +1638,7 @@ async def get_alarm_statistics():
     Returns:
         AlarmStatisticsResponse: 告警统计信息响应
     """
-    result = api_client.get_alarm_statistics()
+    result = await api_client.get_alarm_statistics()
 
     return result
 
@@ -1649,7 +1656,7 @@ async def update_alarm_threshold(
     Returns:
         Response: 更新结果响应
     """
-    result = api_client.update_alarm_threshold(
+    result = await api_client.update_alarm_threshold(
         locSurplus=request.locSurplus,
         alarmThreshold=request.alarmThreshold
     )
@@ -1674,7 +1681,7 @@ async def handle_alarm_warning(
     Returns:
         Response: 处理结果响应
     """
-    result = api_client.handle_alarm_warning(
+    result = await api_client.handle_alarm_warning(
         id=alarm_id,
         handleStatus=handle_status,
         handleRemark=handle_remark
@@ -1700,7 +1707,7 @@ async def batch_handle_alarm_warning(
     Returns:
         Response: 处理结果响应
     """
-    result = api_client.batch_handle_alarm_warning(
+    result = await api_client.batch_handle_alarm_warning(
         ids=ids,
         handleStatus=handle_status,
         handleRemark=handle_remark
@@ -1730,10 +1737,10 @@ async def export_alarm_warning(
         handle_status: 处理状态
 
     Returns:
-        Response: 包含导出文件的响应
+        StreamingResponse: 分块转发上游导出文件的响应
     """
     try:
-        file_content = api_client.export_alarm_warning(
+        file_stream = await api_client.export_alarm_warning(
             locSurplus=loc_surplus,
             alarmLevel=alarm_level,
             deviceType=device_type,
@@ -1742,8 +1749,8 @@ async def export_alarm_warning(
             handleStatus=handle_status
         )
 
-        return Response(
-            content=file_content,
+        return UpstreamStreamingResponse(
+            file_stream,
             media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             headers={
                 "Content-Disposition": "attachment; filename=alarm_warnings.xlsx"
@@ -1812,7 +1819,7 @@ async def get_replenish_record_list(
             - tenantId: 租户ID
             - isDeleted: 是否已删除
     """
-    result = api_client.get_replenish_records(
+    result = await api_client.get_replenish_records(
         current=current,
         endTime=end_time,
         order=order,
@@ -1844,7 +1851,7 @@ async def export_replenish_records(
         start_time: 开始时间
 
     Returns:
-        Response: 包含导出文件的响应，Excel文件包含以下字段：
+        StreamingResponse: 分块转发上游导出文件的响应，Excel文件包含以下字段：
             - lendUserName: 取出人
             - storageUserName: 暂存人
             - brandName: 品牌名称
@@ -1872,7 +1879,7 @@ async def export_replenish_records(
             - isDeleted: 是否已删除
     """
     try:
-        file_content = api_client.export_replenish_records(
+        file_stream = await api_client.export_replenish_records(
             endTime=end_time,
             order=order,
             rankingType=ranking_type,
@@ -1880,8 +1887,8 @@ async def export_replenish_records(
             startTime=start_time
         )
 
-        return Response(
-            content=file_content,
+        return UpstreamStreamingResponse(
+            file_stream,
             media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             headers={
                 "Content-Disposition": "attachment; filename=replenish_records.xlsx"
@@ -1925,7 +1932,7 @@ async def get_storage_record_list(
     Returns:
         StorageRecordResponse: 公共暂存记录列表响应
     """
-    result = api_client.get_storage_records(
+    result = await api_client.get_storage_records(
         current=current,
         endTime=end_time,
         order=order,
@@ -1957,10 +1964,10 @@ async def export_storage_records(
         start_time: 开始时间
 
     Returns:
-        Response: 包含导出文件的响应
+        StreamingResponse: 分块转发上游导出文件的响应
     """
     try:
-        file_content = api_client.export_storage_records(
+        file_stream = await api_client.export_storage_records(
             endTime=end_time,
             order=order,
             rankingType=ranking_type,
@@ -1968,8 +1975,8 @@ async def export_storage_records(
             startTime=start_time
         )
 
-        return Response(
-            content=file_content,
+        return UpstreamStreamingResponse(
+            file_stream,
             media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             headers={
                 "Content-Disposition": "attachment; filename=storage_records.xlsx"
@@ -1984,4 +1991,11 @@ async def export_storage_records(
                 "success": False
             }, ensure_ascii=False),
             media_type="application/json"
-        )
\ No newline at end of file
+        )
+
+
+# ==================== 异步导出任务与时间分片导出 (班组长) ====================
+export_router, export_jobs = build_export_router(
+    "teamleader", api_client, ExportJobRequest, ExportJobResponse, tag="班组长记录"
+)
+router.include_router(export_router)
@@ -1,11 +1,33 @@
 import sys
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 
 # 将项目根目录添加到 Python 路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from routers.teamleader_router import router as teamleader_router
+from utils.admission import AdmissionController, AdmissionMiddleware
+from utils.log_pipeline import setup_logging
+from utils.loop_watchdog import install_loop_watchdog
+from utils.metrics import install_metrics
+from utils.openapi_cache import install_openapi_cache
+from utils.server_timing import ServerTimingMiddleware
+from routers.teamleader_router import router as teamleader_router, api_client, export_jobs
+
+# 日志：经队列由后台线程写出，级别和格式见 LOG_* 配置
+setup_logging()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动Token自动刷新和刀具耗材镜像同步，退出时取消导出任务并关闭上游连接池"""
+    api_client.token_provider.start()
+    if api_client.cutter_catalog is not None:
+        api_client.cutter_catalog.start()
+    yield
+    await export_jobs.aclose()
+    await api_client.aclose()
+
 
 # 创建FastAPI应用实例
 app = FastAPI(
@@ -44,6 +66,7 @@ app = FastAPI(
     license_info={
         "name": "内部使用",
     },
+    lifespan=lifespan,
     openapi_tags=[
         {
             "name": "TeamLeader-班组长",
@@ -56,9 +79,24 @@ app = FastAPI(
     ]
 )
 
+# 接口准入控制：按路由限制并发和排队，过载时返回 503 + Retry-After
+admission = AdmissionController()
+app.add_middleware(AdmissionMiddleware, controller=admission)
+# Server-Timing 响应头（在准入控制之外，包含准入排队时间）
+app.add_middleware(ServerTimingMiddleware)
+
+# 事件循环阻塞检测（LOOP_WATCHDOG_ENABLED 时启用）
+install_loop_watchdog(app)
+
 # 包含路由
 app.include_router(teamleader_router, prefix="/api/v1")
 
+# OpenAPI 文档按模型定义哈希缓存到磁盘，各 worker 共用
+install_openapi_cache(app, "teamleader")
+
+# Prometheus 指标：按客户端方法的耗时分布、失败/超时、缓存命中、传输字节及各组件统计
+install_metrics(app, admission, clients={"teamleader": api_client})
+
 # 根路径路由
 @app.get("/", tags=["系统接口"], summary="服务根路径")
 async def root():
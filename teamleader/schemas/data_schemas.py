@@ -1036,4 +1036,58 @@ class AlarmStatisticsResponse(BaseModel):
     code: int
     data: AlarmStatistics
     msg: str
-    success: bool
\ No newline at end of file
+    success: bool
+
+
+# ==================== 异步导出任务相关模型 ====================
+
+class ExportJobRequest(BaseModel):
+    """
+    导出任务提交参数 (班组长)
+    """
+    model_config = ConfigDict(from_attributes=True)
+
+    exportType: str  # 导出类型：lend 领刀记录, replenish 补货记录, storage 公共暂存记录, alarm 告警预警
+    # 领刀/补货/暂存记录导出参数
+    startTime: Optional[str] = None  # 开始时间
+    endTime: Optional[str] = None  # 结束时间
+    order: Optional[int] = None  # 顺序 0: 从大到小 1：从小到大
+    rankingType: Optional[int] = None  # 0: 数量 1: 金额
+    recordStatus: Optional[int] = None  # 0: 取刀 1: 还刀 2: 收刀 3: 暂存 4: 完成 5：违规还刀
+    # 告警预警导出参数
+    locSurplus: Optional[int] = None  # 货道
+    alarmLevel: Optional[int] = None  # 预警等级
+    deviceType: Optional[str] = None  # 设备类型
+    cabinetCode: Optional[str] = None  # 刀柜编码
+    brandName: Optional[str] = None  # 品牌名称
+    handleStatus: Optional[int] = None  # 处理状态
+
+
+class ExportJobInfo(BaseModel):
+    """
+    导出任务状态 (班组长)
+    """
+    model_config = ConfigDict(from_attributes=True)
+
+    jobId: str  # 任务ID（相同查询得到相同ID）
+    exportType: str  # 导出类型
+    params: dict  # 导出查询参数
+    status: str  # 任务状态：pending 排队中, running 执行中, done 已完成, failed 失败
+    bytesWritten: int  # 已写入字节数
+    error: Optional[str] = None  # 失败原因
+    createdAt: float  # 创建时间（时间戳）
+    startedAt: Optional[float] = None  # 开始时间（时间戳）
+    finishedAt: Optional[float] = None  # 完成时间（时间戳）
+    downloadUrl: Optional[str] = None  # 下载地址（完成后可用）
+
+
+class ExportJobResponse(BaseModel):
+    """
+    导出任务响应模型 (班组长)
+    """
+    model_config = ConfigDict(from_attributes=True)
+
+    code: int
+    data: Optional[ExportJobInfo] = None
+    msg: str
+    success: bool
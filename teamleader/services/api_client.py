@@ -1,12 +1,20 @@
-import requests
+import httpx
 import logging
-import os
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, AsyncIterator
 from urllib.parse import urljoin
 
+from config.config import settings
+from teamleader.services.cutter_catalog import CutterCatalog
+from utils.http_client import UpstreamSession, iter_stream
+from utils.log_pipeline import log_payload
+from utils.metrics import instrument_client
+from utils.response_cache import ResponseCache, cached
+from utils.token_provider import TokenProvider
+
 logger = logging.getLogger(__name__)
 
 
+@instrument_client("teamleader")
 class TeamLeaderAPIClient:
     """封装班组长的原始API调用"""
 
@@ -20,68 +28,114 @@ class TeamLeaderAPIClient:
             token_file: Token文件路径（可选），默认为项目根目录下token.txt
         """
         self.base_url = base_url
-        self.session = requests.Session()
-        self.session.headers.update({
+        # 异步连接池会话，路由中直接 await 客户端方法，不阻塞事件循环
+        # 并发的相同GET请求会被合并为一次上游调用
+        self.session = UpstreamSession({
             "Content-Type": "application/json",
             "User-Agent": "TeamLeader-API-Wrapper/1.0"
         })
 
-        # 优先使用api_key参数
-        if api_key:
-            self.session.headers.update({"Authorization": f"Bearer {api_key}"})
-        # 其次尝试从文件读取token
-        elif token_file or os.path.exists("token.txt"):
-            token = self._load_token_from_file(token_file or "token.txt")
-            if token:
-                self.session.headers.update({"Authorization": f"Bearer {token}"})
-                logger.info("已从文件加载Token")
-            else:
-                logger.warning("无法加载Token，将使用无认证模式")
+        # 只读统计接口的响应缓存（TTL + 过期后后台刷新）
+        self.response_cache = ResponseCache(namespace="teamleader")
+
+        # 刀具耗材本地镜像，由应用生命周期启动后台同步
+        self.cutter_catalog: Optional[CutterCatalog] = None
+        if settings.CUTTER_CATALOG_ENABLED:
+            self.cutter_catalog = CutterCatalog(
+                self._fetch_cutter_page,
+                page_size=settings.CUTTER_CATALOG_PAGE_SIZE,
+                sync_interval=settings.CUTTER_CATALOG_SYNC_INTERVAL,
+                max_staleness=settings.CUTTER_CATALOG_MAX_STALENESS
+            )
+
+        # Token保存在内存中：启动时读取一次（优先使用api_key参数，其次为Token文件），
+        # 过期前后台刷新，上游返回401时刷新后重发
+        self.token_provider = TokenProvider(token=api_key, token_file=token_file or "token.txt")
+        self.session.use_token_provider(self.token_provider, "Authorization")
 
-    def _load_token_from_file(self, token_file: str) -> Optional[str]:
+    def update_token(self, token: str):
         """
-        从文件读取Token
+        更新Token
 
         参数：
-            token_file: Token文件路径
+            token: 新的Token字符串
+        """
+        self.token_provider.set_token(token)
+        logger.info("Token已更新")
+
+    def get_coalescing_stats(self) -> Dict[str, int]:
+        """
+        获取GET请求合并计数
+
         返回：
-            Token字符串，如果读取失败则返回None
+            包含 calls/executions/collapsed/inflight 的计数字典
         """
-        try:
-            # 如果是相对路径，转换为绝对路径
-            if not os.path.isabs(token_file):
-                # 获取项目根目录（假设teamleader文件夹在项目根目录下）
-                current_dir = os.path.dirname(os.path.abspath(__file__))
-                project_root = os.path.dirname(os.path.dirname(current_dir))
-                token_file = os.path.join(project_root, token_file)
-
-            # 读取token文件
-            with open(token_file, 'r', encoding='utf-8') as f:
-                token = f.read().strip()
-                if token:
-                    logger.info(f"成功从 {token_file} 读取Token")
-                    return token
-                else:
-                    logger.warning(f"Token文件 {token_file} 为空")
-                    return None
-        except FileNotFoundError:
-            logger.warning(f"Token文件 {token_file} 不存在")
-            return None
-        except Exception as e:
-            logger.error(f"读取Token文件失败: {e}")
-            return None
+        return self.session.coalescer.stats()
 
-    def update_token(self, token: str):
+    def get_circuit_stats(self) -> Dict[str, Dict[str, Any]]:
         """
-        更新Token
+        获取各上游接口的熔断状态
+
+        返回：
+            接口路径 -> state/failures/rejected
+        """
+        return self.session.breakers.stats()
+
+    def get_retry_stats(self) -> Dict[str, Any]:
+        """
+        获取GET重试与对冲计数
+
+        返回：
+            retries: 重试次数；requests/hedges/hedgeWins/hedgeRate: 对冲统计
+        """
+        return {"retries": self.session.retry.retries, **self.session.hedge.stats()}
+
+    def get_scheduler_stats(self) -> Dict[str, Any]:
+        """
+        获取上游调度器统计（进程内各角色共用）
+
+        返回：
+            limit/active/waiting 以及按优先级的放行、排队统计
+        """
+        return self.session.scheduler.stats()
+
+    async def aclose(self):
+        """
+        关闭连接池，释放与原始API之间的keep-alive连接
+        """
+        if self.cutter_catalog is not None:
+            await self.cutter_catalog.stop()
+        await self.token_provider.stop()
+        await self.session.aclose()
+
+    async def _fetch_cutter_page(self, current: int, size: int) -> Dict[str, Any]:
+        """
+        拉取一页未经筛选的刀具耗材，供本地镜像同步使用
 
         参数：
-            token: 新的Token字符串
+            current: 当前页
+            size: 每页数量
+        返回：
+            上游原始响应
         """
-        self.session.headers.update({"Authorization": f"Bearer {token}"})
-        logger.info("Token已更新")
+        url = f"{self.base_url}/qw/knife/web/from/mes/cutter/list"
+        response = await self.session.get(url, params={"current": current, "size": size})
+        response.raise_for_status()
+        return response.json()
+
+    def _sync_cutter_catalog(self, result: Dict[str, Any]):
+        """
+        写操作成功后同步本地镜像：返回了完整记录则直接更新，否则触发一次后台全量同步
+        """
+        if self.cutter_catalog is None or not result.get("success"):
+            return
+        data = result.get("data")
+        if isinstance(data, dict) and data.get("id") is not None:
+            self.cutter_catalog.upsert(data)
+        else:
+            self.cutter_catalog.request_sync()
 
-    def get_cutter_list(self, params: Optional[Dict] = None) -> Dict[str, Any]:
+    async def get_cutter_list(self, params: Optional[Dict] = None) -> Dict[str, Any]:
         """
         分页查询刀具耗材信息
         接口地址: /qw/knife/web/from/mes/cutter/list
@@ -101,7 +155,13 @@ class TeamLeaderAPIClient:
                 - size: 每页数量
         返回：
             包含分页数据的响应
+
+        镜像已同步时直接在本地完成筛选和分页（价格区间的 total/pages 准确），
+        否则回退为请求上游
         """
+        if self.cutter_catalog is not None and self.cutter_catalog.ready:
+            return self.cutter_catalog.query(params)
+
         url = f"{self.base_url}/qw/knife/web/from/mes/cutter/list"
 
         try:
@@ -144,10 +204,10 @@ class TeamLeaderAPIClient:
                 request_params["current"] = 1
                 request_params["size"] = 10
 
-            logger.info(f"请求刀具列表，参数: {request_params}")
+            logger.info("请求刀具列表，参数: %s", request_params)
 
             # 发起GET请求
-            response = self.session.get(url, params=request_params, timeout=10)
+            response = await self.session.get(url, params=request_params, timeout=10)
             response.raise_for_status()
 
             result = response.json()
@@ -179,8 +239,8 @@ class TeamLeaderAPIClient:
 
             return result
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"获取刀具列表失败: {e}")
+        except httpx.HTTPError as e:
+            logger.error("获取刀具列表失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"请求失败: {str(e)}",
@@ -188,7 +248,7 @@ class TeamLeaderAPIClient:
                 "data": None
             }
         except Exception as e:
-            logger.error(f"处理刀具列表数据失败: {e}")
+            logger.error("处理刀具列表数据失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"数据处理失败: {str(e)}",
@@ -196,7 +256,7 @@ class TeamLeaderAPIClient:
                 "data": None
             }
 
-    def create_cutter(self, cutter_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def create_cutter(self, cutter_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         新增刀具耗材
         接口地址: /qw/knife/web/from/mes/cutter/saveCutter
@@ -260,19 +320,20 @@ class TeamLeaderAPIClient:
                 if cutter_data.get(field) is not None:
                     request_body[field] = cutter_data[field]
 
-            logger.info(f"新增刀具耗材，请求体: {request_body}")
+            log_payload(logger, "新增刀具耗材，请求体", request_body)
 
             # 发起POST请求，使用JSON格式
-            response = self.session.post(url, json=request_body, timeout=10)
+            response = await self.session.post(url, json=request_body, timeout=10)
             response.raise_for_status()
 
             result = response.json()
-            logger.info(f"新增刀具耗材成功: {result}")
+            log_payload(logger, "新增刀具耗材成功", result)
+            self._sync_cutter_catalog(result)
 
             return result
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"新增刀具耗材失败: {e}")
+        except httpx.HTTPError as e:
+            logger.error("新增刀具耗材失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"请求失败: {str(e)}",
@@ -280,7 +341,7 @@ class TeamLeaderAPIClient:
                 "data": None
             }
         except Exception as e:
-            logger.error(f"处理新增刀具耗材数据失败: {e}")
+            logger.error("处理新增刀具耗材数据失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"数据处理失败: {str(e)}",
@@ -288,7 +349,7 @@ class TeamLeaderAPIClient:
                 "data": None
             }
 
-    def update_cutter(self, cutter_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def update_cutter(self, cutter_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         修改刀具耗材
         接口地址: /qw/knife/web/from/mes/cutter/updateCutter
@@ -364,19 +425,20 @@ class TeamLeaderAPIClient:
                 if cutter_data.get(field) is not None:
                     request_body[field] = cutter_data[field]
 
-            logger.info(f"修改刀具耗材，请求体: {request_body}")
+            log_payload(logger, "修改刀具耗材，请求体", request_body)
 
             # 发起POST请求，使用JSON格式
-            response = self.session.post(url, json=request_body, timeout=10)
+            response = await self.session.post(url, json=request_body, timeout=10)
             response.raise_for_status()
 
             result = response.json()
-            logger.info(f"修改刀具耗材成功: {result}")
+            log_payload(logger, "修改刀具耗材成功", result)
+            self._sync_cutter_catalog(result)
 
             return result
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"修改刀具耗材失败: {e}")
+        except httpx.HTTPError as e:
+            logger.error("修改刀具耗材失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"请求失败: {str(e)}",
@@ -384,7 +446,7 @@ class TeamLeaderAPIClient:
                 "data": None
             }
         except Exception as e:
-            logger.error(f"处理修改刀具耗材数据失败: {e}")
+            logger.error("处理修改刀具耗材数据失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"数据处理失败: {str(e)}",
@@ -392,7 +454,7 @@ class TeamLeaderAPIClient:
                 "data": None
             }
 
-    def delete_cutters(self, ids: str) -> Dict[str, Any]:
+    async def delete_cutters(self, ids: str) -> Dict[str, Any]:
         """
         批量删除刀具耗材
         接口地址: /qw/knife/web/from/mes/cutter/delete
@@ -421,19 +483,21 @@ class TeamLeaderAPIClient:
                 "ids": ids
             }
 
-            logger.info(f"删除刀具耗材，参数: {params}")
+            logger.info("删除刀具耗材，参数: %s", params)
 
             # 发起POST请求，使用params传递query参数
-            response = self.session.post(url, params=params, timeout=10)
+            response = await self.session.post(url, params=params, timeout=10)
             response.raise_for_status()
 
             result = response.json()
-            logger.info(f"删除刀具耗材成功: {result}")
+            log_payload(logger, "删除刀具耗材成功", result)
+            if self.cutter_catalog is not None and result.get("success"):
+                self.cutter_catalog.remove_ids(ids.split(","))
 
             return result
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"删除刀具耗材失败: {e}")
+        except httpx.HTTPError as e:
+            logger.error("删除刀具耗材失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"请求失败: {str(e)}",
@@ -441,7 +505,7 @@ class TeamLeaderAPIClient:
                 "data": False
             }
         except Exception as e:
-            logger.error(f"处理删除刀具耗材数据失败: {e}")
+            logger.error("处理删除刀具耗材数据失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"数据处理失败: {str(e)}",
@@ -449,7 +513,7 @@ class TeamLeaderAPIClient:
                 "data": False
             }
 
-    def get_brand_list(self, params: Optional[Dict] = None) -> Dict[str, Any]:
+    async def get_brand_list(self, params: Optional[Dict] = None) -> Dict[str, Any]:
         """
         分页查询品牌信息
         接口地址: /qw/knife/web/from/mes/cutter/pageListBrand
@@ -511,18 +575,18 @@ class TeamLeaderAPIClient:
                 request_params["current"] = 1
                 request_params["size"] = 10
 
-            logger.info(f"请求品牌列表，参数: {request_params}")
+            logger.info("请求品牌列表，参数: %s", request_params)
 
             # 发起GET请求
-            response = self.session.get(url, params=request_params, timeout=10)
+            response = await self.session.get(url, params=request_params, timeout=10)
             response.raise_for_status()
 
             result = response.json()
 
             return result
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"获取品牌列表失败: {e}")
+        except httpx.HTTPError as e:
+            logger.error("获取品牌列表失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"请求失败: {str(e)}",
@@ -530,7 +594,7 @@ class TeamLeaderAPIClient:
                 "data": None
             }
         except Exception as e:
-            logger.error(f"处理品牌列表数据失败: {e}")
+            logger.error("处理品牌列表数据失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"数据处理失败: {str(e)}",
@@ -538,7 +602,7 @@ class TeamLeaderAPIClient:
                 "data": None
             }
 
-    def submit_brand(self, brand_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def submit_brand(self, brand_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         新增或修改品牌信息
         接口地址: /qw/knife/web/from/mes/cutter/submitBrand
@@ -602,19 +666,19 @@ class TeamLeaderAPIClient:
 
             # 判断是新增还是修改
             operation = "修改" if brand_data.get("id") else "新增"
-            logger.info(f"{operation}品牌信息，请求体: {request_body}")
+            log_payload(logger, operation + "品牌信息，请求体", request_body)
 
             # 发起POST请求，使用JSON格式
-            response = self.session.post(url, json=request_body, timeout=10)
+            response = await self.session.post(url, json=request_body, timeout=10)
             response.raise_for_status()
 
             result = response.json()
-            logger.info(f"{operation}品牌信息成功: {result}")
+            log_payload(logger, operation + "品牌信息成功", result)
 
             return result
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"提交品牌信息失败: {e}")
+        except httpx.HTTPError as e:
+            logger.error("提交品牌信息失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"请求失败: {str(e)}",
@@ -622,7 +686,7 @@ class TeamLeaderAPIClient:
                 "data": False
             }
         except Exception as e:
-            logger.error(f"处理品牌信息数据失败: {e}")
+            logger.error("处理品牌信息数据失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"数据处理失败: {str(e)}",
@@ -630,7 +694,7 @@ class TeamLeaderAPIClient:
                 "data": False
             }
 
-    def delete_brands(self, ids: str) -> Dict[str, Any]:
+    async def delete_brands(self, ids: str) -> Dict[str, Any]:
         """
         批量删除品牌信息
         接口地址: /qw/knife/web/from/mes/cutter/delBrand
@@ -659,19 +723,19 @@ class TeamLeaderAPIClient:
                 "ids": ids
             }
 
-            logger.info(f"删除品牌信息，参数: {params}")
+            logger.info("删除品牌信息，参数: %s", params)
 
             # 发起POST请求，使用params传递query参数
-            response = self.session.post(url, params=params, timeout=10)
+            response = await self.session.post(url, params=params, timeout=10)
             response.raise_for_status()
 
             result = response.json()
-            logger.info(f"删除品牌信息成功: {result}")
+            log_payload(logger, "删除品牌信息成功", result)
 
             return result
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"删除品牌信息失败: {e}")
+        except httpx.HTTPError as e:
+            logger.error("删除品牌信息失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"请求失败: {str(e)}",
@@ -679,7 +743,7 @@ class TeamLeaderAPIClient:
                 "data": False
             }
         except Exception as e:
-            logger.error(f"处理删除品牌信息数据失败: {e}")
+            logger.error("处理删除品牌信息数据失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"数据处理失败: {str(e)}",
@@ -687,7 +751,7 @@ class TeamLeaderAPIClient:
                 "data": False
             }
 
-    def get_stock_put_list(self, params: Optional[Dict] = None) -> Dict[str, Any]:
+    async def get_stock_put_list(self, params: Optional[Dict] = None) -> Dict[str, Any]:
         """
         获取收刀柜信息
         接口地址: /qw/knife/app/from/mes/cabinet/stockPutList
@@ -734,18 +798,18 @@ class TeamLeaderAPIClient:
                 if params.get("storageType") is not None:
                     request_params["storageType"] = params["storageType"]
 
-            logger.info(f"请求收刀柜信息列表，参数: {request_params}")
+            logger.info("请求收刀柜信息列表，参数: %s", request_params)
 
             # 发起GET请求
-            response = self.session.get(url, params=request_params, timeout=10)
+            response = await self.session.get(url, params=request_params, timeout=10)
             response.raise_for_status()
 
             result = response.json()
 
             return result
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"获取收刀柜信息列表失败: {e}")
+        except httpx.HTTPError as e:
+            logger.error("获取收刀柜信息列表失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"请求失败: {str(e)}",
@@ -753,7 +817,7 @@ class TeamLeaderAPIClient:
                 "data": []
             }
         except Exception as e:
-            logger.error(f"处理收刀柜信息列表数据失败: {e}")
+            logger.error("处理收刀柜信息列表数据失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"数据处理失败: {str(e)}",
@@ -761,7 +825,7 @@ class TeamLeaderAPIClient:
                 "data": []
             }
 
-    def unbind_stock_cutter(self, stock_id: int) -> Dict[str, Any]:
+    async def unbind_stock_cutter(self, stock_id: int) -> Dict[str, Any]:
         """
         货道解绑耗材（清空刀具数量）
         接口地址: /qw/knife/web/from/mes/cabinetStock/stockUnBindCutter
@@ -790,19 +854,19 @@ class TeamLeaderAPIClient:
                 "stockId": stock_id
             }
 
-            logger.info(f"解绑货道耗材，参数: {params}")
+            logger.info("解绑货道耗材，参数: %s", params)
 
             # 发起POST请求，使用params传递query参数
-            response = self.session.post(url, params=params, timeout=10)
+            response = await self.session.post(url, params=params, timeout=10)
             response.raise_for_status()
 
             result = response.json()
-            logger.info(f"解绑货道耗材成功: {result}")
+            log_payload(logger, "解绑货道耗材成功", result)
 
             return result
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"解绑货道耗材失败: {e}")
+        except httpx.HTTPError as e:
+            logger.error("解绑货道耗材失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"请求失败: {str(e)}",
@@ -810,7 +874,7 @@ class TeamLeaderAPIClient:
                 "data": False
             }
         except Exception as e:
-            logger.error(f"处理解绑货道耗材数据失败: {e}")
+            logger.error("处理解绑货道耗材数据失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"数据处理失败: {str(e)}",
@@ -818,7 +882,7 @@ class TeamLeaderAPIClient:
                 "data": False
             }
 
-    def change_stock_ban_status(self, stock_id: int, is_ban: int) -> Dict[str, Any]:
+    async def change_stock_ban_status(self, stock_id: int, is_ban: int) -> Dict[str, Any]:
         """
         货道禁用/启用库位
         接口地址: /qw/knife/web/from/mes/cabinetStock/changeBan
@@ -858,19 +922,19 @@ class TeamLeaderAPIClient:
             }
 
             operation = "禁用" if is_ban == 1 else "启用"
-            logger.info(f"{operation}货道库位，参数: {params}")
+            logger.info("%s货道库位，参数: %s", operation, params)
 
             # 发起POST请求，使用params传递query参数
-            response = self.session.post(url, params=params, timeout=10)
+            response = await self.session.post(url, params=params, timeout=10)
             response.raise_for_status()
 
             result = response.json()
-            logger.info(f"{operation}货道库位成功: {result}")
+            log_payload(logger, operation + "货道库位成功", result)
 
             return result
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"修改货道禁用状态失败: {e}")
+        except httpx.HTTPError as e:
+            logger.error("修改货道禁用状态失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"请求失败: {str(e)}",
@@ -878,7 +942,7 @@ class TeamLeaderAPIClient:
                 "data": False
             }
         except Exception as e:
-            logger.error(f"处理修改货道禁用状态数据失败: {e}")
+            logger.error("处理修改货道禁用状态数据失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"数据处理失败: {str(e)}",
@@ -886,7 +950,7 @@ class TeamLeaderAPIClient:
                 "data": False
             }
 
-    def get_stock_statistical_num(self, params: Optional[Dict] = None) -> Dict[str, Any]:
+    async def get_stock_statistical_num(self, params: Optional[Dict] = None) -> Dict[str, Any]:
         """
         获取货道统计数据
         接口地址: /qw/knife/app/from/mes/cabinet/stockStatisticalNum
@@ -930,19 +994,19 @@ class TeamLeaderAPIClient:
                 # 如果没有传递参数，默认查询收刀柜
                 request_params["locType"] = 0
 
-            logger.info(f"请求货道统计数据，参数: {request_params}")
+            logger.info("请求货道统计数据，参数: %s", request_params)
 
             # 发起GET请求
-            response = self.session.get(url, params=request_params, timeout=10)
+            response = await self.session.get(url, params=request_params, timeout=10)
             response.raise_for_status()
 
             result = response.json()
-            logger.info(f"获取货道统计数据成功: {result}")
+            log_payload(logger, "获取货道统计数据成功", result)
 
             return result
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"获取货道统计数据失败: {e}")
+        except httpx.HTTPError as e:
+            logger.error("获取货道统计数据失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"请求失败: {str(e)}",
@@ -956,7 +1020,7 @@ class TeamLeaderAPIClient:
                 }
             }
         except Exception as e:
-            logger.error(f"处理货道统计数据失败: {e}")
+            logger.error("处理货道统计数据失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"数据处理失败: {str(e)}",
@@ -970,7 +1034,7 @@ class TeamLeaderAPIClient:
                 }
             }
 
-    def get_stock_take_list(self, params: Optional[Dict] = None) -> Dict[str, Any]:
+    async def get_stock_take_list(self, params: Optional[Dict] = None) -> Dict[str, Any]:
         """
         获取取刀柜信息
         接口地址: /qw/knife/app/from/mes/cabinet/stockTakeList
@@ -1025,18 +1089,18 @@ class TeamLeaderAPIClient:
                 if params.get("specification"):
                     request_params["specification"] = params["specification"]
 
-            logger.info(f"请求取刀柜信息列表，参数: {request_params}")
+            logger.info("请求取刀柜信息列表，参数: %s", request_params)
 
             # 发起GET请求
-            response = self.session.get(url, params=request_params, timeout=10)
+            response = await self.session.get(url, params=request_params, timeout=10)
             response.raise_for_status()
 
             result = response.json()
 
             return result
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"获取取刀柜信息列表失败: {e}")
+        except httpx.HTTPError as e:
+            logger.error("获取取刀柜信息列表失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"请求失败: {str(e)}",
@@ -1044,7 +1108,7 @@ class TeamLeaderAPIClient:
                 "data": []
             }
         except Exception as e:
-            logger.error(f"处理取刀柜信息列表数据失败: {e}")
+            logger.error("处理取刀柜信息列表数据失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"数据处理失败: {str(e)}",
@@ -1052,7 +1116,7 @@ class TeamLeaderAPIClient:
                 "data": []
             }
 
-    def pre_batch_plug(self, cabinet_code: str) -> Dict[str, Any]:
+    async def pre_batch_plug(self, cabinet_code: str) -> Dict[str, Any]:
         """
         预补刀查询（获取耗材是否可以补刀）
         接口地址: /qw/knife/web/from/mes/cabinetStock/preBatchPlug
@@ -1086,19 +1150,19 @@ class TeamLeaderAPIClient:
                 "cabinetCode": cabinet_code
             }
 
-            logger.info(f"预补刀查询，参数: {params}")
+            logger.info("预补刀查询，参数: %s", params)
 
             # 发起POST请求，使用params传递query参数
-            response = self.session.post(url, params=params, timeout=10)
+            response = await self.session.post(url, params=params, timeout=10)
             response.raise_for_status()
 
             result = response.json()
-            logger.info(f"预补刀查询成功: {result}")
+            log_payload(logger, "预补刀查询成功", result)
 
             return result
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"预补刀查询失败: {e}")
+        except httpx.HTTPError as e:
+            logger.error("预补刀查询失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"请求失败: {str(e)}",
@@ -1109,7 +1173,7 @@ class TeamLeaderAPIClient:
                 }
             }
         except Exception as e:
-            logger.error(f"处理预补刀查询数据失败: {e}")
+            logger.error("处理预补刀查询数据失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"数据处理失败: {str(e)}",
@@ -1120,7 +1184,7 @@ class TeamLeaderAPIClient:
                 }
             }
 
-    def on_pre_batch_plug(self, cabinet_code: str) -> Dict[str, Any]:
+    async def on_pre_batch_plug(self, cabinet_code: str) -> Dict[str, Any]:
         """
         批量一键补刀
         接口地址: /qw/knife/web/from/mes/cabinetStock/onPreBatchPlug
@@ -1149,19 +1213,19 @@ class TeamLeaderAPIClient:
                 "cabinetCode": cabinet_code
             }
 
-            logger.info(f"批量补刀，参数: {params}")
+            logger.info("批量补刀，参数: %s", params)
 
             # 发起POST请求，使用params传递query参数
-            response = self.session.post(url, params=params, timeout=10)
+            response = await self.session.post(url, params=params, timeout=10)
             response.raise_for_status()
 
             result = response.json()
-            logger.info(f"批量补刀成功: {result}")
+            log_payload(logger, "批量补刀成功", result)
 
             return result
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"批量补刀失败: {e}")
+        except httpx.HTTPError as e:
+            logger.error("批量补刀失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"请求失败: {str(e)}",
@@ -1169,7 +1233,7 @@ class TeamLeaderAPIClient:
                 "data": False
             }
         except Exception as e:
-            logger.error(f"处理批量补刀数据失败: {e}")
+            logger.error("处理批量补刀数据失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"数据处理失败: {str(e)}",
@@ -1179,7 +1243,7 @@ class TeamLeaderAPIClient:
 
     # ==================== 统计接口方法（修正版） ====================
 
-    def get_storage_statistics(self, params: Dict[str, Any]) -> Dict[str, Any]:
+    async def get_storage_statistics(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """
         获取出入库统计数据
         调用外部接口：/qw/knife/web/from/mes/record/stockList
@@ -1199,7 +1263,7 @@ class TeamLeaderAPIClient:
             query_params = {k: v for k, v in params.items() if v is not None}
 
             # 调用外部接口，使用 params 传递查询参数
-            response = self.session.get(
+            response = await self.session.get(
                 f"{self.base_url}/qw/knife/web/from/mes/record/stockList",
                 params=query_params,
                 timeout=10
@@ -1217,8 +1281,8 @@ class TeamLeaderAPIClient:
                 "data": external_data.get("data")
             }
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"获取出入库统计数据失败: {e}")
+        except httpx.HTTPError as e:
+            logger.error("获取出入库统计数据失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"调用外部接口失败: {str(e)}",
@@ -1226,7 +1290,7 @@ class TeamLeaderAPIClient:
                 "data": None
             }
 
-    def export_stock_record(self, params: Dict[str, Any]) -> Dict[str, Any]:
+    async def export_stock_record(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """
         导出刀具耗材数据（出入库记录）
         调用外部接口：/qw/knife/web/from/mes/record/exportStockRecord
@@ -1245,7 +1309,7 @@ class TeamLeaderAPIClient:
             query_params = {k: v for k, v in params.items() if v is not None}
 
             # 调用外部导出接口
-            response = self.session.get(
+            response = await self.session.get(
                 f"{self.base_url}/qw/knife/web/from/mes/record/exportStockRecord",
                 params=query_params,
                 timeout=10
@@ -1263,8 +1327,8 @@ class TeamLeaderAPIClient:
                 "data": external_data.get("data")
             }
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"导出出入库记录失败: {e}")
+        except httpx.HTTPError as e:
+            logger.error("导出出入库记录失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"调用外部导出接口失败: {str(e)}",
@@ -1272,7 +1336,8 @@ class TeamLeaderAPIClient:
                 "data": None
             }
 
-    def get_charts_accumulated(self) -> Dict[str, Any]:
+    @cached("charts_accumulated", ttl=300)
+    async def get_charts_accumulated(self) -> Dict[str, Any]:
         """
         获取刀具消耗统计
         调用外部接口：/qw/knife/web/from/mes/statistics/chartsAccumulated
@@ -1285,7 +1350,7 @@ class TeamLeaderAPIClient:
         """
         try:
             # 调用外部接口
-            response = self.session.get(
+            response = await self.session.get(
                 f"{self.base_url}/qw/knife/web/from/mes/statistics/chartsAccumulated",
                 timeout=10
             )
@@ -1302,8 +1367,8 @@ class TeamLeaderAPIClient:
                 "data": external_data.get("data")
             }
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"获取刀具消耗统计失败: {e}")
+        except httpx.HTTPError as e:
+            logger.error("获取刀具消耗统计失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"调用外部接口失败: {str(e)}",
@@ -1311,7 +1376,7 @@ class TeamLeaderAPIClient:
                 "data": None
             }
 
-    def get_total_stock_list(self, params: Dict[str, Any]) -> Dict[str, Any]:
+    async def get_total_stock_list(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """
         获取总库存统计列表（支持搜索和刷新）
         调用外部接口：/qw/knife/web/from/mes/cabinetStock/stockLocTakeInfoList
@@ -1334,7 +1399,7 @@ class TeamLeaderAPIClient:
             query_params = {k: v for k, v in params.items() if v is not None}
 
             # 调用外部接口
-            response = self.session.get(
+            response = await self.session.get(
                 f"{self.base_url}/qw/knife/web/from/mes/cabinetStock/stockLocTakeInfoList",
                 params=query_params,
                 timeout=10
@@ -1366,8 +1431,8 @@ class TeamLeaderAPIClient:
                 "data": data
             }
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"获取总库存统计列表失败: {e}")
+        except httpx.HTTPError as e:
+            logger.error("获取总库存统计列表失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"调用外部接口失败: {str(e)}",
@@ -1375,7 +1440,7 @@ class TeamLeaderAPIClient:
                 "data": None
             }
 
-    def get_stock_location_by_id(self, stock_id: int) -> Dict[str, Any]:
+    async def get_stock_location_by_id(self, stock_id: int) -> Dict[str, Any]:
         """
         获取取刀柜库位详情（单个）
         调用外部接口：/qw/knife/web/from/mes/cabinetStock/stockLocTakeInfoById
@@ -1389,7 +1454,7 @@ class TeamLeaderAPIClient:
         """
         try:
             # 调用外部接口
-            response = self.session.get(
+            response = await self.session.get(
                 f"{self.base_url}/qw/knife/web/from/mes/cabinetStock/stockLocTakeInfoById",
                 params={"stockId": stock_id},
                 timeout=10
@@ -1414,8 +1479,8 @@ class TeamLeaderAPIClient:
                 "data": data
             }
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"获取库位详情失败: {e}")
+        except httpx.HTTPError as e:
+            logger.error("获取库位详情失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"调用外部接口失败: {str(e)}",
@@ -1423,7 +1488,7 @@ class TeamLeaderAPIClient:
                 "data": None
             }
 
-    def get_waste_knife_recycle_info(self, params: Dict[str, Any]) -> Dict[str, Any]:
+    async def get_waste_knife_recycle_info(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """
         获取废刀回收统计信息（收刀柜还刀信息）
         调用外部接口：/qw/knife/web/from/mes/lend/getLendByStock
@@ -1450,7 +1515,7 @@ class TeamLeaderAPIClient:
             query_params = {k: v for k, v in params.items() if v is not None}
 
             # 调用外部接口
-            response = self.session.get(
+            response = await self.session.get(
                 f"{self.base_url}/qw/knife/web/from/mes/lend/getLendByStock",
                 params=query_params,
                 timeout=10
@@ -1468,8 +1533,8 @@ class TeamLeaderAPIClient:
                 "data": external_data.get("data")
             }
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"获取废刀回收统计信息失败: {e}")
+        except httpx.HTTPError as e:
+            logger.error("获取废刀回收统计信息失败: %s", e)
             return {
                 "code": 500,
                 "msg": f"调用外部接口失败: {str(e)}",
@@ -1482,7 +1547,7 @@ class TeamLeaderAPIClient:
     # 来源: teamleader_record/api_client.py
 
     # 补货记录API客户端 (班组长)
-    def get_replenish_records(self,
+    async def get_replenish_records(self,
                               current: Optional[int] = None,
                               endTime: Optional[str] = None,
                               order: Optional[int] = None,
@@ -1560,10 +1625,10 @@ class TeamLeaderAPIClient:
             params["startTime"] = startTime
 
         try:
-            response = self.session.get(url, params=params)
+            response = await self.session.get(url, params=params)
             response.raise_for_status()
             return response.json()
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             return {
                 "code": -1,
                 "msg": f"请求失败: {str(e)}",
@@ -1579,12 +1644,12 @@ class TeamLeaderAPIClient:
                 "success": False
             }
 
-    def export_replenish_records(self,
+    async def export_replenish_records(self,
                                  endTime: Optional[str] = None,
                                  order: Optional[int] = None,
                                  rankingType: Optional[int] = None,
                                  recordStatus: Optional[int] = None,
-                                 startTime: Optional[str] = None) -> bytes:
+                                 startTime: Optional[str] = None) -> AsyncIterator[bytes]:
         """
         导出补货记录 (班组长)
 
@@ -1596,7 +1661,7 @@ class TeamLeaderAPIClient:
             startTime: 开始时间
 
         Returns:
-            bytes: 导出的Excel文件内容，包含以下字段：
+            AsyncIterator[bytes]: 分块读取的Excel文件内容，包含以下字段：
                 - lendUserName: 取出人
                 - storageUserName: 暂存人
                 - brandName: 品牌名称
@@ -1640,14 +1705,14 @@ class TeamLeaderAPIClient:
             params["startTime"] = startTime
 
         try:
-            response = self.session.get(url, params=params)
-            response.raise_for_status()
-            return response.content
-        except requests.RequestException as e:
+            # 流式读取上游文件，内存占用与文件大小无关
+            response = await self.session.open_stream(url, params=params)
+            return iter_stream(response)
+        except httpx.HTTPError as e:
             raise Exception(f"导出失败: {str(e)}")
 
     # 领刀记录API客户端 (班组长)
-    def get_lend_records(self,
+    async def get_lend_records(self,
                          current: int = 1,
                          size: int = 20,
                          keyword: Optional[str] = None,
@@ -1698,10 +1763,10 @@ class TeamLeaderAPIClient:
             params["recordStatus"] = recordStatus
 
         try:
-            response = self.session.get(url, params=params)
+            response = await self.session.get(url, params=params)
             response.raise_for_status()
             return response.json()
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             return {
                 "code": -1,
                 "msg": f"请求失败: {str(e)}",
@@ -1717,12 +1782,12 @@ class TeamLeaderAPIClient:
                 "success": False
             }
 
-    def export_lend_records(self,
+    async def export_lend_records(self,
                             endTime: Optional[str] = None,
                             order: Optional[int] = None,
                             rankingType: Optional[int] = None,
                             recordStatus: Optional[int] = None,
-                            startTime: Optional[str] = None) -> bytes:
+                            startTime: Optional[str] = None) -> AsyncIterator[bytes]:
         """
         导出领刀记录 (班组长)
 
@@ -1734,7 +1799,7 @@ class TeamLeaderAPIClient:
             startTime: 开始时间
 
         Returns:
-            bytes: 导出的文件内容
+            AsyncIterator[bytes]: 分块读取的导出文件内容
         """
         url = urljoin(self.base_url, "/qw/knife/web/from/mes/record/exportLendRecord/teamleader")
 
@@ -1753,14 +1818,14 @@ class TeamLeaderAPIClient:
             params["startTime"] = startTime
 
         try:
-            response = self.session.get(url, params=params)
-            response.raise_for_status()
-            return response.content
-        except requests.RequestException as e:
+            # 流式读取上游文件，内存占用与文件大小无关
+            response = await self.session.open_stream(url, params=params)
+            return iter_stream(response)
+        except httpx.HTTPError as e:
             raise Exception(f"导出失败: {str(e)}")
 
     # 告警预警API客户端 (班组长)
-    def list_alarm_warning(self,
+    async def list_alarm_warning(self,
                            locSurplus: Optional[int] = None,
                            alarmLevel: Optional[int] = None,
                            deviceType: Optional[str] = None,
@@ -1808,10 +1873,10 @@ class TeamLeaderAPIClient:
             params["size"] = size
 
         try:
-            response = self.session.get(url, params=params)
+            response = await self.session.get(url, params=params)
             response.raise_for_status()
             return response.json()
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             return {
                 "code": -1,
                 "msg": f"请求失败: {str(e)}",
@@ -1827,7 +1892,8 @@ class TeamLeaderAPIClient:
                 "success": False
             }
 
-    def get_alarm_statistics(self) -> Dict[str, Any]:
+    @cached("alarm_statistics", ttl=30)
+    async def get_alarm_statistics(self) -> Dict[str, Any]:
         """
         获取告警统计信息 (班组长)
 
@@ -1837,10 +1903,10 @@ class TeamLeaderAPIClient:
         url = urljoin(self.base_url, "/qw/knife/web/from/mes/alarm/warning/statistics/teamleader")
 
         try:
-            response = self.session.get(url)
+            response = await self.session.get(url)
             response.raise_for_status()
             return response.json()
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             return {
                 "code": -1,
                 "msg": f"请求失败: {str(e)}",
@@ -1853,7 +1919,7 @@ class TeamLeaderAPIClient:
                 "success": False
             }
 
-    def update_alarm_threshold(self,
+    async def update_alarm_threshold(self,
                                locSurplus: int,
                                alarmThreshold: int) -> Dict[str, Any]:
         """
@@ -1874,10 +1940,12 @@ class TeamLeaderAPIClient:
         }
 
         try:
-            response = self.session.post(url, json=data)
+            response = await self.session.post(url, json=data)
             response.raise_for_status()
+            # 告警状态变化后，告警统计缓存失效
+            self.response_cache.invalidate("alarm_statistics")
             return response.json()
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             return {
                 "code": -1,
                 "msg": f"请求失败: {str(e)}",
@@ -1885,7 +1953,7 @@ class TeamLeaderAPIClient:
                 "success": False
             }
 
-    def handle_alarm_warning(self,
+    async def handle_alarm_warning(self,
                              id: int,
                              handleStatus: int,
                              handleRemark: Optional[str] = None) -> Dict[str, Any]:
@@ -1910,10 +1978,12 @@ class TeamLeaderAPIClient:
             data["handleRemark"] = handleRemark
 
         try:
-            response = self.session.post(url, json=data)
+            response = await self.session.post(url, json=data)
             response.raise_for_status()
+            # 告警状态变化后，告警统计缓存失效
+            self.response_cache.invalidate("alarm_statistics")
             return response.json()
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             return {
                 "code": -1,
                 "msg": f"请求失败: {str(e)}",
@@ -1921,7 +1991,7 @@ class TeamLeaderAPIClient:
                 "success": False
             }
 
-    def batch_handle_alarm_warning(self,
+    async def batch_handle_alarm_warning(self,
                                    ids: List[int],
                                    handleStatus: int,
                                    handleRemark: Optional[str] = None) -> Dict[str, Any]:
@@ -1947,10 +2017,12 @@ class TeamLeaderAPIClient:
             data["handleRemark"] = handleRemark
 
         try:
-            response = self.session.post(url, json=data)
+            response = await self.session.post(url, json=data)
             response.raise_for_status()
+            # 告警状态变化后，告警统计缓存失效
+            self.response_cache.invalidate("alarm_statistics")
             return response.json()
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             return {
                 "code": -1,
                 "msg": f"请求失败: {str(e)}",
@@ -1958,13 +2030,13 @@ class TeamLeaderAPIClient:
                 "success": False
             }
 
-    def export_alarm_warning(self,
+    async def export_alarm_warning(self,
                              locSurplus: Optional[int] = None,
                              alarmLevel: Optional[int] = None,
                              deviceType: Optional[str] = None,
                              cabinetCode: Optional[str] = None,
                              brandName: Optional[str] = None,
-                             handleStatus: Optional[int] = None) -> bytes:
+                             handleStatus: Optional[int] = None) -> AsyncIterator[bytes]:
         """
         导出告警预警 (班组长)
 
@@ -1977,7 +2049,7 @@ class TeamLeaderAPIClient:
             handleStatus: 处理状态
 
         Returns:
-            bytes: 导出的文件内容
+            AsyncIterator[bytes]: 分块读取的导出文件内容
         """
         url = urljoin(self.base_url, "/qw/knife/web/from/mes/alarm/warning/export/teamleader")
 
@@ -1998,14 +2070,14 @@ class TeamLeaderAPIClient:
             params["handleStatus"] = handleStatus
 
         try:
-            response = self.session.get(url, params=params)
-            response.raise_for_status()
-            return response.content
-        except requests.RequestException as e:
+            # 流式读取上游文件，内存占用与文件大小无关
+            response = await self.session.open_stream(url, params=params)
+            return iter_stream(response)
+        except httpx.HTTPError as e:
             raise Exception(f"导出失败: {str(e)}")
 
     # 公共暂存记录API客户端 (班组长)
-    def get_storage_records(self,
+    async def get_storage_records(self,
                             current: Optional[int] = None,
                             endTime: Optional[str] = None,
                             order: Optional[int] = None,
@@ -2049,10 +2121,10 @@ class TeamLeaderAPIClient:
             params["startTime"] = startTime
 
         try:
-            response = self.session.get(url, params=params)
+            response = await self.session.get(url, params=params)
             response.raise_for_status()
             return response.json()
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             return {
                 "code": -1,
                 "msg": f"请求失败: {str(e)}",
@@ -2068,12 +2140,12 @@ class TeamLeaderAPIClient:
                 "success": False
             }
 
-    def export_storage_records(self,
+    async def export_storage_records(self,
                                endTime: Optional[str] = None,
                                order: Optional[int] = None,
                                rankingType: Optional[int] = None,
                                recordStatus: Optional[int] = None,
-                               startTime: Optional[str] = None) -> bytes:
+                               startTime: Optional[str] = None) -> AsyncIterator[bytes]:
         """
         导出公共暂存记录 (班组长)
 
@@ -2085,7 +2157,7 @@ class TeamLeaderAPIClient:
             startTime: 开始时间
 
         Returns:
-            bytes: 导出的文件内容
+            AsyncIterator[bytes]: 分块读取的导出文件内容
         """
         url = urljoin(self.base_url, "/qw/knife/web/from/mes/record/exportStorageRecord/teamleader")
 
@@ -2104,31 +2176,28 @@ class TeamLeaderAPIClient:
             params["startTime"] = startTime
 
         try:
-            response = self.session.get(url, params=params)
-            response.raise_for_status()
-            return response.content
-        except requests.RequestException as e:
+            # 流式读取上游文件，内存占用与文件大小无关
+            response = await self.session.open_stream(url, params=params)
+            return iter_stream(response)
+        except httpx.HTTPError as e:
             raise Exception(f"导出失败: {str(e)}")
 
 
-# 初始化API客户端
-# 使用配置文件的设置
-try:
-    from config.config import settings
-
-    # 优先使用环境变量ORIGINAL_API_KEY
-    # 其次尝试从token.txt文件读取
-    api_key = settings.ORIGINAL_API_KEY if settings.ORIGINAL_API_KEY else None
-
-    teamleader_api_client = TeamLeaderAPIClient(
-        base_url=settings.ORIGINAL_API_BASE_URL,
-        api_key=api_key,
-        token_file=settings.TOKEN_FILE_PATH
-    )
-except ImportError:
-    # 如果无法导入配置，使用默认配置
-    teamleader_api_client = TeamLeaderAPIClient(
-        base_url="http://39.38.115.114:8983",  # 请替换为你的真实API地址
-        api_key=None,
-        token_file="token.txt"
-    )
\ No newline at end of file
+# 默认API客户端（服务本身使用 routers.teamleader_router 中的实例）
+# 首次访问 teamleader_api_client 时才创建，导入本模块不会多建一套会话、Token和缓存
+_default_client: Optional[TeamLeaderAPIClient] = None
+
+
+def __getattr__(name):
+    global _default_client
+    if name != "teamleader_api_client":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    if _default_client is None:
+        # 优先使用环境变量ORIGINAL_API_KEY
+        # 其次尝试从token.txt文件读取
+        _default_client = TeamLeaderAPIClient(
+            base_url=settings.ORIGINAL_API_BASE_URL,
+            api_key=settings.ORIGINAL_API_KEY or None,
+            token_file=settings.TOKEN_FILE_PATH
+        )
+    return _default_client
@@ -0,0 +1,299 @@
+"""
+刀具耗材目录本地镜像
+定期从 /qw/knife/web/from/mes/cutter/list 同步全部耗材，在进程内维护
+价格有序索引和品牌/类型索引，使刀具查询（尤其是价格区间筛选）可在本地完成，
+返回正确的 total/pages，无需逐页请求MES
+"""
+import asyncio
+import bisect
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from utils.upstream_scheduler import PRIORITY_ANALYTICS, upstream_priority
+
+logger = logging.getLogger(__name__)
+
+# 拉取一页耗材：参数 (current, size)，返回上游原始响应
+FetchPage = Callable[[int, int], Awaitable[Dict[str, Any]]]
+
+
+class CutterCatalog:
+    """刀具耗材目录镜像"""
+
+    def __init__(self, fetch_page: FetchPage, page_size: int = 200,
+                 sync_interval: float = 60, max_staleness: float = 300, concurrency: int = 4):
+        """
+        参数：
+            fetch_page: 拉取一页耗材的协程函数
+            page_size: 同步时每页数量
+            sync_interval: 后台同步间隔（秒）
+            max_staleness: 超过该时长未同步成功则不再使用镜像（秒）
+            concurrency: 同步时并发拉取的页数
+        """
+        self.fetch_page = fetch_page
+        self.page_size = page_size
+        self.sync_interval = sync_interval
+        self.max_staleness = max_staleness
+        self.concurrency = concurrency
+
+        self._records: Dict[Any, Dict[str, Any]] = {}
+        # 上游返回顺序，查询结果保持与上游一致的排序
+        self._seq: Dict[Any, int] = {}
+        self._next_front_seq = -1
+        # (price, id) 有序列表，用于价格区间查询
+        self._by_price: List[Tuple[float, Any]] = []
+        self._by_brand: Dict[str, Set[Any]] = {}
+        self._by_type: Dict[str, Set[Any]] = {}
+
+        self.last_sync: Optional[float] = None
+        self._sync_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    # ==================== 状态 ====================
+
+    @property
+    def ready(self) -> bool:
+        """镜像至少同步成功一次，且未过期"""
+        return self.last_sync is not None and time.time() - self.last_sync < self.max_staleness
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    # ==================== 索引维护 ====================
+
+    def _index(self, cutter_id: Any, record: Dict[str, Any]):
+        price = record.get("price")
+        if price is not None:
+            bisect.insort(self._by_price, (float(price), cutter_id))
+        if record.get("brandName"):
+            self._by_brand.setdefault(record["brandName"], set()).add(cutter_id)
+        if record.get("cutterType"):
+            self._by_type.setdefault(record["cutterType"], set()).add(cutter_id)
+
+    def _unindex(self, cutter_id: Any, record: Dict[str, Any]):
+        price = record.get("price")
+        if price is not None:
+            i = bisect.bisect_left(self._by_price, (float(price), cutter_id))
+            if i < len(self._by_price) and self._by_price[i] == (float(price), cutter_id):
+                del self._by_price[i]
+        for index, field in ((self._by_brand, "brandName"), (self._by_type, "cutterType")):
+            value = record.get(field)
+            if value and value in index:
+                index[value].discard(cutter_id)
+                if not index[value]:
+                    del index[value]
+
+    def upsert(self, record: Dict[str, Any], seq: Optional[int] = None) -> bool:
+        """
+        新增或更新一条耗材记录，仅在内容变化时更新索引
+
+        返回：
+            True 表示记录有变化
+        """
+        cutter_id = record.get("id")
+        if cutter_id is None:
+            return False
+        if seq is None:
+            seq = self._seq.get(cutter_id)
+            if seq is None:
+                # 新记录排在最前，与上游按创建时间倒序一致
+                seq = self._next_front_seq
+                self._next_front_seq -= 1
+        self._seq[cutter_id] = seq
+
+        old = self._records.get(cutter_id)
+        if old == record:
+            return False
+        if old is not None:
+            self._unindex(cutter_id, old)
+        self._records[cutter_id] = record
+        self._index(cutter_id, record)
+        return True
+
+    def remove(self, cutter_id: Any) -> bool:
+        old = self._records.pop(cutter_id, None)
+        self._seq.pop(cutter_id, None)
+        if old is None:
+            return False
+        self._unindex(cutter_id, old)
+        return True
+
+    def remove_ids(self, ids: Iterable[Any]):
+        """按ID删除（兼容字符串和整数ID）"""
+        for raw in ids:
+            candidates = [raw]
+            if isinstance(raw, str) and raw.strip().isdigit():
+                candidates.append(int(raw.strip()))
+            for cutter_id in candidates:
+                self.remove(cutter_id)
+
+    # ==================== 同步 ====================
+
+    async def _fetch_records(self, current: int) -> Tuple[List[Dict[str, Any]], int]:
+        result = await self.fetch_page(current, self.page_size)
+        if not result.get("success") or not isinstance(result.get("data"), dict):
+            raise RuntimeError(result.get("msg") or "拉取刀具耗材失败")
+        data = result["data"]
+        return data.get("records") or [], data.get("pages") or 0
+
+    async def sync(self) -> Dict[str, int]:
+        """
+        全量对比同步：拉取所有页，只对变化的记录更新索引，并移除上游已删除的记录
+
+        上游列表接口不支持按更新时间筛选，因此每次都需要拉取全部页面，
+        但本地索引按记录增量维护，查询不会因同步而中断
+
+        返回：
+            changed/removed/total 统计
+        """
+        async with self._sync_lock:
+            first, pages = await self._fetch_records(1)
+            page_records = {1: first}
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def fetch(current: int):
+                async with semaphore:
+                    page_records[current] = (await self._fetch_records(current))[0]
+
+            await asyncio.gather(*(fetch(p) for p in range(2, pages + 1)))
+
+            seen = set()
+            changed = 0
+            seq = 0
+            for current in sorted(page_records):
+                for record in page_records[current]:
+                    cutter_id = record.get("id")
+                    if cutter_id is None or cutter_id in seen:
+                        continue
+                    seen.add(cutter_id)
+                    if self.upsert(record, seq=seq):
+                        changed += 1
+                    seq += 1
+
+            removed = 0
+            for cutter_id in [i for i in self._records if i not in seen]:
+                self.remove(cutter_id)
+                removed += 1
+
+            self.last_sync = time.time()
+            logger.info("刀具耗材镜像同步完成: 共%s条，变化%s条，删除%s条", len(self._records), changed, removed)
+            return {"changed": changed, "removed": removed, "total": len(self._records)}
+
+    async def _run(self):
+        # 后台同步的上游请求排在页面查询之后
+        with upstream_priority(PRIORITY_ANALYTICS):
+            await self._loop()
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("刀具耗材镜像同步失败: %s", e)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.sync_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def request_sync(self):
+        """提前触发一次后台同步（写操作未返回完整记录时使用）"""
+        self._wakeup.set()
+
+    def start(self):
+        """启动后台同步任务（需在事件循环中调用）"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # ==================== 查询 ====================
+
+    @staticmethod
+    def _match_keys(index: Dict[str, Set[Any]], keyword: str) -> Set[Any]:
+        """品牌/类型模糊匹配：精确命中直接返回，否则合并所有包含关键字的索引项"""
+        if keyword in index:
+            return set(index[keyword])
+        ids: Set[Any] = set()
+        for value, value_ids in index.items():
+            if keyword in value:
+                ids |= value_ids
+        return ids
+
+    def _price_range(self, min_price: Optional[float], max_price: Optional[float]) -> Set[Any]:
+        price_of = lambda entry: entry[0]
+        lo = 0 if min_price is None else bisect.bisect_left(self._by_price, float(min_price), key=price_of)
+        hi = len(self._by_price) if max_price is None else \
+            bisect.bisect_right(self._by_price, float(max_price), key=price_of)
+        return {cutter_id for _, cutter_id in self._by_price[lo:hi]}
+
+    def query(self, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        本地查询刀具耗材，返回与上游一致的分页结构
+
+        参数与 TeamLeaderAPIClient.get_cutter_list 相同：
+            brandName/cutterType/cutterCode/cabinetName 模糊匹配，
+            createTime/createUser 精确匹配，minPrice/maxPrice 为闭区间
+        """
+        params = params or {}
+        current = params.get("current") or 1
+        size = params.get("size") or 10
+
+        candidates: Optional[Set[Any]] = None
+
+        def narrow(ids: Set[Any]):
+            nonlocal candidates
+            candidates = ids if candidates is None else candidates & ids
+
+        if params.get("minPrice") is not None or params.get("maxPrice") is not None:
+            narrow(self._price_range(params.get("minPrice"), params.get("maxPrice")))
+        if params.get("brandName"):
+            narrow(self._match_keys(self._by_brand, params["brandName"]))
+        if params.get("cutterType"):
+            narrow(self._match_keys(self._by_type, params["cutterType"]))
+
+        ids = self._records.keys() if candidates is None else candidates
+        records = [self._records[i] for i in ids]
+
+        if params.get("cutterCode"):
+            records = [r for r in records if params["cutterCode"] in (r.get("cutterCode") or "")]
+        if params.get("createTime"):
+            records = [r for r in records if r.get("createTime") == params["createTime"]]
+        if params.get("createUser") is not None:
+            records = [r for r in records if str(r.get("createUser")) == str(params["createUser"])]
+        if params.get("cabinetName"):
+            keyword = params["cabinetName"]
+            records = [
+                r for r in records
+                if any(keyword in (c.get("cabinetName") or "") for c in (r.get("cabinetList") or []))
+            ]
+
+        records.sort(key=lambda r: self._seq.get(r.get("id"), 0))
+        total = len(records)
+        start = (current - 1) * size
+
+        return {
+            "code": 200,
+            "msg": "操作成功",
+            "success": True,
+            "data": {
+                "current": current,
+                "size": size,
+                "total": total,
+                "pages": (total + size - 1) // size if size > 0 else 0,
+                "records": records[start:start + size],
+                "searchCount": True,
+                "hitCount": False
+            }
+        }
@@ -1,4 +1,33 @@
-"""Utils工具包"""
-from .token_manager import TokenManager, refresh_token
+"""Utils工具包
 
-__all__ = ['TokenManager', 'refresh_token']
+导出的名称按需导入（PEP 562）：导入任一子模块（如 utils.admission）时不再连带导入全部工具模块
+"""
+import importlib
+
+# 导出名称 -> 所在子模块
+_EXPORTS = {
+    'TokenManager': 'token_manager', 'refresh_token': 'token_manager',
+    'UpstreamSession': 'http_client', 'create_async_session': 'http_client', 'iter_stream': 'http_client',
+    'SingleFlight': 'singleflight',
+    'CircuitBreaker': 'circuit_breaker', 'CircuitBreakerRegistry': 'circuit_breaker',
+    'CircuitOpenError': 'circuit_breaker',
+    'RetryPolicy': 'retry', 'HedgePolicy': 'retry', 'HedgeBudget': 'retry', 'hedge_budget': 'retry',
+    'UpstreamScheduler': 'upstream_scheduler', 'upstream_scheduler': 'upstream_scheduler',
+    'upstream_priority': 'upstream_scheduler',
+    'ResponseCache': 'response_cache', 'MemoryCacheBackend': 'response_cache', 'cached': 'response_cache',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
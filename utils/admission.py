@@ -0,0 +1,206 @@
+"""
+接口准入控制（过载保护）
+按路由限制同时处理的请求数，超出的请求排队；排队数或预计等待时间超过阈值时
+直接返回 503 和 Retry-After，使已接收请求的响应时间保持在可控范围内
+"""
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, Optional
+
+from fastapi.responses import JSONResponse
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config.config import settings
+from utils.server_timing import add_timing
+
+# 不做准入控制的路径（健康检查、文档、指标）
+DEFAULT_EXEMPT_PATHS = ("/", "/health", "/metrics", "/docs", "/redoc", "/openapi.json", "/docs/oauth2-redirect")
+
+# 处理耗时滑动平均的平滑系数
+SERVICE_TIME_ALPHA = 0.2
+
+
+class RouteGate:
+    """单个路由的并发名额和等待队列（仅在事件循环线程内使用）"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.service_time = 0.0
+        self.admitted = 0
+        self.shed = 0
+
+    def predicted_wait(self) -> float:
+        """按平均处理耗时估算新请求的排队时间（秒）"""
+        return (len(self.waiters) + 1) / max(self.limit, 1) * self.service_time
+
+    def release(self):
+        self.active -= 1
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self.active += 1
+                break
+
+    def discard(self, waiter: asyncio.Future):
+        """放弃排队（超时或客户端断开）"""
+        waiter.cancel()
+        try:
+            self.waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def observe(self, seconds: float):
+        if self.service_time == 0.0:
+            self.service_time = seconds
+        else:
+            self.service_time += SERVICE_TIME_ALPHA * (seconds - self.service_time)
+
+
+class AdmissionController:
+    """按路由的准入控制器"""
+
+    def __init__(self, route_concurrency: Optional[int] = None, queue_depth: Optional[int] = None,
+                 max_wait: Optional[float] = None, retry_after: Optional[int] = None):
+        """
+        参数：
+            route_concurrency: 每个路由同时处理的请求数，默认取 ADMISSION_ROUTE_CONCURRENCY
+            queue_depth: 每个路由的最大排队数，默认取 ADMISSION_QUEUE_DEPTH
+            max_wait: 最长排队时间（秒），预计或实际超过时拒绝，默认取 ADMISSION_MAX_WAIT
+            retry_after: Retry-After 的最小秒数，默认取 ADMISSION_RETRY_AFTER
+        """
+        self.route_concurrency = route_concurrency or settings.ADMISSION_ROUTE_CONCURRENCY
+        self.queue_depth = settings.ADMISSION_QUEUE_DEPTH if queue_depth is None else queue_depth
+        self.max_wait = settings.ADMISSION_MAX_WAIT if max_wait is None else max_wait
+        self.retry_after = settings.ADMISSION_RETRY_AFTER if retry_after is None else retry_after
+        self.gates: Dict[str, RouteGate] = {}
+
+    def gate(self, route_key: str) -> RouteGate:
+        gate = self.gates.get(route_key)
+        if gate is None:
+            gate = self.gates[route_key] = RouteGate(self.route_concurrency)
+        return gate
+
+    def retry_after_seconds(self, gate: RouteGate) -> int:
+        return max(self.retry_after, math.ceil(gate.predicted_wait()))
+
+    async def admit(self, gate: RouteGate) -> bool:
+        """
+        申请处理名额
+
+        返回：
+            True 已获得名额（处理完后需调用 gate.release()）；False 应拒绝该请求
+        """
+        if gate.active < gate.limit and not gate.waiters:
+            gate.active += 1
+            gate.admitted += 1
+            return True
+        if len(gate.waiters) >= self.queue_depth or gate.predicted_wait() > self.max_wait:
+            gate.shed += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        gate.waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                gate.discard(waiter)
+                gate.shed += 1
+                return False
+        except asyncio.CancelledError:
+            # 客户端断开：已分到的名额交还给下一个请求
+            if waiter.done() and not waiter.cancelled():
+                gate.release()
+            else:
+                gate.discard(waiter)
+            raise
+        gate.admitted += 1
+        return True
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        获取各路由的准入统计
+
+        返回：
+            路由 -> active/waiting/admitted/shed/serviceTime
+        """
+        return {
+            key: {
+                "active": gate.active,
+                "waiting": len(gate.waiters),
+                "admitted": gate.admitted,
+                "shed": gate.shed,
+                "serviceTime": round(gate.service_time, 4)
+            }
+            for key, gate in self.gates.items()
+        }
+
+
+def route_key(scope: Scope) -> Optional[str]:
+    """请求对应的路由模板（如 GET /api/v1/auditor/export_jobs/{job_id}），未匹配任何路由时返回None"""
+    app = scope.get("app")
+    router = getattr(app, "router", None)
+    for route in getattr(router, "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return f"{scope['method']} {getattr(route, 'path', scope['path'])}"
+    return None
+
+
+class AdmissionMiddleware:
+    """ASGI 中间件：按路由准入，过载时返回 503 + Retry-After"""
+
+    def __init__(self, app: ASGIApp, controller: Optional[AdmissionController] = None,
+                 exempt_paths: Iterable[str] = DEFAULT_EXEMPT_PATHS):
+        self.app = app
+        self.controller = controller or AdmissionController()
+        self.exempt_paths = set(exempt_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not settings.ADMISSION_ENABLED or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+        key = route_key(scope)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+
+        gate = self.controller.gate(key)
+        queued = time.monotonic()
+        admitted = await self.controller.admit(gate)
+        add_timing("queue", time.monotonic() - queued)
+        if not admitted:
+            response = JSONResponse(
+                status_code=503,
+                content={
+                    "code": 503,
+                    "msg": "服务繁忙，请稍后重试",
+                    "success": False,
+                    "data": None
+                },
+                headers={"Retry-After": str(self.controller.retry_after_seconds(gate))}
+            )
+            await response(scope, receive, send)
+            return
+
+        started = time.monotonic()
+        responded: Optional[float] = None
+
+        async def send_wrapper(message: Message):
+            nonlocal responded
+            if message["type"] == "http.response.start" and responded is None:
+                responded = time.monotonic()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # 处理耗时只计到响应头发出：流式导出的下载时长取决于客户端网速，计入会抬高预计等待时间而误拒请求
+            gate.observe((responded or time.monotonic()) - started)
+            gate.release()
@@ -0,0 +1,222 @@
+"""
+分析库预聚合
+在记录写入分析库时同步维护按天的排行汇总和按月的取刀汇总：
+排行查询只扫描时间窗口内的汇总行，再用堆选出前K名；年度图表直接读取12个月份桶，
+耗时与历史数据量无关。汇总行同时记录条数，用于与原始记录的 COUNT(*) 核对
+"""
+import heapq
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+from config.config import settings
+from utils.analytics_store import AnalyticsExtension, AnalyticsStore, RECORD_KINDS, first_value, normalize_time
+
+# 排行维度 -> 领刀记录中的分组字段
+RANKING_DIMENSIONS = {
+    "device": "cabinetCode",
+    "knife_model": "cutterCode",
+    "employee": "lendUserName",
+}
+
+# 违规还刀的记录状态，异常还刀排行按员工统计该状态的记录
+ERROR_RETURN_STATUS = 5
+
+# 汇总表中表示“无状态”的取值（主键列不使用NULL）
+_NO_STATUS = -1
+
+
+def lend_contribution(record: Dict[str, Any]):
+    """
+    单条领刀记录对汇总的贡献
+
+    返回：
+        (日期, 状态, 数量, 金额)；缺少时间的记录返回None
+    """
+    created = normalize_time(first_value(record, RECORD_KINDS["lend"]["time"]))
+    if not created:
+        return None
+    status = record.get("recordStatus")
+    quantity = record.get("quantity") or 1
+    amount = (record.get("price") or 0) * quantity
+    return created[:10], _NO_STATUS if status is None else int(status), quantity, amount
+
+
+class DailyRankingRollup(AnalyticsExtension):
+    """按天、状态、维度汇总的领刀条数、数量和金额"""
+    name = "lend_daily_rollup_v2"
+
+    def create(self, conn: sqlite3.Connection):
+        conn.execute("DROP TABLE IF EXISTS lend_daily_rollup")
+        conn.execute("""
+            CREATE TABLE lend_daily_rollup (
+                dimension TEXT NOT NULL,
+                day TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                key TEXT NOT NULL,
+                records INTEGER NOT NULL DEFAULT 0,
+                quantity REAL NOT NULL DEFAULT 0,
+                amount REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (dimension, day, status, key)
+            )
+        """)
+
+    def apply(self, conn: sqlite3.Connection, kind: str,
+              old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]):
+        if kind != "lend":
+            return
+        for sign, record in ((-1, old), (1, new)):
+            if record is None:
+                continue
+            contribution = lend_contribution(record)
+            if contribution is None:
+                continue
+            day, status, quantity, amount = contribution
+            for dimension, field in RANKING_DIMENSIONS.items():
+                key = record.get(field)
+                if key in (None, ""):
+                    continue
+                conn.execute(
+                    """INSERT INTO lend_daily_rollup (dimension, day, status, key, records, quantity, amount)
+                       VALUES (?, ?, ?, ?, ?, ?, ?)
+                       ON CONFLICT(dimension, day, status, key) DO UPDATE SET
+                           records = records + excluded.records,
+                           quantity = quantity + excluded.quantity,
+                           amount = amount + excluded.amount""",
+                    (dimension, day, status, str(key), sign, sign * quantity, sign * amount)
+                )
+
+    def verify(self, conn: sqlite3.Connection) -> List[str]:
+        totals = dict(conn.execute("SELECT dimension, SUM(records) FROM lend_daily_rollup GROUP BY dimension").fetchall())
+        problems = []
+        for dimension, field in RANKING_DIMENSIONS.items():
+            expected = conn.execute(
+                "SELECT COUNT(*) FROM lend_records WHERE create_time IS NOT NULL "
+                "AND json_extract(data, ?) IS NOT NULL AND json_extract(data, ?) != ''",
+                (f"$.{field}", f"$.{field}")
+            ).fetchone()[0]
+            actual = totals.get(dimension) or 0
+            if actual != expected:
+                problems.append(f"{dimension} 汇总{actual}条，原始记录{expected}条")
+        return problems
+
+
+def query_ranking(store: AnalyticsStore, dimension: str, params: Dict[str, Any],
+                  limit: Optional[int] = None) -> Dict[str, Any]:
+    """
+    从按天汇总中计算排行
+
+    参数：
+        store: 本地分析库
+        dimension: 排行维度 device/knife_model/employee
+        params: 排行接口参数：startTime/endTime（按天取整）、rankingType（1 为金额，其他为数量）、
+                order（1 为从小到大）、recordStatus
+        limit: 返回前几名，默认取 ANALYTICS_RANKING_TOP_K
+    返回：
+        与上游排行接口一致的 titleList/dataList 结构
+    """
+    metric = "amount" if params.get("rankingType") == 1 else "quantity"
+    where, args = ["dimension = ?"], [dimension]
+    start_time = normalize_time(params.get("startTime"))
+    end_time = normalize_time(params.get("endTime"), end_of_day=True)
+    if start_time:
+        where.append("day >= ?")
+        args.append(start_time[:10])
+    if end_time:
+        where.append("day <= ?")
+        args.append(end_time[:10])
+    if params.get("recordStatus") is not None:
+        where.append("status = ?")
+        args.append(int(params["recordStatus"]))
+
+    rows = store.execute(
+        f"SELECT key, SUM({metric}) AS total FROM lend_daily_rollup WHERE {' AND '.join(where)} "
+        f"GROUP BY key HAVING SUM(records) > 0",
+        args
+    )
+    select = heapq.nsmallest if params.get("order") == 1 else heapq.nlargest
+    top = select(limit or settings.ANALYTICS_RANKING_TOP_K, rows, key=lambda row: (row["total"], row["key"]))
+
+    def value(total: float):
+        return round(total, 2) if metric == "amount" else int(round(total))
+
+    return {
+        "code": 200,
+        "msg": "操作成功",
+        "success": True,
+        "data": {
+            "titleList": [row["key"] for row in top],
+            "dataList": [value(row["total"]) for row in top]
+        }
+    }
+
+
+class MonthlyLendRollup(AnalyticsExtension):
+    """按月汇总的取刀条数、数量和金额，每条记录变更只更新一个月份桶"""
+    name = "lend_monthly_rollup_v2"
+
+    def create(self, conn: sqlite3.Connection):
+        conn.execute("DROP TABLE IF EXISTS lend_monthly_rollup")
+        conn.execute("""
+            CREATE TABLE lend_monthly_rollup (
+                month TEXT PRIMARY KEY,
+                records INTEGER NOT NULL DEFAULT 0,
+                quantity REAL NOT NULL DEFAULT 0,
+                amount REAL NOT NULL DEFAULT 0
+            )
+        """)
+
+    def apply(self, conn: sqlite3.Connection, kind: str,
+              old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]):
+        if kind != "lend":
+            return
+        for sign, record in ((-1, old), (1, new)):
+            if record is None:
+                continue
+            contribution = lend_contribution(record)
+            if contribution is None:
+                continue
+            day, _, quantity, amount = contribution
+            conn.execute(
+                """INSERT INTO lend_monthly_rollup (month, records, quantity, amount) VALUES (?, ?, ?, ?)
+                   ON CONFLICT(month) DO UPDATE SET
+                       records = records + excluded.records,
+                       quantity = quantity + excluded.quantity,
+                       amount = amount + excluded.amount""",
+                (day[:7], sign, sign * quantity, sign * amount)
+            )
+
+    def verify(self, conn: sqlite3.Connection) -> List[str]:
+        actual = conn.execute("SELECT COALESCE(SUM(records), 0) FROM lend_monthly_rollup").fetchone()[0]
+        expected = conn.execute("SELECT COUNT(*) FROM lend_records WHERE create_time IS NOT NULL").fetchone()[0]
+        return [] if actual == expected else [f"汇总{actual}条，原始记录{expected}条"]
+
+
+def query_year_chart(store: AnalyticsStore, year: int, metric: str) -> Dict[str, Any]:
+    """
+    读取某年12个月的取刀汇总
+
+    参数：
+        store: 本地分析库
+        year: 年份
+        metric: quantity 取刀数量 / amount 取刀金额
+    返回：
+        与上游图表接口一致的 titleList/dataList 结构
+    """
+    rows = store.execute(
+        f"SELECT month, {metric} AS total FROM lend_monthly_rollup WHERE month BETWEEN ? AND ?",
+        (f"{year:04d}-01", f"{year:04d}-12")
+    )
+    totals = {row["month"]: row["total"] for row in rows}
+    data_list = []
+    for month in range(1, 13):
+        total = totals.get(f"{year:04d}-{month:02d}", 0)
+        data_list.append(round(total, 2) if metric == "amount" else int(round(total)))
+    return {
+        "code": 200,
+        "msg": "操作成功",
+        "success": True,
+        "data": {
+            "titleList": [f"{month}月" for month in range(1, 13)],
+            "dataList": data_list
+        }
+    }
@@ -0,0 +1,515 @@
+"""
+本地分析库（SQLite）
+通过记录列表接口按 createTime 水位增量同步领刀、补货、暂存记录，
+在本地建立时间、人员、部门、刀柜、状态索引，使列表和统计查询不再依赖MES实时计算。
+同机多个 worker 共用同一个库文件：写入使用 BEGIN IMMEDIATE 事务，同步任务通过共享状态租约只在一个进程中执行，
+其他进程从库中的同步状态判断本地数据是否可用
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from config.config import settings
+from utils.shared_state import SharedStateStore, shared_state_store
+
+logger = logging.getLogger(__name__)
+
+# 拉取一页记录：参数 (current, size, startTime, endTime)，返回上游原始响应
+FetchPage = Callable[[int, int, Optional[str], Optional[str]], Awaitable[Dict[str, Any]]]
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# 各记录类型的索引字段来源：按顺序取第一个非空字段
+RECORD_KINDS: Dict[str, Dict[str, Tuple[str, ...]]] = {
+    "lend": {
+        "time": ("createTime", "lendTime"),
+        "update": ("updateTime", "finalCollectTime", "borrowTime", "createTime", "lendTime"),
+        "user": ("lendUserName",),
+        "dept": ("deptName", "department", "createDept"),
+        "cabinet": ("cabinetCode",),
+        "status": ("recordStatus",),
+    },
+    "replenish": {
+        "time": ("createTime",),
+        "update": ("updateTime", "createTime"),
+        "user": ("operator", "lendUserName"),
+        "dept": ("deptName", "department", "createDept"),
+        "cabinet": ("cabinetCode",),
+        "status": ("status",),
+    },
+    "storage": {
+        "time": ("createTime",),
+        "update": ("updateTime", "createTime"),
+        "user": ("storageUserName", "operator"),
+        "dept": ("deptName", "department", "createDept"),
+        "cabinet": ("cabinetCode",),
+        "status": ("status",),
+    },
+}
+
+# 同步租约的最短有效期（秒）：持有者每写入一批记录续期一次，进程退出后由其他进程接手
+SYNC_LEASE_MIN_TTL = 300
+
+# 记录缺少主键时用于生成稳定ID的字段
+_FALLBACK_ID_FIELDS = ("lendUser", "lendUserName", "lendTime", "createTime", "cutterCode", "cabinetCode", "lendStock", "stockLoc")
+
+
+def first_value(record: Dict[str, Any], fields: Iterable[str]) -> Any:
+    """按顺序取记录中第一个非空字段的值"""
+    for field in fields:
+        value = record.get(field)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def normalize_time(value: Optional[str], end_of_day: bool = False) -> Optional[str]:
+    """将 YYYY-MM-DD 补全为 YYYY-MM-DD HH:mm:ss，便于按字符串比较时间"""
+    if not value:
+        return None
+    value = value.strip()
+    if len(value) == 10:
+        return f"{value} 23:59:59" if end_of_day else f"{value} 00:00:00"
+    return value
+
+
+def record_id(record: Dict[str, Any]) -> str:
+    """记录主键；上游未返回 id 时按业务字段生成稳定ID"""
+    if record.get("id") is not None:
+        return str(record["id"])
+    payload = json.dumps([record.get(f) for f in _FALLBACK_ID_FIELDS], ensure_ascii=False, default=str)
+    return "h:" + hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+@contextmanager
+def _immediate(conn: sqlite3.Connection):
+    """写事务：开始时即取得库文件的写锁，事务内先读后写不会与其他进程交错"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+class AnalyticsExtension:
+    """
+    分析库扩展（如预聚合表）
+
+    name 变化或首次加载时，分析库会调用 create 建表，并用已有记录回放一遍 apply；
+    verify 发现与原始记录不一致时同样重建
+    """
+    name = ""
+
+    def create(self, conn: sqlite3.Connection):
+        """建表；重建时也会调用，需清空已有数据"""
+        raise NotImplementedError
+
+    def verify(self, conn: sqlite3.Connection) -> List[str]:
+        """核对汇总与原始记录，返回不一致项的说明"""
+        return []
+
+    def apply(self, conn: sqlite3.Connection, kind: str,
+              old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]):
+        """记录变更：old 为旧记录（新增时为None），new 为新记录（删除时为None）"""
+        raise NotImplementedError
+
+
+class AnalyticsStore:
+    """SQLite 记录库，所有写入在同一把锁和同一个写事务内执行，异步调用方通过线程池访问"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.ANALYTICS_DB_PATH
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.extensions: List[AnalyticsExtension] = []
+        self._installed: set = set()
+
+    # ==================== 初始化 ====================
+
+    def open(self):
+        """打开库并安装扩展；上次安装扩展失败时再次调用会重试"""
+        if self._conn is None:
+            self._conn = self._connect()
+        for extension in self.extensions:
+            if extension.name not in self._installed:
+                self._install(extension)
+
+    def _connect(self) -> sqlite3.Connection:
+        # 自动提交模式，事务由 _immediate 显式开始
+        conn = sqlite3.connect(self.path, timeout=settings.ANALYTICS_BUSY_TIMEOUT,
+                               check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with _immediate(conn):
+            for kind in RECORD_KINDS:
+                conn.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {kind}_records (
+                        id TEXT PRIMARY KEY,
+                        create_time TEXT,
+                        update_time TEXT,
+                        user_name TEXT,
+                        dept TEXT,
+                        cabinet_code TEXT,
+                        status INTEGER,
+                        data TEXT NOT NULL
+                    )
+                """)
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{kind}_time ON {kind}_records(create_time)")
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{kind}_user ON {kind}_records(user_name, create_time)")
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{kind}_dept ON {kind}_records(dept, create_time)")
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{kind}_cabinet ON {kind}_records(cabinet_code, create_time)")
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{kind}_status ON {kind}_records(status, create_time)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    kind TEXT PRIMARY KEY,
+                    create_watermark TEXT,
+                    backfilled INTEGER NOT NULL DEFAULT 0,
+                    last_sync REAL
+                )
+            """)
+            conn.execute("CREATE TABLE IF NOT EXISTS extensions (name TEXT PRIMARY KEY)")
+        return conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self._installed.clear()
+
+    def add_extension(self, extension: AnalyticsExtension):
+        """注册扩展；分析库已打开时立即建表并回放已有记录"""
+        self.extensions.append(extension)
+        if self._conn is not None:
+            self._install(extension)
+
+    @staticmethod
+    def _rebuild(conn: sqlite3.Connection, extension: AnalyticsExtension):
+        """建表并用已有记录回放"""
+        extension.create(conn)
+        for kind in RECORD_KINDS:
+            for row in conn.execute(f"SELECT data FROM {kind}_records"):
+                extension.apply(conn, kind, None, json.loads(row["data"]))
+
+    def _install(self, extension: AnalyticsExtension):
+        # 检查、建表、回放和登记在同一个写事务中，多个进程同时启动时只有一个回放
+        with self._lock, _immediate(self._conn) as conn:
+            installed = conn.execute("SELECT 1 FROM extensions WHERE name = ?", (extension.name,)).fetchone()
+            if installed:
+                self._installed.add(extension.name)
+                return
+            self._rebuild(conn, extension)
+            conn.execute("INSERT INTO extensions (name) VALUES (?)", (extension.name,))
+        self._installed.add(extension.name)
+        logger.info("分析库扩展已就绪: %s", extension.name)
+
+    def verify_extensions(self) -> Dict[str, List[str]]:
+        """
+        核对各扩展的汇总与原始记录，不一致的扩展在同一个写事务中重建
+
+        返回：
+            扩展名 -> 不一致项说明（只包含不一致的扩展）
+        """
+        mismatches = {}
+        for extension in self.extensions:
+            with self._lock, _immediate(self._conn) as conn:
+                problems = extension.verify(conn)
+                if problems:
+                    self._rebuild(conn, extension)
+            if problems:
+                mismatches[extension.name] = problems
+                logger.warning("分析库扩展与原始记录不一致，已重建: %s: %s", extension.name, "; ".join(problems))
+        return mismatches
+
+    # ==================== 写入 ====================
+
+    def upsert_many(self, kind: str, records: List[Dict[str, Any]]) -> int:
+        """
+        批量写入记录，内容未变化的记录跳过
+
+        读取旧记录、替换和更新扩展在同一个写事务中完成，其他进程的写入不会插在中间造成重复累加
+
+        返回：
+            新增或变化的记录数
+        """
+        fields = RECORD_KINDS[kind]
+        changed = 0
+        with self._lock, _immediate(self._conn) as conn:
+            for record in records:
+                rid = record_id(record)
+                data = json.dumps(record, ensure_ascii=False, sort_keys=True, default=str)
+                row = conn.execute(f"SELECT data FROM {kind}_records WHERE id = ?", (rid,)).fetchone()
+                if row is not None and row["data"] == data:
+                    continue
+                status = first_value(record, fields["status"])
+                conn.execute(
+                    f"""INSERT OR REPLACE INTO {kind}_records
+                        (id, create_time, update_time, user_name, dept, cabinet_code, status, data)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                    (
+                        rid,
+                        normalize_time(first_value(record, fields["time"])),
+                        normalize_time(first_value(record, fields["update"])),
+                        first_value(record, fields["user"]),
+                        None if first_value(record, fields["dept"]) is None else str(first_value(record, fields["dept"])),
+                        first_value(record, fields["cabinet"]),
+                        None if status is None else int(status),
+                        data,
+                    )
+                )
+                old = json.loads(row["data"]) if row is not None else None
+                for extension in self.extensions:
+                    extension.apply(conn, kind, old, record)
+                changed += 1
+        return changed
+
+    # ==================== 同步状态 ====================
+
+    def get_state(self, kind: str) -> Dict[str, Any]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM sync_state WHERE kind = ?", (kind,)).fetchone()
+        if row is None:
+            return {"kind": kind, "create_watermark": None, "backfilled": 0, "last_sync": None}
+        return dict(row)
+
+    def save_state(self, kind: str, create_watermark: Optional[str]):
+        with self._lock, _immediate(self._conn) as conn:
+            conn.execute(
+                """INSERT INTO sync_state (kind, create_watermark, backfilled, last_sync)
+                   VALUES (?, ?, 1, ?)
+                   ON CONFLICT(kind) DO UPDATE SET
+                       create_watermark = MAX(COALESCE(create_watermark, ''), COALESCE(excluded.create_watermark, '')),
+                       backfilled = 1,
+                       last_sync = excluded.last_sync""",
+                (kind, create_watermark, time.time())
+            )
+
+    # ==================== 查询 ====================
+
+    def query_records(self, kind: str, current: int = 1, size: int = 10,
+                      startTime: Optional[str] = None, endTime: Optional[str] = None,
+                      status: Optional[int] = None, department: Optional[str] = None,
+                      user: Optional[str] = None, cabinetCode: Optional[str] = None) -> Dict[str, Any]:
+        """
+        分页查询本地记录（按创建时间倒序），返回与上游列表接口一致的结构
+        """
+        current = current or 1
+        size = size or 10
+        where, args = [], []
+        if startTime:
+            where.append("create_time >= ?")
+            args.append(normalize_time(startTime))
+        if endTime:
+            where.append("create_time <= ?")
+            args.append(normalize_time(endTime, end_of_day=True))
+        for column, value in (("status", status), ("dept", department), ("user_name", user), ("cabinet_code", cabinetCode)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                args.append(value)
+        clause = f"WHERE {' AND '.join(where)}" if where else ""
+
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM {kind}_records {clause}", args).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT data FROM {kind}_records {clause} ORDER BY create_time DESC, id DESC LIMIT ? OFFSET ?",
+                args + [size, (current - 1) * size]
+            ).fetchall()
+
+        return {
+            "code": 200,
+            "msg": "操作成功",
+            "success": True,
+            "data": {
+                "current": current,
+                "size": size,
+                "total": total,
+                "pages": (total + size - 1) // size,
+                "records": [json.loads(row["data"]) for row in rows],
+                "searchCount": True,
+                "hitCount": False
+            }
+        }
+
+    def execute(self, sql: str, args: Iterable[Any] = ()) -> List[sqlite3.Row]:
+        """只读查询（供扩展的读取方法使用）"""
+        with self._lock:
+            return self._conn.execute(sql, tuple(args)).fetchall()
+
+
+class AnalyticsSync:
+    """
+    按水位增量同步记录列表接口到本地分析库
+
+    多个进程共用同一个库时，持有同步租约的进程负责同步；其他进程每个同步间隔读取一次库中的同步状态
+    """
+
+    def __init__(self, store: AnalyticsStore, fetchers: Dict[str, FetchPage],
+                 interval: Optional[float] = None, lookback_hours: Optional[float] = None,
+                 page_size: Optional[int] = None, max_staleness: Optional[float] = None, concurrency: int = 4,
+                 lease_store: Optional[SharedStateStore] = None):
+        """
+        参数：
+            store: 本地分析库
+            fetchers: 记录类型 -> 拉取一页记录的协程函数
+            interval: 同步间隔（秒）
+            lookback_hours: 增量同步时从水位向前回看的时长，用于获取近期记录的状态变化
+            page_size: 每页数量
+            max_staleness: 超过该时长未同步成功则不再使用本地数据（秒）
+            concurrency: 同时拉取的页数
+            lease_store: 选出同步进程的共享状态库，默认取进程内共用的实例；未启用共享状态时每个进程各自同步
+        """
+        self.store = store
+        self.fetchers = fetchers
+        self.interval = settings.ANALYTICS_SYNC_INTERVAL if interval is None else interval
+        self.lookback = timedelta(hours=settings.ANALYTICS_SYNC_LOOKBACK_HOURS if lookback_hours is None else lookback_hours)
+        self.page_size = page_size or settings.ANALYTICS_PAGE_SIZE
+        self.max_staleness = settings.ANALYTICS_MAX_STALENESS if max_staleness is None else max_staleness
+        self.concurrency = concurrency
+        self.lease_store = lease_store if lease_store is not None else shared_state_store()
+        self.lease_name = f"analytics:sync:{os.path.abspath(store.path)}"
+        self.lease_ttl = max(SYNC_LEASE_MIN_TTL, self.interval * 3)
+        self._task: Optional[asyncio.Task] = None
+        self._last_sync: Dict[str, float] = {}
+        self._last_verify: Optional[float] = None
+
+    def ready(self, kind: str) -> bool:
+        """该类型已完成首次全量同步，且最近同步成功（可能由其他进程完成）"""
+        last = self._last_sync.get(kind)
+        return last is not None and time.time() - last < self.max_staleness
+
+    async def _hold_lease(self) -> bool:
+        """获取或续期同步租约；共享状态不可用时按持有处理（写事务保证多个进程同时同步也不会重复累加）"""
+        if self.lease_store is None:
+            return True
+        try:
+            return await asyncio.to_thread(self.lease_store.try_lease, self.lease_name, self.lease_ttl)
+        except sqlite3.Error as e:
+            logger.warning("获取分析库同步租约失败: %s", e)
+            return True
+
+    async def _release_lease(self):
+        if self.lease_store is None:
+            return
+        try:
+            await asyncio.to_thread(self.lease_store.release_lease, self.lease_name)
+        except sqlite3.Error:
+            pass
+
+    async def refresh_state(self):
+        """读取库中的同步状态（由持有租约的进程写入）"""
+        for kind in self.fetchers:
+            state = await asyncio.to_thread(self.store.get_state, kind)
+            if state["backfilled"] and state["last_sync"]:
+                self._last_sync[kind] = state["last_sync"]
+
+    async def _fetch(self, kind: str, current: int, start_time: Optional[str], end_time: str):
+        result = await self.fetchers[kind](current, self.page_size, start_time, end_time)
+        data = result.get("data") if isinstance(result, dict) else None
+        if not result.get("success") or not isinstance(data, dict):
+            raise RuntimeError(f"拉取{kind}记录第{current}页失败: {result.get('msg')}")
+        return data.get("records") or [], data.get("pages") or 0
+
+    async def sync_kind(self, kind: str) -> int:
+        """
+        同步一种记录
+
+        首次同步拉取全部历史；之后从 createTime 水位回看 lookback 时长，
+        覆盖新增记录以及近期记录的状态更新。endTime 固定为本次同步开始时间，保证分页稳定。
+        上游列表接口只能按创建时间筛选，创建时间早于回看窗口的记录之后再发生的变化不会同步，
+        记录状态可能在更长时间后变化时需相应调大 ANALYTICS_SYNC_LOOKBACK_HOURS
+        """
+        state = await asyncio.to_thread(self.store.get_state, kind)
+        start_time = None
+        if state["backfilled"] and state["create_watermark"]:
+            watermark = datetime.strptime(state["create_watermark"], TIME_FORMAT)
+            start_time = (watermark - self.lookback).strftime(TIME_FORMAT)
+        end_time = datetime.now().strftime(TIME_FORMAT)
+
+        first, pages = await self._fetch(kind, 1, start_time, end_time)
+        fields = RECORD_KINDS[kind]
+        create_watermark = None
+        changed = 0
+
+        # 按并发数分批拉取并写入，全量同步时内存中只保留一批页面
+        remaining = list(range(2, pages + 1))
+        batches = [[first]]
+        while batches:
+            if not await self._hold_lease():
+                raise RuntimeError("同步租约已由其他进程取得")
+            for records in batches.pop():
+                changed += await asyncio.to_thread(self.store.upsert_many, kind, records)
+                for record in records:
+                    created = normalize_time(first_value(record, fields["time"]))
+                    if created and (create_watermark is None or created > create_watermark):
+                        create_watermark = created
+            if remaining:
+                chunk, remaining = remaining[:self.concurrency], remaining[self.concurrency:]
+                results = await asyncio.gather(*(self._fetch(kind, p, start_time, end_time) for p in chunk))
+                batches.append([records for records, _ in results])
+
+        await asyncio.to_thread(self.store.save_state, kind, create_watermark)
+        self._last_sync[kind] = time.time()
+        logger.info("分析库同步完成: %s 变化%s条（起始时间 %s）", kind, changed, start_time or "全部")
+        return changed
+
+    async def sync(self):
+        for kind in self.fetchers:
+            try:
+                await self.sync_kind(kind)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("分析库同步失败: %s: %s", kind, e)
+
+    async def _verify(self):
+        """按 ANALYTICS_VERIFY_INTERVAL 核对预聚合（同步进程启动后的首次同步完成即核对一次）"""
+        if not self.store.extensions or settings.ANALYTICS_VERIFY_INTERVAL <= 0:
+            return
+        now = time.time()
+        if self._last_verify is not None and now - self._last_verify < settings.ANALYTICS_VERIFY_INTERVAL:
+            return
+        self._last_verify = now
+        await asyncio.to_thread(self.store.verify_extensions)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.store.open)
+                if await self._hold_lease():
+                    await self.sync()
+                    await self._verify()
+                else:
+                    await self.refresh_state()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # 打开库或安装扩展失败时不退出后台任务，下个间隔重试
+                logger.error("分析库后台同步异常: %s", e)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """启动后台同步任务（需在事件循环中调用）"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._release_lease()
+        self.store.close()
@@ -0,0 +1,131 @@
+"""
+上游熔断器
+按接口统计连续失败，达到阈值后熔断：熔断期间直接失败，不再占用连接和等待超时；
+熔断时间结束后放行少量试探请求（半开），成功则恢复，失败则重新熔断
+"""
+import re
+import time
+from typing import Dict, Optional
+
+import httpx
+
+from config.config import settings
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+# 路径中的数字ID统一替换，使 /alarm/warning/123/handle 与 /alarm/warning/456/handle 共用一个熔断器
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+class CircuitOpenError(httpx.TransportError):
+    """接口处于熔断状态，请求未发出"""
+
+
+def endpoint_key(url: str) -> str:
+    """熔断器和延迟预算使用的接口标识：去掉查询参数、数字ID后的路径"""
+    return _ID_SEGMENT.sub("/{id}", httpx.URL(url).path)
+
+
+def parse_budgets(raw: str) -> Dict[str, float]:
+    """解析 "路径=秒,路径=秒" 格式的延迟预算配置"""
+    budgets = {}
+    for item in raw.split(","):
+        if "=" not in item:
+            continue
+        path, value = item.rsplit("=", 1)
+        try:
+            budgets[path.strip()] = float(value)
+        except ValueError:
+            continue
+    return budgets
+
+
+class CircuitBreaker:
+    """单个接口的熔断器"""
+
+    def __init__(self, name: str, failure_threshold: int, open_seconds: float, half_open_calls: int):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trials = 0
+        self.rejected = 0
+
+    def before_call(self):
+        """
+        请求发出前检查
+
+        异常：
+            CircuitOpenError: 熔断中，或半开状态下试探名额已用完
+        """
+        if self.state == STATE_OPEN:
+            if time.monotonic() - self.opened_at < self.open_seconds:
+                self.rejected += 1
+                raise CircuitOpenError(f"上游接口熔断中: {self.name}")
+            self.state = STATE_HALF_OPEN
+            self._trials = 0
+        if self.state == STATE_HALF_OPEN:
+            if self._trials >= self.half_open_calls:
+                self.rejected += 1
+                raise CircuitOpenError(f"上游接口熔断试探中: {self.name}")
+            self._trials += 1
+
+    def release(self):
+        """请求被取消等未得出结果时，归还半开状态的试探名额"""
+        if self.state == STATE_HALF_OPEN and self._trials > 0:
+            self._trials -= 1
+
+    def record_success(self):
+        self.failures = 0
+        self.state = STATE_CLOSED
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == STATE_HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = STATE_OPEN
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, object]:
+        return {"state": self.state, "failures": self.failures, "rejected": self.rejected}
+
+
+class CircuitBreakerRegistry:
+    """按接口维护熔断器和延迟预算"""
+
+    def __init__(self, enabled: Optional[bool] = None, failure_threshold: Optional[int] = None,
+                 open_seconds: Optional[float] = None, half_open_calls: Optional[int] = None,
+                 budgets: Optional[Dict[str, float]] = None):
+        self.enabled = settings.CIRCUIT_BREAKER_ENABLED if enabled is None else enabled
+        self.failure_threshold = failure_threshold or settings.CIRCUIT_FAILURE_THRESHOLD
+        self.open_seconds = settings.CIRCUIT_OPEN_SECONDS if open_seconds is None else open_seconds
+        self.half_open_calls = half_open_calls or settings.CIRCUIT_HALF_OPEN_CALLS
+        self.budgets = parse_budgets(settings.UPSTREAM_LATENCY_BUDGETS) if budgets is None else budgets
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, key: str) -> CircuitBreaker:
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(key, self.failure_threshold, self.open_seconds, self.half_open_calls)
+            self._breakers[key] = breaker
+        return breaker
+
+    def budget_for(self, key: str) -> Optional[float]:
+        """接口的延迟预算（秒），按完整路径或路径末段匹配，未配置返回None"""
+        if key in self.budgets:
+            return self.budgets[key]
+        return self.budgets.get(key.rsplit("/", 1)[-1])
+
+    @staticmethod
+    def is_failure(response: Optional[httpx.Response] = None, error: Optional[BaseException] = None) -> bool:
+        """网络错误、超时和5xx视为上游故障；4xx属于调用方问题，不计入熔断"""
+        if error is not None:
+            return isinstance(error, httpx.TransportError) and not isinstance(error, CircuitOpenError)
+        return response is not None and response.status_code >= 500
+
+    def stats(self) -> Dict[str, Dict[str, object]]:
+        return {key: breaker.stats() for key, breaker in self._breakers.items()}
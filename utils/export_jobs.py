@@ -0,0 +1,326 @@
+"""
+异步导出任务
+大数据量导出以任务方式提交：后台受限并发执行，结果文件保存在本地磁盘，
+相同查询（按参数摘要）在有效期内直接复用已生成的文件
+
+多进程部署时任务状态写入结果文件旁的状态文件（{任务ID}.json），任一进程都能查询和下载；
+同一任务由持有共享状态租约的进程执行，其他进程只读取状态文件
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+from config.config import settings
+from utils.shared_state import shared_state_store
+
+logger = logging.getLogger(__name__)
+
+# 生成导出文件的协程函数：返回分块的文件内容
+ExportProducer = Callable[[], Awaitable[AsyncIterator[bytes]]]
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+JOB_ID_PATTERN = re.compile(r"^[0-9a-f]{40}$")
+
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _file_age(path: str, now: float) -> Optional[float]:
+    try:
+        return now - os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+class ExportJob:
+    """单个导出任务的状态"""
+
+    def __init__(self, job_id: str, export_type: str, params: Dict[str, Any], path: str, filename: str):
+        self.job_id = job_id
+        self.export_type = export_type
+        self.params = params
+        self.path = path
+        self.filename = filename
+        self.status = JOB_PENDING
+        self.bytes_written = 0
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "jobId": self.job_id,
+            "exportType": self.export_type,
+            "params": self.params,
+            "status": self.status,
+            "bytesWritten": self.bytes_written,
+            "error": self.error,
+            "createdAt": self.created_at,
+            "startedAt": self.started_at,
+            "finishedAt": self.finished_at
+        }
+
+
+class ExportJobManager:
+    """导出任务管理器"""
+
+    def __init__(self, artifact_dir: str, max_workers: Optional[int] = None, ttl: Optional[float] = None):
+        """
+        参数：
+            artifact_dir: 导出文件保存目录
+            max_workers: 同时执行的导出任务数，默认取 EXPORT_JOB_WORKERS
+            ttl: 导出文件有效期（秒），默认取 EXPORT_JOB_TTL
+        """
+        self.artifact_dir = artifact_dir
+        self.ttl = settings.EXPORT_JOB_TTL if ttl is None else ttl
+        self.heartbeat = settings.EXPORT_JOB_HEARTBEAT
+        # 进行中任务超过该时长未刷新状态文件，视为所在进程已退出
+        self.stale_after = self.heartbeat * 3
+        self.lease_store = shared_state_store()
+        self._workers = asyncio.Semaphore(settings.EXPORT_JOB_WORKERS if max_workers is None else max_workers)
+        self._jobs: Dict[str, ExportJob] = {}
+        self.cleanup()
+
+    @staticmethod
+    def make_job_id(export_type: str, params: Dict[str, Any], scope: Any = None) -> str:
+        """任务ID：导出类型 + 查询参数 + 调用范围 的摘要，相同查询得到相同ID"""
+        payload = json.dumps([export_type, params, scope], sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def _artifact_path(self, job_id: str, filename: str) -> str:
+        return os.path.join(self.artifact_dir, f"{job_id}{os.path.splitext(filename)[1]}")
+
+    def _meta_path(self, job_id: str) -> str:
+        return os.path.join(self.artifact_dir, f"{job_id}.json")
+
+    def _lease_name(self, job_id: str) -> str:
+        return f"export:{os.path.abspath(self.artifact_dir)}:{job_id}"
+
+    def _expired(self, job: ExportJob) -> bool:
+        return job.finished_at is not None and time.time() - job.finished_at > self.ttl
+
+    def cleanup(self):
+        """
+        清理遗留文件（启动时调用）
+
+        删除已退出进程留下的临时文件，以及超过有效期的结果文件和状态文件；
+        其他进程正在执行的任务会持续刷新状态文件，其临时文件不会被删除
+        """
+        try:
+            names = os.listdir(self.artifact_dir)
+        except OSError:
+            return
+        now = time.time()
+        for name in names:
+            path = os.path.join(self.artifact_dir, name)
+            age = _file_age(path, now)
+            if age is None:
+                continue
+            if name.endswith((".part", ".tmp")):
+                meta_age = _file_age(self._meta_path(name.split(".", 1)[0]), now)
+                if age > self.stale_after and (meta_age is None or meta_age > self.stale_after):
+                    _remove_quietly(path)
+            elif age > self.ttl:
+                _remove_quietly(path)
+
+    def _purge_expired(self):
+        """清理过期任务及其文件"""
+        for job_id, job in list(self._jobs.items()):
+            if job.status in (JOB_DONE, JOB_FAILED) and self._expired(job):
+                del self._jobs[job_id]
+                _remove_quietly(self._meta_path(job_id))
+                if job.status == JOB_DONE:
+                    _remove_quietly(job.path)
+
+    def _save_meta(self, job: ExportJob):
+        """写入任务状态文件（先写临时文件再替换，其他进程不会读到写了一半的内容）"""
+        data = job.to_dict()
+        data["filename"] = job.filename
+        data["updatedAt"] = time.time()
+        meta_path = self._meta_path(job.job_id)
+        tmp_path = f"{meta_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, meta_path)
+
+    def _load_meta(self, job_id: str) -> Optional[ExportJob]:
+        """从状态文件恢复任务（可能由其他进程执行）；不存在或已过期时返回None"""
+        try:
+            with open(self._meta_path(job_id), encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        filename = data.get("filename") or ""
+        job = ExportJob(job_id, data.get("exportType"), data.get("params") or {},
+                        self._artifact_path(job_id, filename), filename)
+        job.status = data.get("status", JOB_PENDING)
+        job.bytes_written = data.get("bytesWritten", 0)
+        job.error = data.get("error")
+        job.created_at = data.get("createdAt", job.created_at)
+        job.started_at = data.get("startedAt")
+        job.finished_at = data.get("finishedAt")
+
+        if job.status == JOB_DONE:
+            if self._expired(job) or not os.path.exists(job.path):
+                return None
+        elif job.status in (JOB_PENDING, JOB_RUNNING):
+            if time.time() - data.get("updatedAt", 0) > self.stale_after:
+                job.status = JOB_FAILED
+                job.error = "执行导出任务的进程已退出"
+        return job
+
+    async def _hold_lease(self, job_id: str) -> bool:
+        """获取或续期任务租约；共享状态不可用时按持有处理（各进程写各自的临时文件，结果相同）"""
+        if self.lease_store is None:
+            return True
+        try:
+            return await asyncio.to_thread(self.lease_store.try_lease, self._lease_name(job_id), self.stale_after)
+        except sqlite3.Error as e:
+            logger.warning("获取导出任务租约失败: %s", e)
+            return True
+
+    async def _release_lease(self, job_id: str):
+        if self.lease_store is None:
+            return
+        try:
+            await asyncio.to_thread(self.lease_store.release_lease, self._lease_name(job_id))
+        except sqlite3.Error:
+            pass
+
+    async def submit(self, export_type: str, params: Dict[str, Any], producer: ExportProducer,
+                     filename: str, scope: Any = None) -> ExportJob:
+        """
+        提交导出任务
+
+        已有相同查询的进行中任务（包括其他进程中的）或未过期的结果时直接返回该任务；失败的任务会重新执行
+
+        参数：
+            export_type: 导出类型（lend/replenish/storage/alarm 等）
+            params: 导出查询参数
+            producer: 生成文件内容的协程函数
+            filename: 下载时使用的文件名
+            scope: 额外参与任务ID计算的调用范围（如认证信息）
+        """
+        self._purge_expired()
+        job_id = self.make_job_id(export_type, params, scope)
+        job = self._jobs.get(job_id)
+        if job is not None and job.status != JOB_FAILED:
+            return job
+
+        await asyncio.to_thread(os.makedirs, self.artifact_dir, exist_ok=True)
+        stored = await asyncio.to_thread(self._load_meta, job_id)
+        if stored is not None and stored.status != JOB_FAILED:
+            return stored
+        if not await self._hold_lease(job_id):
+            # 其他进程刚开始执行同一任务，尚未写入状态文件
+            return stored or ExportJob(job_id, export_type, params, self._artifact_path(job_id, filename), filename)
+
+        # 等待期间本进程可能已提交了同一任务
+        job = self._jobs.get(job_id)
+        if job is not None and job.status != JOB_FAILED:
+            return job
+        job = ExportJob(job_id, export_type, params, self._artifact_path(job_id, filename), filename)
+        self._jobs[job_id] = job
+        await asyncio.to_thread(self._save_meta, job)
+        job.task = asyncio.ensure_future(self._run(job, producer))
+        return job
+
+    async def _run(self, job: ExportJob, producer: ExportProducer):
+        heartbeat = asyncio.ensure_future(self._heartbeat(job))
+        try:
+            async with self._workers:
+                job.status = JOB_RUNNING
+                job.started_at = time.time()
+                # 临时文件按进程区分，租约失效后被其他进程接手时不会写到同一个文件
+                tmp_path = f"{job.path}.{os.getpid()}.part"
+                try:
+                    stream = await producer()
+                    try:
+                        await self._write(job, stream, tmp_path)
+                    finally:
+                        # 写文件失败时也要关闭上游流，释放连接和上游名额
+                        aclose = getattr(stream, "aclose", None)
+                        if aclose is not None:
+                            await aclose()
+                    await asyncio.to_thread(os.replace, tmp_path, job.path)
+                    job.status = JOB_DONE
+                    logger.info("导出任务完成: %s %s (%s字节)", job.export_type, job.job_id, job.bytes_written)
+                except asyncio.CancelledError:
+                    job.status = JOB_FAILED
+                    job.error = "任务已取消"
+                    raise
+                except Exception as e:
+                    job.status = JOB_FAILED
+                    job.error = str(e)
+                    logger.error("导出任务失败: %s %s: %s", job.export_type, job.job_id, e)
+                finally:
+                    job.finished_at = time.time()
+                    await asyncio.to_thread(_remove_quietly, tmp_path)
+        finally:
+            heartbeat.cancel()
+            await asyncio.gather(heartbeat, return_exceptions=True)
+            if job.status not in (JOB_DONE, JOB_FAILED):
+                job.status = JOB_FAILED
+                job.error = "任务已取消"
+                job.finished_at = time.time()
+            try:
+                await asyncio.to_thread(self._save_meta, job)
+            except OSError as e:
+                logger.warning("写入导出任务状态失败: %s: %s", job.job_id, e)
+            await self._release_lease(job.job_id)
+
+    async def _heartbeat(self, job: ExportJob):
+        """任务执行期间（包括排队）定期续期租约并刷新状态文件，供其他进程判断任务仍在进行"""
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            if not await self._hold_lease(job.job_id):
+                logger.warning("导出任务租约已由其他进程取得: %s", job.job_id)
+            try:
+                await asyncio.to_thread(self._save_meta, job)
+            except OSError as e:
+                logger.warning("写入导出任务状态失败: %s: %s", job.job_id, e)
+
+    @staticmethod
+    async def _write(job: ExportJob, stream: AsyncIterator[bytes], tmp_path: str):
+        """把文件内容写入临时文件；打开、写入、关闭都在线程池中执行，不阻塞事件循环"""
+        f = await asyncio.to_thread(open, tmp_path, "wb")
+        try:
+            async for chunk in stream:
+                await asyncio.to_thread(f.write, chunk)
+                job.bytes_written += len(chunk)
+        finally:
+            await asyncio.to_thread(f.close)
+
+    async def get(self, job_id: str) -> Optional[ExportJob]:
+        """查询任务：本进程正在执行的任务直接返回，其余以状态文件为准（可能由其他进程执行）"""
+        if not JOB_ID_PATTERN.match(job_id):
+            return None
+        self._purge_expired()
+        job = self._jobs.get(job_id)
+        if job is not None and job.task is not None and not job.task.done():
+            return job
+        stored = await asyncio.to_thread(self._load_meta, job_id)
+        return stored if stored is not None else job
+
+    async def aclose(self):
+        """取消进行中的任务（应用退出时调用）"""
+        tasks = [job.task for job in self._jobs.values() if job.task is not None and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,420 @@
+"""
+上游HTTP连接池
+为各角色的API客户端创建基于 httpx 的异步会话，复用 keep-alive 连接
+"""
+import asyncio
+import json
+import time
+
+import httpx
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from config.config import settings
+from utils.circuit_breaker import CircuitBreakerRegistry, endpoint_key
+from utils.metrics import current_operation, record_request, record_response_bytes, status_class
+from utils.retry import HedgePolicy, RetryPolicy, hedged
+from utils.loop_watchdog import note_upstream
+from utils.server_timing import add_timing, add_upstream_timing
+from utils.upstream_scheduler import (
+    PRIORITY_ANALYTICS, PRIORITY_INTERACTIVE, PRIORITY_WRITE, UpstreamScheduler, current_priority, upstream_scheduler
+)
+from utils.singleflight import SingleFlight
+from utils.token_provider import TokenProvider
+
+# 参与合并键计算的认证请求头（不同Token的请求互不合并）
+AUTH_HEADERS = ("Authorization", "Blade-Auth")
+
+
+class UpstreamContentError(httpx.HTTPError):
+    """上游响应状态正常但内容不是预期的文件（如JSON错误信息）"""
+
+    def __init__(self, message: str, request: httpx.Request):
+        super().__init__(message)
+        self.request = request
+
+
+class _SharedTransport(httpx.AsyncBaseTransport):
+    """进程内共用的连接池：各会话关闭时减少引用，最后一个会话关闭时才真正关闭连接"""
+
+    def __init__(self):
+        self._transport: Optional[httpx.AsyncHTTPTransport] = None
+        self.refs = 0
+
+    def acquire(self) -> "_SharedTransport":
+        if self._transport is None:
+            self._transport = httpx.AsyncHTTPTransport(limits=httpx.Limits(
+                max_connections=settings.UPSTREAM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.UPSTREAM_MAX_KEEPALIVE,
+                keepalive_expiry=settings.UPSTREAM_KEEPALIVE_EXPIRY
+            ))
+        self.refs += 1
+        return self
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self):
+        self.refs -= 1
+        if self.refs <= 0 and self._transport is not None:
+            self._transport, transport = None, self._transport
+            await transport.aclose()
+
+
+# 同一进程内的所有上游会话（合并网关中各角色的客户端）共用一个连接池
+_shared_transport = _SharedTransport()
+
+
+def create_async_session(headers: Optional[Dict[str, str]] = None) -> httpx.AsyncClient:
+    """
+    创建异步HTTP会话
+
+    参数：
+        headers: 默认请求头（各会话独立，如不同角色的认证头）
+    返回：
+        httpx.AsyncClient 实例；连接池为进程内共用，连接数和超时由配置文件控制
+    """
+    return httpx.AsyncClient(
+        headers=headers,
+        transport=_shared_transport.acquire(),
+        timeout=settings.UPSTREAM_TIMEOUT
+    )
+
+
+class _SlotStream(httpx.AsyncByteStream):
+    """流式响应体包装：响应关闭时释放上游名额，并补记接收的字节数"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release, operation_labels=None):
+        self._stream = stream
+        self._release = release
+        self._operation_labels = operation_labels
+        self.bytes_read = 0
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            self.bytes_read += len(chunk)
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._release is not None:
+                self._release, release = None, self._release
+                release()
+                record_response_bytes(self.bytes_read, self._operation_labels)
+
+
+class UpstreamSession:
+    """
+    API客户端使用的上游会话
+
+    与 httpx.AsyncClient 保持相同的 get/post/put 调用方式，
+    并对并发的相同GET请求进行合并（URL、参数、认证信息都相同才合并）；
+    每个接口有独立的熔断器和可配置的延迟预算（作为该接口的超时时间）；
+    GET请求按策略重试，并可对慢请求发出对冲请求；
+    实际发出的请求经进程内共用的上游调度器按优先级排队
+    """
+
+    def __init__(self, headers: Optional[Dict[str, str]] = None, coalesce: Optional[bool] = None,
+                 read_priority: int = PRIORITY_INTERACTIVE, scheduler: Optional[UpstreamScheduler] = None):
+        """
+        参数：
+            headers: 默认请求头
+            coalesce: 是否合并相同GET请求，默认取 UPSTREAM_COALESCE_GET
+            read_priority: GET请求的调度优先级（写请求固定为 PRIORITY_WRITE，导出流为 PRIORITY_ANALYTICS）
+            scheduler: 上游调度器，默认使用进程内共用的 upstream_scheduler
+        """
+        self.client = create_async_session(headers)
+        self.read_priority = read_priority
+        self.scheduler = scheduler or upstream_scheduler
+        self.token_provider: Optional[TokenProvider] = None
+        self.auth_header = "Authorization"
+        self.coalesce = settings.UPSTREAM_COALESCE_GET if coalesce is None else coalesce
+        self.coalescer = SingleFlight()
+        self.breakers = CircuitBreakerRegistry()
+        self.retry = RetryPolicy()
+        self.hedge = HedgePolicy()
+
+    @property
+    def headers(self) -> httpx.Headers:
+        return self.client.headers
+
+    def auth_scope(self) -> Tuple[str, ...]:
+        """当前认证请求头的取值，用于区分不同Token的合并/缓存范围"""
+        return tuple(self.client.headers.get(h, "") for h in AUTH_HEADERS)
+
+    def identity_scope(self) -> Tuple[str, ...]:
+        """
+        认证身份范围，用于缓存键
+
+        使用 TokenProvider 时取其稳定身份（账号），Token刷新后缓存仍然有效；否则取认证请求头
+        """
+        if self.token_provider is not None:
+            return (self.token_provider.identity,)
+        return self.auth_scope()
+
+    def _coalesce_key(self, url: str, params: Optional[Dict[str, Any]]) -> Tuple:
+        """构造合并键：规范化URL + 排序后的参数 + 认证范围"""
+        normalized_url = str(httpx.URL(url))
+        normalized_params = tuple(sorted(
+            (str(k), str(v)) for k, v in (params or {}).items() if v is not None
+        ))
+        return normalized_url, normalized_params, self.auth_scope()
+
+    async def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """按优先级获取上游名额后发出请求，并把耗时和成败反馈给调度器"""
+        note_upstream(url)
+        priority = current_priority(self.read_priority if method == "GET" else PRIORITY_WRITE)
+        queued = time.monotonic()
+        async with self.scheduler.slot(priority):
+            started = time.monotonic()
+            add_timing("upstream-queue", started - queued)
+            try:
+                response = await self.client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                latency = time.monotonic() - started
+                add_upstream_timing(latency)
+                self.scheduler.record(latency, failed=True)
+                record_request(latency, "timeout" if isinstance(e, httpx.TimeoutException) else "error")
+                raise
+            latency = time.monotonic() - started
+            add_upstream_timing(latency)
+            self.scheduler.record(latency, failed=response.status_code >= 500)
+            record_request(latency, status_class(response.status_code),
+                           int(response.request.headers.get("Content-Length", 0)),
+                           response.num_bytes_downloaded or len(response.content))
+            return response
+
+    def use_token_provider(self, provider: TokenProvider, header: str = "Authorization"):
+        """
+        使用 TokenProvider 管理认证请求头
+
+        Token刷新后立即更新会话的请求头；上游返回401时刷新Token（并发请求共用一次刷新）并重发
+        """
+        self.token_provider = provider
+        self.auth_header = header
+        provider.subscribe(self._apply_token)
+
+    def _apply_token(self, token: Optional[str]):
+        if token:
+            self.client.headers[self.auth_header] = f"Bearer {token}"
+        else:
+            self.client.headers.pop(self.auth_header, None)
+
+    async def _renew_after_401(self, response: httpx.Response, stale: Optional[str]) -> bool:
+        """请求因Token失效被拒绝时刷新Token，返回是否应重发"""
+        if response.status_code != 401 or self.token_provider is None:
+            return False
+        if not await self.token_provider.refresh(stale):
+            return False
+        await response.aclose()
+        return True
+
+    async def _send(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """发送请求，Token失效（401）时刷新后重发一次"""
+        stale = self.token_provider.token if self.token_provider is not None else None
+        response = await self._send_once(method, url, **kwargs)
+        if await self._renew_after_401(response, stale):
+            response = await self._send_once(method, url, **kwargs)
+        return response
+
+    async def _send_once(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        经过熔断器发送请求
+
+        异常：
+            CircuitOpenError: 接口熔断中，请求未发出（属于 httpx.HTTPError，调用方按请求失败处理）
+        """
+        key = endpoint_key(url)
+        budget = self.breakers.budget_for(key)
+        if budget is not None:
+            kwargs["timeout"] = budget
+        if not self.breakers.enabled:
+            return await self._request(method, url, **kwargs)
+
+        breaker = self.breakers.get(key)
+        breaker.before_call()
+        try:
+            response = await self._request(method, url, **kwargs)
+        except BaseException as e:
+            if self.breakers.is_failure(error=e):
+                breaker.record_failure()
+            else:
+                breaker.release()
+            raise
+        if self.breakers.is_failure(response=response):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+    async def _get(self, url: str, params: Optional[Dict[str, Any]], **kwargs) -> httpx.Response:
+        """GET请求：每次尝试可对冲，网络错误和网关错误按退避重试，最后一次的结果原样返回"""
+        key = endpoint_key(url)
+        for attempt in range(self.retry.attempts):
+            last = attempt == self.retry.attempts - 1
+            try:
+                response = await hedged(self.hedge, key, lambda: self._send("GET", url, params=params, **kwargs))
+            except httpx.HTTPError as e:
+                if last or not self.retry.should_retry(error=e):
+                    raise
+            else:
+                if last or not self.retry.should_retry(response=response):
+                    return response
+            self.retry.retries += 1
+            await asyncio.sleep(self.retry.delay(attempt))
+
+    async def get(self, url: str, params: Optional[Dict[str, Any]] = None, **kwargs) -> httpx.Response:
+        if not self.coalesce:
+            return await self._get(url, params, **kwargs)
+        key = self._coalesce_key(url, params)
+        return await self.coalescer.do(key, lambda: self._get(url, params, **kwargs))
+
+    async def open_stream(self, url: str, params: Optional[Dict[str, Any]] = None, **kwargs) -> httpx.Response:
+        """
+        以流式方式发起GET请求（不合并、不读取响应体）
+
+        上游返回错误状态时关闭连接并抛出 httpx.HTTPStatusError，返回JSON（错误信息）而不是文件时抛出
+        UpstreamContentError，调用方可在开始向客户端输出前得知失败；上游名额在响应关闭时释放
+        """
+        stale = self.token_provider.token if self.token_provider is not None else None
+        response = await self._open_stream_once(url, params, **kwargs)
+        if await self._renew_after_401(response, stale):
+            response = await self._open_stream_once(url, params, **kwargs)
+        try:
+            response.raise_for_status()
+            await self._reject_error_body(response)
+        except httpx.HTTPError:
+            await response.aclose()
+            raise
+        return response
+
+    @staticmethod
+    async def _reject_error_body(response: httpx.Response):
+        """上游出错时可能以 HTTP 200 返回JSON错误信息，不能当作导出文件转发或保存"""
+        if "json" not in response.headers.get("content-type", "").lower():
+            return
+        body = await response.aread()
+        try:
+            detail = json.loads(body)
+            message = detail.get("msg") or detail.get("message") if isinstance(detail, dict) else None
+        except ValueError:
+            message = None
+        raise UpstreamContentError(
+            f"上游返回了错误信息而不是文件: {message or body[:200].decode('utf-8', 'replace')}",
+            request=response.request
+        )
+
+    async def _open_stream_once(self, url: str, params: Optional[Dict[str, Any]], **kwargs) -> httpx.Response:
+        key = endpoint_key(url)
+        note_upstream(url)
+        budget = self.breakers.budget_for(key)
+        if budget is not None:
+            kwargs["timeout"] = budget
+        breaker = self.breakers.get(key) if self.breakers.enabled else None
+        if breaker is not None:
+            breaker.before_call()
+
+        request = self.client.build_request("GET", url, params=params, **kwargs)
+        queued = time.monotonic()
+        await self.scheduler.acquire(current_priority(PRIORITY_ANALYTICS))
+        started = time.monotonic()
+        add_timing("upstream-queue", started - queued)
+        try:
+            response = await self.client.send(request, stream=True)
+        except BaseException as e:
+            if isinstance(e, httpx.TransportError):
+                latency = time.monotonic() - started
+                add_upstream_timing(latency)
+                self.scheduler.record(latency, failed=True)
+                record_request(latency, "timeout" if isinstance(e, httpx.TimeoutException) else "error")
+            self.scheduler.release()
+            if breaker is not None:
+                if self.breakers.is_failure(error=e):
+                    breaker.record_failure()
+                else:
+                    breaker.release()
+            raise
+        if breaker is not None:
+            if self.breakers.is_failure(response=response):
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+        # 导出流只计首包耗时
+        latency = time.monotonic() - started
+        add_upstream_timing(latency)
+        self.scheduler.record(latency, failed=response.status_code >= 500)
+        if response.is_closed:
+            # 响应体已完整读入内存（无需再占用上游连接）
+            self.scheduler.release()
+            record_request(latency, status_class(response.status_code), response_bytes=response.num_bytes_downloaded)
+        else:
+            record_request(latency, status_class(response.status_code))
+            response.stream = _SlotStream(response.stream, self.scheduler.release, current_operation())
+        return response
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self._send("POST", url, **kwargs)
+
+    async def put(self, url: str, **kwargs) -> httpx.Response:
+        return await self._send("PUT", url, **kwargs)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+class UpstreamStream:
+    """
+    open_stream 返回的响应体的异步迭代器
+
+    读取完毕、迭代中断或调用 aclose() 时关闭响应，释放连接和上游名额；aclose() 可重复调用，
+    迭代从未开始（客户端在输出前断开）时由 UpstreamStreamingResponse 负责关闭
+    """
+
+    def __init__(self, response: httpx.Response, chunk_size: Optional[int] = None):
+        self.response = response
+        self.chunk_size = chunk_size or settings.UPSTREAM_STREAM_CHUNK_SIZE
+
+    def __aiter__(self) -> AsyncIterator[bytes]:
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncIterator[bytes]:
+        try:
+            async for chunk in self.response.aiter_bytes(self.chunk_size):
+                yield chunk
+        finally:
+            await self.aclose()
+
+    async def aclose(self):
+        if not self.response.is_closed:
+            await self.response.aclose()
+
+
+def iter_stream(response: httpx.Response, chunk_size: Optional[int] = None) -> UpstreamStream:
+    """
+    分块读取流式响应体，读取完毕或客户端断开时释放连接
+
+    参数：
+        response: open_stream 返回的响应
+        chunk_size: 每块字节数，默认取 UPSTREAM_STREAM_CHUNK_SIZE
+    """
+    return UpstreamStream(response, chunk_size)
+
+
+class UpstreamStreamingResponse(StreamingResponse):
+    """
+    转发上游流的响应
+
+    无论响应是否开始输出（客户端提前断开、发送失败），结束时都关闭响应体，
+    避免未开始迭代的上游流一直占用连接和上游名额
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            aclose = getattr(self.body_iterator, "aclose", None)
+            if aclose is not None:
+                await aclose()
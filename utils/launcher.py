@@ -0,0 +1,126 @@
+"""
+生产环境启动入口
+各角色 main.py 中的 uvicorn.run(..., reload=True) 仅用于开发。生产环境使用：
+
+    python -m utils.launcher gateway            # 合并网关
+    python -m utils.launcher teamleader -w 4    # 单个角色，指定 worker 数
+
+worker 数默认按可用CPU数计算，事件循环和HTTP解析器可选（安装 uvloop/httptools 后 auto 会自动使用），
+监听队列、keep-alive 超时和优雅退出的排空时间由配置文件控制
+"""
+import argparse
+import importlib.util
+import logging
+import os
+import sys
+from typing import Dict, Optional, Tuple
+
+import uvicorn
+
+from config.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 角色 -> (应用路径, 默认端口)
+APPS: Dict[str, Tuple[str, int]] = {
+    "gateway": ("gateway.main:app", settings.PORT),
+    "administrator": ("administrator.main:app", settings.PORT),
+    "operator": ("knife_operator.main:app", 8001),
+    "teamleader": ("teamleader.main:app", 8002),
+    "auditor": ("auditor.main:app", 8003),
+}
+
+# 可选的加速实现：事件循环 -> 依赖包，HTTP解析器 -> 依赖包
+LOOP_PACKAGES = {"uvloop": "uvloop"}
+HTTP_PACKAGES = {"httptools": "httptools"}
+
+
+def available_cpus() -> int:
+    """当前进程可用的CPU数（考虑容器/taskset 的CPU亲和性限制）"""
+    try:
+        return len(os.sched_getaffinity(0)) or 1
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def resolve_workers(workers: Optional[int] = None) -> int:
+    """worker 数：显式指定或 SERVER_WORKERS 大于0时直接使用，否则取可用CPU数"""
+    workers = settings.SERVER_WORKERS if workers is None else workers
+    return workers if workers > 0 else available_cpus()
+
+
+def _resolve_impl(name: str, packages: Dict[str, str], kind: str) -> str:
+    """指定的实现未安装时回退为 auto（uvicorn 自动选择可用的最快实现）"""
+    package = packages.get(name)
+    if package is not None and importlib.util.find_spec(package) is None:
+        logger.warning("%s %s 未安装，改用 auto", kind, name)
+        return "auto"
+    return name
+
+
+def build_config(role: str, host: Optional[str] = None, port: Optional[int] = None,
+                 workers: Optional[int] = None) -> Dict[str, object]:
+    """
+    生成 uvicorn.run 的参数
+
+    参数：
+        role: 角色名（见 APPS）
+        host/port: 监听地址，默认取 HOST 和角色的默认端口
+        workers: worker 进程数，默认见 resolve_workers
+    """
+    app, default_port = APPS[role]
+    return {
+        "app": app,
+        "host": host or settings.HOST,
+        "port": port or default_port,
+        "workers": resolve_workers(workers),
+        "loop": _resolve_impl(settings.SERVER_LOOP, LOOP_PACKAGES, "事件循环"),
+        "http": _resolve_impl(settings.SERVER_HTTP, HTTP_PACKAGES, "HTTP解析器"),
+        "backlog": settings.SERVER_BACKLOG,
+        "timeout_keep_alive": settings.SERVER_KEEPALIVE_TIMEOUT,
+        "timeout_graceful_shutdown": settings.SERVER_GRACEFUL_TIMEOUT,
+        "access_log": settings.SERVER_ACCESS_LOG,
+        "proxy_headers": True,
+        "forwarded_allow_ips": settings.SERVER_FORWARDED_ALLOW_IPS,
+        "reload": False,
+    }
+
+
+def run(role: str, host: Optional[str] = None, port: Optional[int] = None, workers: Optional[int] = None):
+    """
+    以生产配置启动服务
+
+    收到 SIGTERM/SIGINT 后停止接收新连接，等待进行中的请求完成
+    （最多 SERVER_GRACEFUL_TIMEOUT 秒），再执行各应用的退出流程（取消导出任务、关闭上游连接池）
+    """
+    config = build_config(role, host, port, workers)
+    # worker 进程启动时读取环境变量：各进程的上游调度器分摊 UPSTREAM_CONCURRENCY_LIMIT
+    os.environ["UPSTREAM_LIMIT_PROCESSES"] = str(config["workers"])
+    logger.info(
+        "启动 %s: %s:%s，workers=%s，loop=%s，http=%s，backlog=%s",
+        role, config["host"], config["port"], config["workers"], config["loop"], config["http"], config["backlog"]
+    )
+    uvicorn.run(**config)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="刀具管理系统生产环境启动入口")
+    parser.add_argument("role", choices=sorted(APPS), help="要启动的服务")
+    parser.add_argument("--host", default=None, help="监听地址，默认取 HOST")
+    parser.add_argument("--port", type=int, default=None, help="监听端口，默认取角色的默认端口")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="worker 进程数，默认取 SERVER_WORKERS，0 表示按CPU数")
+    args = parser.parse_args(argv)
+
+    # worker 进程按应用路径导入各角色模块，需要项目根目录在导入路径中
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if project_root not in sys.path:
+        sys.path.insert(0, project_root)
+    from utils.log_pipeline import setup_logging
+
+    setup_logging()
+    run(args.role, args.host, args.port, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+非阻塞结构化日志
+- 日志记录放入有界队列，由独立线程格式化并写出，请求处理中不再同步写 I/O；队列满时丢弃并计数
+- 结构化字段：logger.info("...", extra={"fields": {...}})，LOG_FORMAT=json 时按 JSON 行输出
+- 上游报文通过 log_payload 记录：日志级别未启用时不格式化；报文按条数、长度、层级截断，
+  敏感字段（Token、密码）打码；同一接口按令牌桶限速，被限速丢弃的条数附在下一条日志的 suppressed 字段中
+
+    setup_logging()
+    log_payload(logger, "获取货道统计数据成功", result)
+"""
+import atexit
+import copy
+import json
+import logging
+import queue
+import reprlib
+import sys
+import threading
+import time
+from itertools import islice
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+from config.config import settings
+from utils.metrics import current_operation, metrics
+
+LOG_DROPPED = metrics.counter("log_records_dropped_total", "日志队列已满被丢弃的日志条数")
+LOG_SUPPRESSED = metrics.counter("log_payloads_suppressed_total", "按接口限速未记录的报文日志条数", ("endpoint",))
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# 报文中需要打码的字段名（小写）
+SENSITIVE_KEYS = frozenset({
+    "access_token", "refresh_token", "token", "authorization", "blade-auth", "password", "secret",
+})
+
+
+class StructuredFormatter(logging.Formatter):
+    """输出日志记录的 fields 字段：text 格式追加 key=value，json 格式输出单行 JSON"""
+
+    def __init__(self, output: str = "text"):
+        super().__init__(TEXT_FORMAT)
+        self.output = output
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields: Dict[str, Any] = getattr(record, "fields", None) or {}
+        if self.output != "json":
+            text = super().format(record)
+            if fields:
+                text += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+            return text
+
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **fields,
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """队列满时丢弃日志并计数，不阻塞调用方"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """在调用方线程合并消息参数、展开异常堆栈（参数对象之后可能被修改），其余格式化留给后台线程"""
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_DROPPED.inc()
+
+
+_configured = False
+_listener: Optional[QueueListener] = None
+
+
+def setup_logging(level: Optional[str] = None):
+    """
+    配置根日志（重复调用无效）
+
+    LOG_ASYNC 时根日志只挂一个队列处理器，实际输出在后台线程中进行，进程退出时写完队列中剩余的日志
+    """
+    global _configured, _listener
+    if _configured:
+        return
+    _configured = True
+
+    handler: logging.Handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(StructuredFormatter(settings.LOG_FORMAT))
+    if settings.LOG_ASYNC:
+        log_queue: queue.Queue = queue.Queue(settings.LOG_QUEUE_SIZE)
+        _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+        handler = _DroppingQueueHandler(log_queue)
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+        existing.close()
+    root.addHandler(handler)
+    root.setLevel((level or settings.LOG_LEVEL).upper())
+
+
+class _PayloadRepr(reprlib.Repr):
+    """按条数、长度和层级截断的报文表示，字典保持原顺序，敏感字段打码"""
+
+    def __init__(self):
+        super().__init__()
+        self.maxlevel = 4
+        self.maxdict = self.maxlist = self.maxtuple = self.maxset = 20
+        self.maxstring = self.maxother = 200
+
+    def repr_dict(self, x, level):
+        if not x:
+            return "{}"
+        if level <= 0:
+            return "{...}"
+        pieces = []
+        for key in islice(x, self.maxdict):
+            if isinstance(key, str) and key.lower() in SENSITIVE_KEYS:
+                value = "'***'"
+            else:
+                value = self.repr1(x[key], level - 1)
+            pieces.append(f"{self.repr1(key, level - 1)}: {value}")
+        if len(x) > self.maxdict:
+            pieces.append(f"...(共{len(x)}项)")
+        return "{" + ", ".join(pieces) + "}"
+
+    def repr_list(self, x, level):
+        text = super().repr_list(x, level)
+        return text[:-1] + f", (共{len(x)}项)]" if len(x) > self.maxlist else text
+
+
+_payload_repr = _PayloadRepr()
+
+
+class Payload:
+    """
+    报文的延迟表示：截断后再格式化，耗时与报文大小无关
+
+    日志级别未启用或被限速时不会格式化；启用时在调用方线程的 _DroppingQueueHandler.prepare 中格式化
+    （报文对象之后可能被修改，不能留到后台线程），后台线程只负责输出
+    """
+    __slots__ = ("value", "max_chars")
+
+    def __init__(self, value: Any, max_chars: Optional[int] = None):
+        self.value = value
+        self.max_chars = settings.LOG_PAYLOAD_MAX_CHARS if max_chars is None else max_chars
+
+    def __str__(self) -> str:
+        text = _payload_repr.repr(self.value)
+        if len(text) > self.max_chars:
+            text = text[:self.max_chars] + f"...(截断，共{len(text)}字符)"
+        return text
+
+
+class PayloadRateLimiter:
+    """按接口的令牌桶：每秒 rate 条，最多积累 burst 条"""
+
+    def __init__(self, rate: Optional[float] = None, burst: Optional[int] = None):
+        self.rate = settings.LOG_PAYLOAD_RATE if rate is None else rate
+        self.burst = settings.LOG_PAYLOAD_BURST if burst is None else burst
+        self._buckets: Dict[str, list] = {}  # 接口 -> [令牌数, 上次补充时间, 被限速条数]
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str) -> Optional[int]:
+        """允许记录时返回此前被限速的条数，否则返回 None"""
+        if self.rate <= 0:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.burst), now, 0]
+            bucket[0] = min(float(self.burst), bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                return None
+            bucket[0] -= 1
+            suppressed, bucket[2] = bucket[2], 0
+            return suppressed
+
+
+payload_limiter = PayloadRateLimiter()
+
+
+def log_payload(logger: logging.Logger, message: str, payload: Any, level: int = logging.INFO,
+                endpoint: Optional[str] = None, **fields):
+    """
+    记录上游请求或响应报文
+
+    参数：
+        message: 日志说明，输出为 "message: 报文"
+        payload: 报文（字典、列表等），截断后输出
+        endpoint: 限速使用的接口标识，默认取当前客户端方法（如 teamleader.get_stock_statistical_num）
+        fields: 附加的结构化字段
+    """
+    if not logger.isEnabledFor(level):
+        return
+    if endpoint is None:
+        role, name = current_operation()
+        endpoint = f"{role}.{name}" if name != "unknown" else message
+    suppressed = payload_limiter.acquire(endpoint)
+    if suppressed is None:
+        LOG_SUPPRESSED.inc(endpoint)
+        return
+    fields["endpoint"] = endpoint
+    if suppressed:
+        fields["suppressed"] = suppressed
+    logger.log(level, "%s: %s", message, Payload(payload), extra={"fields": fields}, stacklevel=2)
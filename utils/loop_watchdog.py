@@ -0,0 +1,196 @@
+"""
+事件循环阻塞检测（可选）
+async 路由中直接调用同步网络请求（如操作员客户端的 requests）会阻塞整个事件循环，期间所有请求都停住。
+启用后事件循环定时打点，独立的监视线程发现打点超过阈值未更新时，抓取事件循环线程当时的调用栈，
+并记录正在执行的路由、客户端方法和上游接口；事件循环恢复后记录实际阻塞时长。
+结果写入日志（WARNING），并计入 /metrics 的 event_loop_stalls_total 和 event_loop_stall_seconds
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+import requests
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from config.config import settings
+from utils.circuit_breaker import endpoint_key
+from utils.metrics import current_operation, metrics
+
+logger = logging.getLogger(__name__)
+
+# 保留的最近阻塞记录条数
+STALL_HISTORY_SIZE = 50
+
+# 日志中保留的调用栈帧数（从最内层算起）
+STACK_LIMIT = 30
+
+STALLS = metrics.counter("event_loop_stalls_total", "事件循环阻塞超过阈值的次数", ("route",))
+STALL_SECONDS = metrics.histogram(
+    "event_loop_stall_seconds", "事件循环单次阻塞时长", ("route",),
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0))
+
+
+class _Activity:
+    """一个请求任务当前在做什么（由事件循环线程写入，监视线程读取）"""
+    __slots__ = ("route", "operation", "upstream")
+
+    def __init__(self, route: str):
+        self.route = route
+        self.operation: Optional[str] = None
+        self.upstream: Optional[str] = None
+
+
+class LoopWatchdog:
+    """单个事件循环的阻塞检测器"""
+
+    def __init__(self, threshold: Optional[float] = None, interval: Optional[float] = None):
+        """
+        参数：
+            threshold: 阻塞多少秒视为卡顿，默认取 LOOP_WATCHDOG_THRESHOLD
+            interval: 打点和检查的间隔（秒），默认取 LOOP_WATCHDOG_INTERVAL
+        """
+        self.threshold = settings.LOOP_WATCHDOG_THRESHOLD if threshold is None else threshold
+        self.interval = settings.LOOP_WATCHDOG_INTERVAL if interval is None else interval
+        self.activities: Dict[asyncio.Task, _Activity] = {}
+        self.stalls: Deque[Dict[str, Any]] = deque(maxlen=STALL_HISTORY_SIZE)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._last_beat = 0.0
+        self._pending: Optional[Dict[str, Any]] = None
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """在事件循环线程内调用"""
+        if self._thread is not None:
+            return
+        self._loop = loop
+        self._loop_thread = threading.get_ident()
+        self._last_beat = time.monotonic()
+        loop.call_soon(self._beat)
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info("事件循环阻塞检测已启动，阈值 %ss", self.threshold)
+
+    def stop(self):
+        self._stopped.set()
+
+    def _beat(self):
+        """事件循环内的打点；与上次打点间隔过长说明期间事件循环被阻塞"""
+        now = time.monotonic()
+        lag = now - self._last_beat - self.interval
+        self._last_beat = now
+        pending, self._pending = self._pending, None
+        if pending is not None or lag > self.threshold:
+            self._finish_stall(pending, max(lag, 0.0))
+        if not self._stopped.is_set() and not self._loop.is_closed():
+            self._loop.call_later(self.interval, self._beat)
+
+    def _watch(self):
+        """监视线程：打点超时时抓取事件循环线程的调用栈（每次阻塞只抓一次）"""
+        while not self._stopped.wait(self.interval):
+            if self._loop is None or self._loop.is_closed():
+                return
+            blocked = time.monotonic() - self._last_beat - self.interval
+            if blocked > self.threshold and self._pending is None:
+                self._pending = self._capture(blocked)
+
+    def _capture(self, blocked: float) -> Dict[str, Any]:
+        frame = sys._current_frames().get(self._loop_thread)
+        stack = traceback.format_stack(frame, limit=STACK_LIMIT) if frame is not None else []
+        task = asyncio.current_task(self._loop)
+        activity = self.activities.get(task) if task is not None else None
+        return {
+            "detectedAfter": round(blocked, 3),
+            "route": activity.route if activity else None,
+            "operation": activity.operation if activity else None,
+            "upstream": activity.upstream if activity else None,
+            "stack": stack,
+        }
+
+    def _finish_stall(self, pending: Optional[Dict[str, Any]], duration: float):
+        stall = pending or {"detectedAfter": None, "route": None, "operation": None, "upstream": None, "stack": []}
+        stall["duration"] = round(duration, 3)
+        stall["time"] = time.time()
+        self.stalls.append(stall)
+        route = stall["route"] or "unknown"
+        STALLS.inc(route)
+        STALL_SECONDS.observe(duration, route)
+        logger.warning(
+            "事件循环阻塞 %.3fs，路由: %s，客户端方法: %s，上游接口: %s\n%s",
+            duration, route, stall["operation"], stall["upstream"], "".join(stall["stack"])
+        )
+
+    def track(self, route: str) -> Optional[_Activity]:
+        task = asyncio.current_task()
+        if task is None:
+            return None
+        activity = self.activities[task] = _Activity(route)
+        return activity
+
+    def untrack(self):
+        task = asyncio.current_task()
+        if task is not None:
+            self.activities.pop(task, None)
+
+    def note_upstream(self, url: str):
+        """记录当前请求正在调用的上游接口（同步客户端在事件循环线程内调用时最有用）"""
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            return
+        activity = self.activities.get(task) if task is not None else None
+        if activity is not None:
+            activity.upstream = endpoint_key(url)
+            role, name = current_operation()
+            activity.operation = f"{role}.{name}"
+
+    def recent_stalls(self) -> List[Dict[str, Any]]:
+        return list(self.stalls)
+
+
+# 进程内共用的检测器（未启用时为None）
+loop_watchdog: Optional[LoopWatchdog] = LoopWatchdog() if settings.LOOP_WATCHDOG_ENABLED else None
+
+
+def note_upstream(url: str):
+    if loop_watchdog is not None:
+        loop_watchdog.note_upstream(url)
+
+
+class WatchedSession(requests.Session):
+    """同步 requests 会话：每次请求前记录上游接口，阻塞事件循环时可定位到具体接口"""
+
+    def request(self, method, url, *args, **kwargs):
+        note_upstream(url)
+        return super().request(method, url, *args, **kwargs)
+
+
+class LoopWatchdogMiddleware:
+    """ASGI 中间件：首个请求时启动检测器，并记录每个请求任务对应的路由"""
+
+    def __init__(self, app: ASGIApp, watchdog: Optional[LoopWatchdog] = None):
+        self.app = app
+        self.watchdog = watchdog or loop_watchdog
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or self.watchdog is None:
+            await self.app(scope, receive, send)
+            return
+        self.watchdog.start(asyncio.get_running_loop())
+        self.watchdog.track(f"{scope['method']} {endpoint_key(scope['path'])}")
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.watchdog.untrack()
+
+
+def install_loop_watchdog(app):
+    """LOOP_WATCHDOG_ENABLED 时为应用添加阻塞检测中间件"""
+    if loop_watchdog is not None:
+        app.add_middleware(LoopWatchdogMiddleware, watchdog=loop_watchdog)
@@ -0,0 +1,375 @@
+"""
+Prometheus 指标
+按客户端方法（如 get_stock_take_list）统计耗时分布、失败数、超时数、缓存命中和上游传输字节数，
+并在抓取时汇总调度器、熔断器、重试/对冲、准入控制、响应缓存和Token的统计，
+由各角色应用的 /metrics 以 Prometheus 文本格式输出。
+
+指标按进程统计：多 worker 部署时每次抓取只反映处理该请求的 worker
+"""
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# 耗时分布的桶边界（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Prometheus 文本格式的 Content-Type
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 不统计的客户端方法（生命周期和统计方法）
+SKIP_METHODS = {"aclose", "close", "update_token"}
+
+# 当前正在执行的客户端方法 (角色, 方法名)，上游会话据此给请求打标签
+# 不在任何客户端方法内的请求（如后台同步直接调用私有方法）记为 unknown
+_current_operation: ContextVar[Tuple[str, str]] = ContextVar("upstream_operation", default=("unknown", "unknown"))
+
+Sample = Tuple[Dict[str, str], float]
+
+
+def current_operation() -> Tuple[str, str]:
+    return _current_operation.get()
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """带标签的计数器（线程安全）"""
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def samples(self) -> Iterable[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield self.name, dict(zip(self.labelnames, labels)), value
+
+
+class Histogram:
+    """带标签的耗时分布（线程安全）"""
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # 标签 -> [各桶计数..., 总和]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [0.0] * (len(self.buckets) + 1)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-1] += value
+
+    def count(self, *labels: str) -> float:
+        state = self._values.get(labels)
+        return sum(state[:-1]) if state else 0.0
+
+    def samples(self) -> Iterable[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            items = [(labels, list(state)) for labels, state in self._values.items()]
+        for labels, state in items:
+            base = dict(zip(self.labelnames, labels))
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                yield f"{self.name}_bucket", {**base, "le": _format_value(bound)}, cumulative
+            yield f"{self.name}_sum", base, state[-1]
+            yield f"{self.name}_count", base, cumulative
+
+
+class MetricsRegistry:
+    """指标注册表：直接记录的计数器/分布，加上抓取时调用的采集函数"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._collectors: Dict[str, Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Counter(name, documentation, labelnames)
+            return self._metrics[name]
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Histogram(name, documentation, labelnames, buckets)
+            return self._metrics[name]
+
+    def register_collector(self, key: str, collector: Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]):
+        """
+        注册抓取时调用的采集函数（同一 key 重复注册时替换）
+
+        采集函数返回 (指标名, 类型 gauge/counter, 说明, [(标签, 值)]) 的序列
+        """
+        with self._lock:
+            self._collectors[key] = collector
+
+    def render(self) -> str:
+        """输出 Prometheus 文本格式"""
+        families: Dict[str, Tuple[str, str, List[Tuple[str, Dict[str, str], float]]]] = {}
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors.values())
+        for metric in metrics:
+            families[metric.name] = (metric.type, metric.documentation, list(metric.samples()))
+        for collector in collectors:
+            for name, kind, documentation, samples in collector():
+                family = families.setdefault(name, (kind, documentation, []))
+                family[2].extend((name, labels, value) for labels, value in samples)
+
+        lines = []
+        for name, (kind, documentation, samples) in families.items():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample_name, labels, value in samples:
+                lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# 进程内共用的注册表
+metrics = MetricsRegistry()
+
+CALL_DURATION = metrics.histogram(
+    "upstream_call_duration_seconds", "客户端方法耗时（含缓存命中）", ("role", "operation"))
+CALL_ERRORS = metrics.counter(
+    "upstream_call_errors_total", "客户端方法失败次数（抛出异常或返回 success=false）", ("role", "operation"))
+REQUEST_DURATION = metrics.histogram(
+    "upstream_request_duration_seconds", "实际发出的上游HTTP请求耗时", ("role", "operation"))
+REQUESTS = metrics.counter(
+    "upstream_requests_total", "实际发出的上游HTTP请求数（status 为状态码类别、timeout 或 error）",
+    ("role", "operation", "status"))
+TIMEOUTS = metrics.counter(
+    "upstream_timeouts_total", "上游请求超时次数", ("role", "operation"))
+RESPONSE_BYTES = metrics.counter(
+    "upstream_response_bytes_total", "从上游接收的字节数", ("role", "operation"))
+REQUEST_BYTES = metrics.counter(
+    "upstream_request_bytes_total", "发往上游的请求体字节数", ("role", "operation"))
+CACHE_REQUESTS = metrics.counter(
+    "response_cache_requests_total", "响应缓存查询次数（result 为 hit/stale/miss）", ("role", "endpoint", "result"))
+
+
+def _is_error_result(result) -> bool:
+    return isinstance(result, dict) and result.get("success") is False
+
+
+@contextmanager
+def operation(role: str, name: str):
+    """在代码块内标记当前客户端方法，并统计耗时和异常"""
+    token = _current_operation.set((role, name))
+    started = time.monotonic()
+    try:
+        yield
+    except BaseException:
+        CALL_ERRORS.inc(role, name)
+        raise
+    finally:
+        CALL_DURATION.observe(time.monotonic() - started, role, name)
+        _current_operation.reset(token)
+
+
+def _wrap(role: str, name: str, func):
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            with operation(role, name):
+                result = await func(*args, **kwargs)
+            if _is_error_result(result):
+                CALL_ERRORS.inc(role, name)
+            return result
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with operation(role, name):
+            result = func(*args, **kwargs)
+        if _is_error_result(result):
+            CALL_ERRORS.inc(role, name)
+        return result
+    return wrapper
+
+
+def instrument_client(role: str):
+    """
+    类装饰器：为客户端的全部公开方法统计耗时和失败次数，并标记上游请求所属的方法
+
+    跳过私有方法、生命周期方法和 get_*_stats 统计方法
+    """
+    def decorator(cls):
+        for name, func in list(vars(cls).items()):
+            if name.startswith("_") or name in SKIP_METHODS or not inspect.isfunction(func):
+                continue
+            if name.startswith("get_") and name.endswith("_stats"):
+                continue
+            setattr(cls, name, _wrap(role, name, func))
+        return cls
+    return decorator
+
+
+def record_request(latency: float, status: str, request_bytes: int = 0, response_bytes: int = 0):
+    """记录一次实际发出的上游请求（标签取当前客户端方法）"""
+    role, name = current_operation()
+    REQUEST_DURATION.observe(latency, role, name)
+    REQUESTS.inc(role, name, status)
+    if status == "timeout":
+        TIMEOUTS.inc(role, name)
+    if request_bytes:
+        REQUEST_BYTES.inc(role, name, amount=request_bytes)
+    if response_bytes:
+        RESPONSE_BYTES.inc(role, name, amount=response_bytes)
+
+
+def record_response_bytes(amount: int, operation_labels: Optional[Tuple[str, str]] = None):
+    """流式响应在关闭时补记接收的字节数（此时已离开客户端方法，需传入打开时的标签）"""
+    if amount:
+        role, name = operation_labels or current_operation()
+        RESPONSE_BYTES.inc(role, name, amount=amount)
+
+
+def status_class(status_code: int) -> str:
+    return f"{status_code // 100}xx"
+
+
+def _number(value) -> Optional[float]:
+    if isinstance(value, bool):
+        return float(value)
+    if isinstance(value, (int, float)):
+        return float(value)
+    return None
+
+
+def register_client(role: str, client):
+    """
+    注册异步客户端的统计采集：熔断状态、重试/对冲、GET合并、Token，
+    以及调度器（进程内共用）
+    """
+    def collect():
+        session = client.session
+        breaker_samples = []
+        rejected_samples = []
+        for endpoint, stats in session.breakers.stats().items():
+            breaker_samples.append(({"role": role, "endpoint": endpoint}, 1.0 if stats.get("state") == "open" else 0.0))
+            rejected = _number(stats.get("rejected"))
+            if rejected is not None:
+                rejected_samples.append(({"role": role, "endpoint": endpoint}, rejected))
+        yield "upstream_circuit_open", "gauge", "熔断器是否打开（1 打开）", breaker_samples
+        yield "upstream_circuit_rejected_total", "counter", "熔断期间被拒绝的请求数", rejected_samples
+        yield "upstream_retries_total", "counter", "GET重试次数", [({"role": role}, session.retry.retries)]
+        hedge = session.hedge.stats()
+        yield "upstream_hedges_total", "counter", "对冲请求数", [({"role": role}, hedge["hedges"])]
+        yield "upstream_hedge_wins_total", "counter", "对冲请求先返回的次数", [({"role": role}, hedge["hedgeWins"])]
+        coalescing = session.coalescer.stats()
+        yield "upstream_coalesced_total", "counter", "被合并的相同GET请求数", \
+            [({"role": role}, coalescing.get("collapsed", 0))]
+        cache = getattr(client, "response_cache", None)
+        if cache is not None:
+            yield "response_cache_refreshes_total", "counter", "过期缓存的后台刷新次数", \
+                [({"role": role}, cache.refreshes)]
+        provider = getattr(client, "token_provider", None)
+        if provider is not None:
+            token = provider.stats()
+            yield "upstream_token_refreshes_total", "counter", "Token刷新次数", [({"role": role}, token["refreshes"])]
+            yield "upstream_token_refresh_failures_total", "counter", "Token刷新失败次数", \
+                [({"role": role}, token["failures"])]
+            yield "upstream_token_expires_at_seconds", "gauge", "当前Token的过期时间（Unix时间）", \
+                [({"role": role}, token["expiresAt"] or 0)]
+
+    metrics.register_collector(f"client:{role}", collect)
+    register_scheduler()
+
+
+def register_scheduler():
+    """注册进程内共用的上游调度器统计"""
+    from utils.upstream_scheduler import upstream_scheduler
+
+    def collect():
+        stats = upstream_scheduler.stats()
+        yield "upstream_concurrency_limit", "gauge", "当前上游并发上限", [({}, stats["limit"])]
+        yield "upstream_active_requests", "gauge", "进行中的上游请求数", [({}, stats["active"])]
+        yield "upstream_waiting_requests", "gauge", "排队中的上游请求数", [({}, stats["waiting"])]
+        yield "upstream_admitted_total", "counter", "按优先级放行的上游请求数", \
+            [({"priority": k}, v) for k, v in stats["admitted"].items()]
+        yield "upstream_queue_wait_seconds_total", "counter", "按优先级累计的排队耗时", \
+            [({"priority": k}, v) for k, v in stats["waitSeconds"].items()]
+
+    metrics.register_collector("scheduler", collect)
+
+
+def register_admission(controller):
+    """注册接口准入控制的统计"""
+    def collect():
+        stats = controller.stats()
+        yield "admission_active_requests", "gauge", "各路由处理中的请求数", \
+            [({"route": k}, v["active"]) for k, v in stats.items()]
+        yield "admission_waiting_requests", "gauge", "各路由排队中的请求数", \
+            [({"route": k}, v["waiting"]) for k, v in stats.items()]
+        yield "admission_shed_total", "counter", "各路由因过载被拒绝的请求数", \
+            [({"route": k}, v["shed"]) for k, v in stats.items()]
+        yield "admission_service_seconds", "gauge", "各路由处理耗时的滑动平均", \
+            [({"route": k}, v["serviceTime"]) for k, v in stats.items()]
+
+    metrics.register_collector("admission", collect)
+
+
+def install_metrics(app, admission=None, clients: Optional[Dict[str, Any]] = None, path: str = "/metrics"):
+    """
+    在应用上注册 /metrics（Prometheus 文本格式），不出现在接口文档中
+
+    参数：
+        app: FastAPI 应用
+        admission: 应用的准入控制器
+        clients: 角色 -> 异步API客户端，抓取时汇总其熔断、重试、Token等统计
+    """
+    from fastapi.responses import Response
+
+    if admission is not None:
+        register_admission(admission)
+    for role, client in (clients or {}).items():
+        register_client(role, client)
+    register_scheduler()
+
+    @app.get(path, include_in_schema=False)
+    async def prometheus_metrics():
+        return Response(content=metrics.render(), media_type=CONTENT_TYPE)
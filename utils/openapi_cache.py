@@ -0,0 +1,158 @@
+"""
+OpenAPI 文档缓存
+各角色的路由文档字符串很长、响应模型很多，首次访问 /docs 时生成 OpenAPI 文档较慢，且每个 worker 都要生成一遍。
+文档生成后按“模型定义哈希”保存到磁盘，其他 worker 和重启后的进程直接读取；
+路由、接口模块或模型所在模块的源码有变化时哈希随之变化，自动重新生成。
+
+构建时预先生成：
+
+    python -m utils.openapi_cache               # 所有角色
+    python -m utils.openapi_cache auditor       # 指定角色
+"""
+import glob
+import hashlib
+import json
+import logging
+import os
+import sys
+import typing
+from typing import Any, Dict, Optional, Set
+
+import fastapi
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+
+from config.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _model_modules(annotation: Any, modules: Set[str]):
+    """收集注解中出现的类所在模块（展开 List[...]、Optional[...] 等泛型）"""
+    if annotation is None:
+        return
+    module = getattr(annotation, "__module__", None)
+    if isinstance(annotation, type) and module and module != "builtins":
+        modules.add(module)
+    for arg in typing.get_args(annotation):
+        _model_modules(arg, modules)
+
+
+def _module_digest(name: str) -> str:
+    module = sys.modules.get(name)
+    path = getattr(module, "__file__", None)
+    if not path:
+        return name
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return name
+
+
+def schema_hash(app: FastAPI) -> str:
+    """
+    计算文档的失效哈希
+
+    包含应用元数据、每个路由的路径/方法/名称，以及接口函数和请求/响应模型所在模块的源码
+    """
+    digest = hashlib.sha256()
+    meta = [fastapi.__version__, app.title, app.version, app.description, app.openapi_version,
+            app.openapi_tags, app.servers, app.contact, app.license_info]
+    digest.update(json.dumps(meta, ensure_ascii=False, default=str, sort_keys=True).encode("utf-8"))
+
+    modules: Set[str] = set()
+    for route in app.routes:
+        if not isinstance(route, APIRoute) or not route.include_in_schema:
+            continue
+        digest.update(f"{sorted(route.methods)} {route.path} {route.name} {route.tags}".encode("utf-8"))
+        modules.add(route.endpoint.__module__)
+        _model_modules(route.response_model, modules)
+        for param in route.dependant.body_params + route.dependant.query_params:
+            _model_modules(param.field_info.annotation, modules)
+    for name in sorted(modules):
+        digest.update(f"{name}:{_module_digest(name)}".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def _write(path: str, schema: Dict[str, Any]):
+    """先写临时文件再替换，其他 worker 不会读到写了一半的文件"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(schema, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _remove_stale(directory: str, name: str, keep: str):
+    for old in glob.glob(os.path.join(directory, f"{name}-*.json")):
+        if os.path.abspath(old) != os.path.abspath(keep):
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+
+def load_or_build(app: FastAPI, name: str, generate, directory: Optional[str] = None) -> Dict[str, Any]:
+    """
+    读取磁盘上的文档，不存在或哈希不一致时生成并保存
+
+    参数：
+        app: 应用
+        name: 缓存文件名前缀（角色名）
+        generate: 生成文档的函数（FastAPI 原始的 app.openapi）
+        directory: 缓存目录，默认取 OPENAPI_CACHE_DIR
+    """
+    directory = directory or settings.OPENAPI_CACHE_DIR
+    path = os.path.join(directory, f"{name}-{schema_hash(app)}.json")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    schema = generate()
+    try:
+        _write(path, schema)
+        _remove_stale(directory, name, path)
+        logger.info("OpenAPI 文档已生成: %s", path)
+    except OSError as e:
+        logger.warning("保存 OpenAPI 文档失败: %s", e)
+    return schema
+
+
+def install_openapi_cache(app: FastAPI, name: str):
+    """
+    让 app.openapi() 优先使用磁盘缓存（在所有路由注册之后调用）
+
+    FastAPI 在进程内仍会保留已加载的文档（app.openapi_schema），每个 worker 只读取一次文件
+    """
+    if not settings.OPENAPI_CACHE_ENABLED:
+        return
+    generate = app.openapi
+
+    def cached_openapi() -> Dict[str, Any]:
+        if app.openapi_schema is None:
+            app.openapi_schema = load_or_build(app, name, generate)
+        return app.openapi_schema
+
+    app.openapi = cached_openapi
+
+
+def main(argv=None):
+    """构建时预先生成各角色的文档"""
+    import importlib
+
+    from utils.launcher import APPS
+    from utils.log_pipeline import setup_logging
+
+    setup_logging()
+    roles = (argv if argv is not None else sys.argv[1:]) or sorted(APPS)
+    for role in roles:
+        module_name, attr = APPS[role][0].split(":")
+        app = getattr(importlib.import_module(module_name), attr)
+        app.openapi()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+响应缓存（TTL + stale-while-revalidate）
+用于只读统计类接口：过期后先返回旧值，同时在后台只发起一次刷新
+"""
+import asyncio
+import functools
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from config.config import settings
+from utils.metrics import CACHE_REQUESTS
+from utils.shared_state import SharedCacheBackend, shared_state_store
+from utils.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# 后台刷新租约的有效期（秒），刷新完成后提前释放
+REFRESH_LEASE_SECONDS = 60
+
+
+class MemoryCacheBackend:
+    """
+    进程内缓存后端（LRU淘汰）
+
+    后端只负责存取 (value, stored_at)，替换为其他实现时保持相同的方法即可
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        entry = self._data.get(key)
+        if entry is not None:
+            self._data.move_to_end(key)
+        return entry
+
+    def set(self, key: str, value: Any, stored_at: float):
+        self._data[key] = (value, stored_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def delete_prefix(self, prefix: str):
+        for key in [k for k in self._data if k.startswith(prefix)]:
+            del self._data[key]
+
+    def clear(self):
+        self._data.clear()
+
+
+def default_cache_backend(namespace: str):
+    """启用共享状态时多个 worker 共用缓存，否则使用进程内缓存"""
+    store = shared_state_store()
+    if store is not None:
+        return SharedCacheBackend(store, namespace=namespace, local_entries=settings.RESPONSE_CACHE_MAX_ENTRIES)
+    return MemoryCacheBackend(settings.RESPONSE_CACHE_MAX_ENTRIES)
+
+
+def _parse_ttls(raw: str) -> Dict[str, float]:
+    """解析 "endpoint=秒,endpoint=秒" 格式的TTL配置"""
+    ttls = {}
+    for item in raw.split(","):
+        if "=" not in item:
+            continue
+        name, value = item.split("=", 1)
+        try:
+            ttls[name.strip()] = float(value)
+        except ValueError:
+            logger.warning("忽略无效的缓存TTL配置: %s", item)
+    return ttls
+
+
+def is_success_response(result: Any) -> bool:
+    """默认的可缓存判断：只缓存上游返回成功的结果"""
+    return isinstance(result, dict) and result.get("success") is True
+
+
+class ResponseCache:
+    """按接口配置TTL的响应缓存"""
+
+    def __init__(self, backend: Optional[Any] = None, enabled: Optional[bool] = None,
+                 stale_ttl: Optional[float] = None, ttl_overrides: Optional[Dict[str, float]] = None,
+                 namespace: str = "cache"):
+        self.namespace = namespace
+        self.backend = backend if backend is not None else default_cache_backend(namespace)
+        self.enabled = settings.RESPONSE_CACHE_ENABLED if enabled is None else enabled
+        self.stale_ttl = settings.RESPONSE_CACHE_STALE_TTL if stale_ttl is None else stale_ttl
+        self.ttl_overrides = _parse_ttls(settings.RESPONSE_CACHE_TTLS) if ttl_overrides is None else ttl_overrides
+        self._loader = SingleFlight()
+        self._refreshing: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    def ttl_for(self, endpoint: str, default: float) -> float:
+        return self.ttl_overrides.get(endpoint, default)
+
+    @staticmethod
+    def make_key(endpoint: str, scope: Tuple, args: Tuple, kwargs: Dict[str, Any]) -> str:
+        """缓存键：接口名 + 调用范围（上游地址、认证身份） + 调用参数的摘要，避免认证信息明文出现在键中"""
+        payload = json.dumps([scope, args, kwargs], sort_keys=True, default=str, ensure_ascii=False)
+        return f"{endpoint}|{hashlib.sha1(payload.encode('utf-8')).hexdigest()}"
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: float,
+                          cacheable: Callable[[Any], bool] = is_success_response) -> Any:
+        """
+        读取缓存，未命中时加载
+
+        - 新鲜：直接返回缓存值
+        - 过期但在 stale_ttl 内：返回旧值，并在后台发起一次刷新
+        - 不存在或过旧：同步加载（并发的相同加载会被合并）
+
+        注意：命中时返回的是缓存中的同一对象，调用方不应修改
+        """
+        entry = self.backend.get(key)
+        now = time.time()
+        endpoint = key.split("|", 1)[0]
+        if entry is not None:
+            value, stored_at = entry
+            age = now - stored_at
+            if age < ttl:
+                self.hits += 1
+                CACHE_REQUESTS.inc(self.namespace, endpoint, "hit")
+                return value
+            if age < ttl + self.stale_ttl:
+                self.stale_hits += 1
+                CACHE_REQUESTS.inc(self.namespace, endpoint, "stale")
+                self._schedule_refresh(key, loader, cacheable)
+                return value
+        self.misses += 1
+        CACHE_REQUESTS.inc(self.namespace, endpoint, "miss")
+        return await self._loader.do(key, lambda: self._load(key, loader, cacheable))
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]], cacheable: Callable[[Any], bool]) -> Any:
+        result = await loader()
+        if cacheable(result):
+            self.backend.set(key, result, time.time())
+        return result
+
+    def _schedule_refresh(self, key: str, loader: Callable[[], Awaitable[Any]], cacheable: Callable[[Any], bool]):
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        task = asyncio.ensure_future(self._refresh(key, loader, cacheable))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refresh(self, key: str, loader: Callable[[], Awaitable[Any]], cacheable: Callable[[Any], bool]):
+        # 共享后端：其他进程正在刷新同一条缓存时继续返回旧值；租约读写可能等待写锁，在线程中执行
+        try_lease = getattr(self.backend, "try_lease", None)
+        leased = False
+        try:
+            if try_lease is not None:
+                if not await asyncio.to_thread(try_lease, key, REFRESH_LEASE_SECONDS):
+                    return
+                leased = True
+            self.refreshes += 1
+            await self._loader.do(key, lambda: self._load(key, loader, cacheable))
+        except Exception as e:
+            logger.warning("后台刷新缓存失败，继续使用旧值: %s: %s", key.split("|", 1)[0], e)
+        finally:
+            self._refreshing.discard(key)
+            if leased:
+                await asyncio.to_thread(self.backend.release_lease, key)
+
+    def invalidate(self, endpoint: str):
+        """清除某个接口的全部缓存"""
+        self.backend.delete_prefix(f"{endpoint}|")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes
+        }
+
+
+def cached(endpoint: str, ttl: float, cacheable: Callable[[Any], bool] = is_success_response):
+    """
+    API客户端方法的缓存装饰器
+
+    要求客户端实例具有 response_cache、base_url、session 属性
+
+    参数：
+        endpoint: 接口名，用于TTL配置和缓存失效
+        ttl: 默认TTL（秒），可通过 RESPONSE_CACHE_TTLS 覆盖
+        cacheable: 判断结果是否可缓存
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            cache: Optional[ResponseCache] = getattr(self, "response_cache", None)
+            if cache is None or not cache.enabled:
+                return await func(self, *args, **kwargs)
+            scope = (self.base_url, self.session.identity_scope())
+            key = cache.make_key(endpoint, scope, args, kwargs)
+            return await cache.get_or_load(
+                key,
+                lambda: func(self, *args, **kwargs),
+                ttl=cache.ttl_for(endpoint, ttl),
+                cacheable=cacheable
+            )
+        return wrapper
+    return decorator
@@ -0,0 +1,225 @@
+"""
+幂等GET的重试与对冲请求
+重试：网络错误和 502/503/504 按指数退避（全抖动）重发；
+对冲：请求耗时超过该接口近期的P95仍未返回时，再发一个相同请求，取先返回的结果。
+对冲按进程内共用的令牌桶限制在全部会话总请求量的固定比例内，避免故障时放大上游压力
+"""
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+import httpx
+
+from config.config import settings
+from utils.circuit_breaker import CircuitOpenError
+
+# 可重试的上游状态码（网关错误、服务不可用）
+RETRY_STATUS_CODES = (502, 503, 504)
+
+# 每个接口保留的耗时样本数
+LATENCY_WINDOW = 200
+
+# 对冲令牌桶容量，允许短时间内少量集中对冲
+HEDGE_BURST = 10.0
+
+
+class RetryPolicy:
+    """带全抖动指数退避的重试策略"""
+
+    def __init__(self, attempts: Optional[int] = None, backoff: Optional[float] = None,
+                 backoff_max: Optional[float] = None):
+        """
+        参数：
+            attempts: 总尝试次数（含第一次），默认取 UPSTREAM_RETRY_ATTEMPTS
+            backoff: 退避基数（秒），默认取 UPSTREAM_RETRY_BACKOFF
+            backoff_max: 单次退避上限（秒），默认取 UPSTREAM_RETRY_BACKOFF_MAX
+        """
+        self.attempts = max(1, settings.UPSTREAM_RETRY_ATTEMPTS if attempts is None else attempts)
+        self.backoff = settings.UPSTREAM_RETRY_BACKOFF if backoff is None else backoff
+        self.backoff_max = settings.UPSTREAM_RETRY_BACKOFF_MAX if backoff_max is None else backoff_max
+        self.retries = 0
+
+    def delay(self, attempt: int) -> float:
+        """第 attempt 次重试前的等待时间：0 到 min(上限, 基数*2^attempt) 之间均匀随机"""
+        return random.uniform(0, min(self.backoff_max, self.backoff * (2 ** attempt)))
+
+    @staticmethod
+    def should_retry(response: Optional[httpx.Response] = None, error: Optional[BaseException] = None) -> bool:
+        """熔断拒绝不重试（请求未发出，重试也会被拒绝）"""
+        if error is not None:
+            return isinstance(error, httpx.TransportError) and not isinstance(error, CircuitOpenError)
+        return response is not None and response.status_code in RETRY_STATUS_CODES
+
+
+class LatencyTracker:
+    """按接口保留最近的请求耗时，用于计算分位数"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def record(self, key: str, seconds: float):
+        samples = self._samples.get(key)
+        if samples is None:
+            samples = self._samples[key] = deque(maxlen=self.window)
+        samples.append(seconds)
+
+    def quantile(self, key: str, q: float, min_samples: int = 1) -> Optional[float]:
+        """样本数不足时返回None"""
+        samples = self._samples.get(key)
+        if not samples or len(samples) < min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class HedgeBudget:
+    """对冲令牌桶：每个请求补充 max_rate 个令牌，每次对冲消耗一个"""
+
+    def __init__(self, max_rate: Optional[float] = None, burst: float = HEDGE_BURST):
+        """
+        参数：
+            max_rate: 对冲请求占总请求的最大比例，默认取 UPSTREAM_HEDGE_MAX_RATE
+            burst: 令牌桶容量
+        """
+        self.max_rate = settings.UPSTREAM_HEDGE_MAX_RATE if max_rate is None else max_rate
+        self.burst = burst
+        self._tokens = 0.0
+
+    def credit(self):
+        self._tokens = min(self.burst, self._tokens + self.max_rate)
+
+    def try_acquire(self) -> bool:
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+
+# 进程内共用的对冲预算：网关合并多个角色时，所有会话的对冲合计不超过总请求量的 max_rate
+hedge_budget = HedgeBudget()
+
+
+class HedgePolicy:
+    """对冲请求策略：按接口P95确定对冲延迟，进程内共用的令牌桶限制对冲比例"""
+
+    def __init__(self, enabled: Optional[bool] = None, quantile: Optional[float] = None,
+                 max_rate: Optional[float] = None, min_samples: Optional[int] = None,
+                 min_delay: Optional[float] = None, budget: Optional[HedgeBudget] = None):
+        """
+        参数：
+            enabled: 是否启用对冲，默认取 UPSTREAM_HEDGE_ENABLED
+            quantile: 对冲延迟使用的耗时分位数，默认取 UPSTREAM_HEDGE_QUANTILE
+            max_rate: 单独指定对冲比例时使用独立的令牌桶，默认与其他会话共用 hedge_budget
+            min_samples: 接口耗时样本数达到该值后才对冲，默认取 UPSTREAM_HEDGE_MIN_SAMPLES
+            min_delay: 对冲延迟下限（秒），默认取 UPSTREAM_HEDGE_MIN_DELAY
+            budget: 对冲令牌桶，优先于 max_rate
+        """
+        self.enabled = settings.UPSTREAM_HEDGE_ENABLED if enabled is None else enabled
+        self.quantile = settings.UPSTREAM_HEDGE_QUANTILE if quantile is None else quantile
+        self.min_samples = settings.UPSTREAM_HEDGE_MIN_SAMPLES if min_samples is None else min_samples
+        self.min_delay = settings.UPSTREAM_HEDGE_MIN_DELAY if min_delay is None else min_delay
+        if budget is None:
+            budget = hedge_budget if max_rate is None else HedgeBudget(max_rate)
+        self.budget = budget
+        self.latency = LatencyTracker()
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def delay(self, key: str) -> Optional[float]:
+        """
+        本次请求的对冲延迟，同时按请求数补充对冲令牌
+
+        返回：
+            等待多少秒后发出对冲请求；未启用或样本不足时返回None
+        """
+        self.requests += 1
+        self.budget.credit()
+        if not self.enabled:
+            return None
+        p = self.latency.quantile(key, self.quantile, self.min_samples)
+        return None if p is None else max(self.min_delay, p)
+
+    def try_acquire(self) -> bool:
+        """获取一个对冲令牌，超过对冲比例时返回False"""
+        if not self.budget.try_acquire():
+            return False
+        self.hedges += 1
+        return True
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "hedgeWins": self.hedge_wins,
+            "hedgeRate": round(self.hedges / self.requests, 4) if self.requests else 0.0
+        }
+
+
+def _consume_result(task: asyncio.Future):
+    """取走已结束请求的异常：落后的一方失败时 asyncio 不再报告异常未被获取"""
+    if not task.cancelled():
+        task.exception()
+
+
+async def hedged(policy: HedgePolicy, key: str, send) -> httpx.Response:
+    """
+    执行一次可对冲的请求
+
+    参数：
+        policy: 对冲策略
+        key: 接口标识（用于耗时统计）
+        send: 无参协程函数，每次调用发出一个请求
+    返回：
+        先返回的成功或不可重试的响应；先返回的是网关错误或网络异常时继续等待另一个请求，
+        两个都失败时返回先完成的网关错误响应（由调用方按重试策略处理），都是异常时抛出先完成那个的异常
+    """
+    delay = policy.delay(key)
+
+    async def timed():
+        started = time.monotonic()
+        response = await send()
+        if response.status_code < 500:
+            policy.latency.record(key, time.monotonic() - started)
+        return response
+
+    if delay is None:
+        return await timed()
+    primary = asyncio.ensure_future(timed())
+    secondary: Optional[asyncio.Future] = None
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done or not policy.try_acquire():
+            return await primary
+
+        secondary = asyncio.ensure_future(timed())
+        pending = {primary, secondary}
+        first_error: Optional[BaseException] = None
+        retryable: Optional[httpx.Response] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    first_error = first_error or task.exception()
+                    continue
+                response = task.result()
+                if RetryPolicy.should_retry(response=response):
+                    retryable = retryable or response
+                    continue
+                if task is secondary:
+                    policy.hedge_wins += 1
+                return response
+        if retryable is not None:
+            return retryable
+        raise first_error
+    finally:
+        # 取消未完成的请求（落后的一方或调用方被取消时的全部请求），并取走其结果
+        for task in (primary, secondary):
+            if task is None:
+                continue
+            if not task.done():
+                task.cancel()
+            task.add_done_callback(_consume_result)
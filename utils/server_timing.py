@@ -0,0 +1,175 @@
+"""
+Server-Timing 响应头
+把每个请求的耗时拆分为：准入排队、上游排队（调度器）、上游请求、接口函数、响应模型校验（response_model）、
+JSON序列化，浏览器开发者工具和压测工具可直接查看，用于判断慢在MES还是本服务。
+
+    Server-Timing: queue;dur=0.0, upstream-queue;dur=0.0, upstream;dur=812.4;desc="2 requests",
+                   endpoint;dur=815.1, validation;dur=96.3, serialization;dur=21.7, total;dur=934.2
+
+上游耗时为各次上游请求耗时之和（并发请求时可能大于接口函数耗时）；流式响应只统计响应头发出之前的部分
+"""
+import functools
+import inspect
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional
+
+from fastapi.datastructures import Default, DefaultPlaceholder
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config.config import settings
+
+# 输出顺序
+TIMING_NAMES = ("queue", "upstream-queue", "upstream", "endpoint", "validation", "serialization")
+
+
+class RequestTiming:
+    """单个请求的分段耗时（秒）"""
+    __slots__ = ("started", "durations", "upstream_requests", "endpoint_started", "endpoint_finished")
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.durations: Dict[str, float] = {}
+        self.upstream_requests = 0
+        self.endpoint_started: Optional[float] = None
+        self.endpoint_finished: Optional[float] = None
+
+    def add(self, name: str, seconds: float):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def header(self) -> str:
+        parts = []
+        for name in TIMING_NAMES:
+            if name not in self.durations:
+                continue
+            part = f"{name};dur={self.durations[name] * 1000:.1f}"
+            if name == "upstream":
+                part += f';desc="{self.upstream_requests} requests"'
+            parts.append(part)
+        parts.append(f"total;dur={(time.monotonic() - self.started) * 1000:.1f}")
+        return ", ".join(parts)
+
+
+_current_timing: ContextVar[Optional[RequestTiming]] = ContextVar("request_timing", default=None)
+
+
+def add_timing(name: str, seconds: float):
+    """累加当前请求的一段耗时（不在请求内或未启用时忽略）"""
+    timing = _current_timing.get()
+    if timing is not None:
+        timing.add(name, seconds)
+
+
+def add_upstream_timing(seconds: float):
+    """记录一次上游请求的耗时"""
+    timing = _current_timing.get()
+    if timing is not None:
+        timing.add("upstream", seconds)
+        timing.upstream_requests += 1
+
+
+class TimedJSONResponse(JSONResponse):
+    """统计JSON序列化耗时的 JSONResponse"""
+
+    def render(self, content: Any) -> bytes:
+        started = time.monotonic()
+        try:
+            return super().render(content)
+        finally:
+            add_timing("serialization", time.monotonic() - started)
+
+
+def _timed_endpoint(func: Callable) -> Callable:
+    """记录接口函数的开始和结束时间，用于区分接口函数与之后的响应模型校验"""
+    def mark_start():
+        timing = _current_timing.get()
+        if timing is not None:
+            timing.endpoint_started = time.monotonic()
+        return timing
+
+    def mark_end(timing: Optional[RequestTiming]):
+        if timing is not None:
+            timing.endpoint_finished = time.monotonic()
+            timing.add("endpoint", timing.endpoint_finished - timing.endpoint_started)
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_endpoint(*args, **kwargs):
+            timing = mark_start()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                mark_end(timing)
+        return async_endpoint
+
+    @functools.wraps(func)
+    def endpoint(*args, **kwargs):
+        timing = mark_start()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            mark_end(timing)
+    return endpoint
+
+
+class TimedRoute(APIRoute):
+    """
+    统计响应模型校验和序列化耗时的路由类
+
+    用法：APIRouter(route_class=TimedRoute)。默认的 JSONResponse 替换为 TimedJSONResponse；
+    接口函数返回后到响应生成前的耗时（response_model 校验、jsonable_encoder）减去序列化耗时记为 validation
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], *,
+                 response_class: Any = Default(JSONResponse), **kwargs):
+        if isinstance(response_class, DefaultPlaceholder) and response_class.value is JSONResponse:
+            response_class = Default(TimedJSONResponse)
+        super().__init__(path, endpoint, response_class=response_class, **kwargs)
+
+    def get_route_handler(self):
+        self.dependant.call = _timed_endpoint(self.dependant.call)
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            response = await handler(request)
+            timing = _current_timing.get()
+            if timing is not None and timing.endpoint_finished is not None:
+                after_endpoint = time.monotonic() - timing.endpoint_finished
+                timing.add("validation", max(0.0, after_endpoint - timing.durations.get("serialization", 0.0)))
+            return response
+
+        return timed_handler
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI 中间件：为每个请求记录分段耗时，并在响应头中输出 Server-Timing
+
+    需位于准入控制中间件之外（在 AdmissionMiddleware 之后 add_middleware），才能统计准入排队时间
+    """
+
+    def __init__(self, app: ASGIApp, enabled: Optional[bool] = None):
+        self.app = app
+        self.enabled = settings.SERVER_TIMING_ENABLED if enabled is None else enabled
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        timing = RequestTiming()
+        token = _current_timing.set(timing)
+
+        async def send_with_timing(message: Message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timing.header().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_timing.reset(token)
@@ -0,0 +1,275 @@
+"""
+多进程共享状态
+同一角色的多个 uvicorn worker 通过本地 SQLite 文件（WAL）共享上游Token和热点缓存：
+一个 worker 登录或加载后，其他 worker 直接读取，不再各自请求MES。
+租约（lease）用于跨进程选出唯一执行者（如刷新Token、后台刷新缓存）。
+
+SharedStateStore 的方法都是同步的：可能等待写锁的调用（写入、租约）应放到线程中执行，
+读取使用单独的连接和锁，不会排在等待写锁的写入之后；
+SharedCacheBackend 供事件循环中的 ResponseCache 使用，命中进程内热点层时不访问 SQLite，
+写入和删除交给单独的写线程按顺序执行
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from config.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 每写入多少次清理一次过期数据
+PURGE_EVERY = 200
+
+# 共享缓存的写线程：按提交顺序写入，事件循环不等待 SQLite 写锁
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shared-state-writer")
+
+
+class SharedStateStore:
+    """基于 SQLite 文件的键值存储，可被同机多个进程同时访问"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.SHARED_STATE_PATH
+        self.owner = f"{os.getpid()}-{id(self)}"
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        # 只读连接：WAL 模式下读取不需要写锁，单独的连接和锁使读取不受正在等待写锁的写入影响
+        self._reader: Optional[sqlite3.Connection] = None
+        self._reader_pid: Optional[int] = None
+        self._read_lock = threading.Lock()
+        self._writes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        """按进程打开连接（fork 出的 worker 不复用父进程的连接）"""
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=settings.SHARED_STATE_BUSY_TIMEOUT,
+                                   check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS kv (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    stored_at REAL NOT NULL,
+                    expires_at REAL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS leases (
+                    name TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            self._conn = conn
+            self._pid = os.getpid()
+            self.owner = f"{self._pid}-{id(self)}"
+        return self._conn
+
+    def _read_connection(self) -> sqlite3.Connection:
+        """按进程打开只读连接（建表由写连接完成，表尚不存在时读取抛出 sqlite3.Error）"""
+        if self._reader is None or self._reader_pid != os.getpid():
+            self._reader = sqlite3.connect(f"file:{os.path.abspath(self.path)}?mode=ro", uri=True,
+                                           timeout=settings.SHARED_STATE_BUSY_TIMEOUT,
+                                           check_same_thread=False, isolation_level=None)
+            self._reader_pid = os.getpid()
+        return self._reader
+
+    def get_raw(self, key: str) -> Optional[Tuple[str, float]]:
+        """读取 (JSON文本, 写入时间)，不存在或已过期返回None"""
+        if self._reader is None and not os.path.exists(self.path):
+            return None
+        with self._read_lock:
+            row = self._read_connection().execute(
+                "SELECT value, stored_at FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, time.time())
+            ).fetchone()
+        return row
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        row = self.get_raw(key)
+        return None if row is None else (json.loads(row[0]), row[1])
+
+    def set(self, key: str, value: Any, stored_at: Optional[float] = None, max_age: Optional[float] = None):
+        """写入（JSON序列化），max_age 秒后过期"""
+        stored_at = time.time() if stored_at is None else stored_at
+        payload = json.dumps(value, ensure_ascii=False, default=str)
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO kv (key, value, stored_at, expires_at) VALUES (?, ?, ?, ?)",
+                (key, payload, stored_at, stored_at + max_age if max_age else None)
+            )
+            self._writes += 1
+            if self._writes % PURGE_EVERY == 0:
+                conn.execute("DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+
+    def delete_prefix(self, prefix: str):
+        with self._lock:
+            self._connection().execute(
+                "DELETE FROM kv WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+            )
+
+    def try_lease(self, name: str, ttl: float) -> bool:
+        """
+        尝试获取租约（跨进程互斥）
+
+        返回：
+            True 表示本进程持有租约，ttl 秒后自动失效
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT owner, expires_at FROM leases WHERE name = ?", (name,)).fetchone()
+                if row is not None and row[1] > now and row[0] != self.owner:
+                    conn.execute("COMMIT")
+                    return False
+                conn.execute(
+                    "INSERT OR REPLACE INTO leases (name, owner, expires_at) VALUES (?, ?, ?)",
+                    (name, self.owner, now + ttl)
+                )
+                conn.execute("COMMIT")
+                return True
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def release_lease(self, name: str):
+        with self._lock:
+            self._connection().execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, self.owner))
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+        with self._read_lock:
+            if self._reader is not None and self._reader_pid == os.getpid():
+                self._reader.close()
+            self._reader = None
+
+
+class SharedCacheBackend:
+    """
+    ResponseCache 的跨进程后端
+
+    与 MemoryCacheBackend 方法相同。进程内热点层保留已解码的对象：
+    local_ttl 秒内确认过的条目直接返回，不访问 SQLite；超过后再读一次共享库，
+    写入时间未变化时不重复反序列化。写入和删除在写线程中执行，调用方不等待
+    """
+
+    def __init__(self, store: SharedStateStore, namespace: str = "cache",
+                 retention: Optional[float] = None, local_entries: int = 1024,
+                 local_ttl: Optional[float] = None):
+        """
+        参数：
+            store: 共享状态库
+            namespace: 键前缀，区分不同角色的缓存
+            retention: 条目在共享库中保留的秒数，默认取 SHARED_STATE_CACHE_RETENTION
+            local_entries: 进程内已解码对象的数量上限
+            local_ttl: 热点层条目不重新确认的秒数，默认取 SHARED_STATE_LOCAL_TTL；
+                       其他进程写入的新值最多延迟这么久可见
+        """
+        self.store = store
+        self.namespace = namespace
+        self.retention = settings.SHARED_STATE_CACHE_RETENTION if retention is None else retention
+        self.local_entries = local_entries
+        self.local_ttl = settings.SHARED_STATE_LOCAL_TTL if local_ttl is None else local_ttl
+        # 键 -> (值, 写入时间, 上次确认时间)
+        self._local: "OrderedDict[str, Tuple[Any, float, float]]" = OrderedDict()
+        # 键前缀 -> 失效时间：写线程删除完成之前，共享库中更早写入的条目按未命中处理
+        self._invalidated: Dict[str, float] = {}
+        self.local_hits = 0
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def _is_invalidated(self, key: str, stored_at: float) -> bool:
+        return any(key.startswith(prefix) and stored_at <= at for prefix, at in self._invalidated.items())
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        local = self._local.get(key)
+        now = time.monotonic()
+        if local is not None and now - local[2] < self.local_ttl:
+            self._local.move_to_end(key)
+            self.local_hits += 1
+            return local[0], local[1]
+        try:
+            row = self.store.get_raw(self._key(key))
+        except sqlite3.Error as e:
+            logger.warning("读取共享缓存失败: %s", e)
+            return None if local is None else (local[0], local[1])
+        if row is None or self._is_invalidated(key, row[1]):
+            self._local.pop(key, None)
+            return None
+        payload, stored_at = row
+        value = local[0] if local is not None and local[1] == stored_at else json.loads(payload)
+        self._remember(key, value, stored_at)
+        return value, stored_at
+
+    def _remember(self, key: str, value: Any, stored_at: float):
+        self._local[key] = (value, stored_at, time.monotonic())
+        self._local.move_to_end(key)
+        while len(self._local) > self.local_entries:
+            self._local.popitem(last=False)
+
+    def set(self, key: str, value: Any, stored_at: float):
+        self._remember(key, value, stored_at)
+        _writer.submit(self._write, self._key(key), value, stored_at)
+
+    def _write(self, key: str, value: Any, stored_at: float):
+        try:
+            self.store.set(key, value, stored_at, max_age=self.retention)
+        except sqlite3.Error as e:
+            logger.warning("写入共享缓存失败: %s", e)
+
+    def _delete(self, prefix: str):
+        try:
+            self.store.delete_prefix(prefix)
+        except sqlite3.Error as e:
+            logger.warning("删除共享缓存失败: %s", e)
+
+    def try_lease(self, key: str, ttl: float) -> bool:
+        """后台刷新前获取租约，多个进程中只有一个刷新同一条缓存（可能等待写锁，应在线程中调用）"""
+        try:
+            return self.store.try_lease(self._key(key), ttl)
+        except sqlite3.Error:
+            return True
+
+    def release_lease(self, key: str):
+        try:
+            self.store.release_lease(self._key(key))
+        except sqlite3.Error:
+            pass
+
+    def delete_prefix(self, prefix: str):
+        for key in [k for k in self._local if k.startswith(prefix)]:
+            del self._local[key]
+        now = time.time()
+        self._invalidated = {p: at for p, at in self._invalidated.items() if now - at < self.retention}
+        self._invalidated[prefix] = now
+        _writer.submit(self._delete, self._key(prefix))
+
+    def clear(self):
+        self.delete_prefix("")
+
+
+_shared_store: Optional[SharedStateStore] = None
+
+
+def shared_state_store() -> Optional[SharedStateStore]:
+    """进程内共用的共享状态库；未启用时返回None（各进程使用本地状态）"""
+    global _shared_store
+    if not settings.SHARED_STATE_ENABLED:
+        return None
+    if _shared_store is None:
+        _shared_store = SharedStateStore()
+    return _shared_store
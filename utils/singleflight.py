@@ -0,0 +1,62 @@
+"""
+请求合并（single-flight）
+相同key的并发调用只执行一次，结果分发给所有等待者
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """并发请求合并器"""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.executions = 0
+        self.collapsed = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        执行或加入一次调用
+
+        参数：
+            key: 合并键，相同key的并发调用共享同一次执行
+            fn: 无参协程函数，仅在没有进行中的相同调用时执行
+        返回：
+            fn 的返回值（异常同样分发给所有等待者）
+        """
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.executions += 1
+            # 在独立任务中执行，发起者被取消时不影响其他等待者
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._finish(k, t))
+        else:
+            self.collapsed += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # 标记异常已读取，避免所有等待者都被取消时产生告警
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        获取合并计数
+
+        返回：
+            calls: 总调用次数
+            executions: 实际执行次数
+            collapsed: 被合并的调用次数
+            inflight: 当前进行中的调用数
+        """
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "collapsed": self.collapsed,
+            "inflight": len(self._inflight)
+        }
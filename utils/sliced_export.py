@@ -0,0 +1,317 @@
+"""
+时间分片并发导出
+将 [startTime, endTime] 拆分为多个子区间，受限并发地分页拉取列表接口，
+按时间顺序合并后由本服务直接生成 CSV / XLSX 流，替代上游单次串行导出
+"""
+import asyncio
+import csv
+import io
+import math
+import re
+import zipfile
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+from xml.sax.saxutils import escape
+
+from config.config import settings
+from utils.upstream_scheduler import PRIORITY_ANALYTICS, upstream_priority
+
+# 拉取一页记录：参数 (current, size, startTime, endTime)，返回上游原始响应
+FetchPage = Callable[[int, int, str, str], Awaitable[Dict[str, Any]]]
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+DATE_FORMAT = "%Y-%m-%d"
+
+# 单个时间分片的最小天数（1小时）
+MIN_SLICE_DAYS = 1 / 24
+
+# 各导出类型的列定义：(字段名, 表头)
+EXPORT_COLUMNS: Dict[str, List[Tuple[str, str]]] = {
+    "lend": [
+        ("lendUserName", "取刀人"), ("borrowUserName", "还刀人"),
+        ("brandName", "品牌名称"), ("brandCode", "品牌编码"),
+        ("cutterType", "刀具类型"), ("cutterCode", "刀具型号"),
+        ("specification", "规格"), ("materialCode", "物料编码"), ("price", "单价"),
+        ("cabinetCode", "刀柜编码"), ("lendStock", "借刀库位号"), ("borrowStock", "还刀库位号"),
+        ("lendTime", "借刀时间"), ("borrowTime", "还刀时间"), ("finalCollectTime", "最终确认时间"),
+        ("recordStatus", "记录状态"), ("borrowStatus", "还刀状态"), ("finalCollectStatus", "最终确认状态"),
+        ("borrowRemarks", "还刀备注"), ("finalCollectRemarks", "最终确认结果"), ("collectStatus", "管理员确认结果"),
+    ],
+    "replenish": [
+        ("lendUserName", "取出人"), ("storageUserName", "暂存人"),
+        ("brandName", "品牌名称"), ("cutterType", "刀具类型"), ("cutterCode", "刀具型号"),
+        ("specification", "规格"), ("quantity", "数量"), ("oldPrice", "老单价"), ("newPrice", "新单价"),
+        ("oldStockNum", "操作前库存数"), ("newStockNum", "操作后库存数"), ("stockLoc", "库位号"),
+        ("logType", "补货类型"), ("status", "业务状态"), ("cabinetCode", "刀柜编码"),
+        ("createTime", "创建时间"), ("operator", "操作人"), ("materialCode", "物料编码"),
+        ("detailsCode", "操作详情"), ("remake", "备注"),
+    ],
+    "storage": [
+        ("lendUserName", "取出人"), ("storageUserName", "暂存人"),
+        ("brandName", "品牌名称"), ("cutterCode", "刀具型号"), ("specification", "规格"),
+        ("quantity", "数量"), ("oldPrice", "老单价"), ("newPrice", "新单价"),
+        ("oldStockNum", "操作前库存数"), ("newStockNum", "操作后库存数"), ("stockLoc", "库位号"),
+        ("status", "业务状态"), ("cabinetCode", "刀柜编码"), ("createTime", "创建时间"),
+        ("operator", "操作人"), ("materialCode", "物料编码"), ("detailsCode", "操作详情"), ("remake", "备注"),
+    ],
+}
+
+
+def _parse_time(value: str, end_of_day: bool = False) -> datetime:
+    try:
+        return datetime.strptime(value, TIME_FORMAT)
+    except ValueError:
+        day = datetime.strptime(value, DATE_FORMAT)
+        return day + timedelta(days=1, seconds=-1) if end_of_day else day
+
+
+def split_time_range(start_time: str, end_time: str, slice_days: float,
+                     max_slices: Optional[int] = None) -> List[Tuple[str, str]]:
+    """
+    将时间区间拆分为互不重叠的子区间
+
+    参数：
+        start_time: 开始时间（YYYY-MM-DD HH:mm:ss 或 YYYY-MM-DD）
+        end_time: 结束时间（同上，仅日期时取当天最后一秒）
+        slice_days: 每个子区间的天数，不小于 MIN_SLICE_DAYS（1小时）
+        max_slices: 子区间数上限，默认取 SLICED_EXPORT_MAX_SLICES
+    返回：
+        [(开始时间, 结束时间)]，按时间先后排列，相邻区间以秒为界
+    异常：
+        ValueError: 时间格式错误、开始时间晚于结束时间、分片过小或分片数超过上限
+    """
+    start = _parse_time(start_time)
+    end = _parse_time(end_time, end_of_day=True)
+    if start > end:
+        raise ValueError("开始时间不能晚于结束时间")
+    if slice_days < MIN_SLICE_DAYS:
+        raise ValueError("每个时间分片不能小于1小时")
+    max_slices = settings.SLICED_EXPORT_MAX_SLICES if max_slices is None else max_slices
+    step = timedelta(seconds=round(slice_days * 86400))
+    # 先计算分片数，超过上限时不生成分片
+    count = math.ceil(((end - start).total_seconds() + 1) / step.total_seconds())
+    if count > max_slices:
+        raise ValueError(f"时间分片数 {count} 超过上限 {max_slices}，请增大 sliceDays 或缩小时间范围")
+    ranges = []
+    cursor = start
+    while cursor <= end:
+        slice_end = min(cursor + step - timedelta(seconds=1), end)
+        ranges.append((cursor.strftime(TIME_FORMAT), slice_end.strftime(TIME_FORMAT)))
+        cursor = slice_end + timedelta(seconds=1)
+    return ranges
+
+
+class SlicedExport:
+    """按时间分片并发拉取列表接口，按顺序输出记录"""
+
+    def __init__(self, fetch_page: FetchPage, ranges: Sequence[Tuple[str, str]],
+                 page_size: Optional[int] = None, concurrency: Optional[int] = None):
+        """
+        参数：
+            fetch_page: 拉取一页记录的协程函数
+            ranges: split_time_range 得到的子区间
+            page_size: 每页数量，默认取 SLICED_EXPORT_PAGE_SIZE
+            concurrency: 同时进行的上游请求数，默认取 SLICED_EXPORT_CONCURRENCY
+        """
+        self.fetch_page = fetch_page
+        self.ranges = list(ranges)
+        self.page_size = page_size or settings.SLICED_EXPORT_PAGE_SIZE
+        self.concurrency = concurrency or settings.SLICED_EXPORT_CONCURRENCY
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._first_pages: List[List[Dict[str, Any]]] = []
+        self._pages: List[int] = []
+        self.total = 0
+
+    async def _fetch(self, slice_index: int, current: int) -> Tuple[List[Dict[str, Any]], int, int]:
+        start_time, end_time = self.ranges[slice_index]
+        # 批量导出的分页请求排在写操作和页面查询之后
+        async with self._semaphore:
+            with upstream_priority(PRIORITY_ANALYTICS):
+                result = await self.fetch_page(current, self.page_size, start_time, end_time)
+        data = result.get("data") if isinstance(result, dict) else None
+        if not result.get("success") or not isinstance(data, dict):
+            raise RuntimeError(f"拉取 {start_time} ~ {end_time} 第{current}页失败: {result.get('msg')}")
+        return data.get("records") or [], data.get("pages") or 0, data.get("total") or 0
+
+    async def prepare(self):
+        """
+        并发拉取每个子区间的第一页，得到各区间的页数和总记录数
+
+        在开始输出文件前调用，上游不可用时可直接返回错误响应
+        """
+        results = await asyncio.gather(*(self._fetch(i, 1) for i in range(len(self.ranges))))
+        self._first_pages = [records for records, _, _ in results]
+        self._pages = [pages for _, pages, _ in results]
+        self.total = sum(total for _, _, total in results)
+
+    async def records(self) -> AsyncIterator[Dict[str, Any]]:
+        """
+        按时间分片、页码顺序输出全部记录
+
+        剩余页面以滑动窗口方式并发预取，内存中最多保留约 2 倍并发数的页面
+        """
+        pending = [(i, p) for i in range(len(self.ranges)) for p in range(2, self._pages[i] + 1)]
+        window = self.concurrency * 2
+        tasks: Dict[Tuple[int, int], asyncio.Task] = {}
+        next_pending = 0
+
+        def fill():
+            nonlocal next_pending
+            while next_pending < len(pending) and len(tasks) < window:
+                key = pending[next_pending]
+                tasks[key] = asyncio.ensure_future(self._fetch(*key))
+                next_pending += 1
+
+        try:
+            for i in range(len(self.ranges)):
+                fill()
+                first_page, self._first_pages[i] = self._first_pages[i], []
+                for record in first_page:
+                    yield record
+                for current in range(2, self._pages[i] + 1):
+                    fill()
+                    records, _, _ = await tasks.pop((i, current))
+                    for record in records:
+                        yield record
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+
+def _cell_value(value: Any) -> Any:
+    return "" if value is None else value
+
+
+async def write_csv(records: AsyncIterator[Dict[str, Any]], columns: List[Tuple[str, str]],
+                    batch_size: int = 500) -> AsyncIterator[bytes]:
+    """
+    生成CSV流（UTF-8 BOM，Excel可直接打开）
+
+    参数：
+        records: 记录异步迭代器
+        columns: 列定义 [(字段名, 表头)]
+        batch_size: 每批输出的行数
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([title for _, title in columns])
+    yield ("\ufeff" + buffer.getvalue()).encode("utf-8")
+    buffer.seek(0)
+    buffer.truncate()
+
+    rows = 0
+    async for record in records:
+        writer.writerow([_cell_value(record.get(field)) for field, _ in columns])
+        rows += 1
+        if rows % batch_size == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink:
+    """不可回溯的写入目标，zipfile 向其写入后由生成器取走已写入的数据"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+_XML_ILLEGAL = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+_XLSX_STATIC_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_row(values: List[Any]) -> str:
+    cells = []
+    for value in values:
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            text = _XML_ILLEGAL.sub("", str(_cell_value(value)))
+            cells.append(f'<c t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>')
+        else:
+            cells.append(f"<c><v>{value}</v></c>")
+    return f"<row>{''.join(cells)}</row>"
+
+
+async def write_xlsx(records: AsyncIterator[Dict[str, Any]], columns: List[Tuple[str, str]],
+                     batch_size: int = 500) -> AsyncIterator[bytes]:
+    """
+    生成XLSX流（单个工作表，内联字符串），边拉取边压缩输出，不依赖第三方库
+
+    参数：
+        records: 记录异步迭代器
+        columns: 列定义 [(字段名, 表头)]
+        batch_size: 每批写入的行数
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, content in _XLSX_STATIC_PARTS.items():
+            zf.writestr(name, content)
+        yield sink.drain()
+
+        with zf.open("xl/worksheets/sheet1.xml", "w") as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                + _xlsx_row([title for _, title in columns])
+            ).encode("utf-8"))
+
+            rows: List[str] = []
+            async for record in records:
+                rows.append(_xlsx_row([record.get(field) for field, _ in columns]))
+                if len(rows) >= batch_size:
+                    sheet.write("".join(rows).encode("utf-8"))
+                    rows.clear()
+                    data = sink.drain()
+                    if data:
+                        yield data
+            sheet.write(("".join(rows) + "</sheetData></worksheet>").encode("utf-8"))
+    yield sink.drain()
@@ -0,0 +1,113 @@
+"""
+启动耗时分析
+在独立子进程中测量角色服务的冷启动：各模块的导入耗时（python -X importtime）
+以及从启动进程到 /health 返回首个字节的时间，用于发现拖慢启动和滚动发布的模块。
+
+    python -m utils.startup_profile auditor
+    python -m utils.startup_profile gateway --top 30 --all-modules
+"""
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import List, NamedTuple, Optional
+
+from utils.launcher import APPS
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 项目自身的顶层包（默认只报告这些模块）
+PROJECT_PACKAGES = ("administrator", "auditor", "config", "gateway", "knife_operator", "routers", "teamleader", "utils")
+
+
+class ImportTiming(NamedTuple):
+    module: str
+    self_ms: float
+    cumulative_ms: float
+
+
+def import_profile(module: str) -> List[ImportTiming]:
+    """在新进程中导入模块，返回每个被导入模块的自身耗时和累计耗时（毫秒）"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败:\n{result.stderr[-2000:]}")
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        timings.append(ImportTiming(name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+    return timings
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_to_first_byte(role: str, port: Optional[int] = None, timeout: float = 60.0) -> float:
+    """
+    启动单 worker 服务，测量从创建进程到 /health 返回首个字节的秒数
+
+    测量结束后发送 SIGTERM，按正常退出流程关闭服务
+    """
+    port = port or _free_port()
+    started = time.monotonic()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "utils.launcher", role, "--host", "127.0.0.1", "--port", str(port), "-w", "1"],
+        cwd=PROJECT_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.monotonic() - started < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"{role} 启动失败，退出码 {process.returncode}")
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+                conn.request("GET", "/health")
+                conn.getresponse().read(1)
+                conn.close()
+                return time.monotonic() - started
+            except OSError:
+                time.sleep(0.02)
+        raise TimeoutError(f"{role} 在 {timeout} 秒内未就绪")
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def report(role: str, top: int = 15, all_modules: bool = False, port: Optional[int] = None):
+    module = APPS[role][0].split(":")[0]
+    timings = import_profile(module)
+    total = next((t.cumulative_ms for t in timings if t.module == module), 0.0)
+    if not all_modules:
+        timings = [t for t in timings if t.module.split(".")[0] in PROJECT_PACKAGES]
+
+    print(f"\n{role}（{module}）导入耗时: {total:.1f} ms")
+    print(f"{'累计(ms)':>10} {'自身(ms)':>10}  模块")
+    for t in sorted(timings, key=lambda t: t.cumulative_ms, reverse=True)[:top]:
+        print(f"{t.cumulative_ms:>10.1f} {t.self_ms:>10.1f}  {t.module}")
+    print(f"\n首字节时间（启动进程 -> GET /health）: {time_to_first_byte(role, port) * 1000:.0f} ms\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="角色服务启动耗时分析")
+    parser.add_argument("role", choices=sorted(APPS), help="要分析的服务")
+    parser.add_argument("--top", type=int, default=15, help="显示耗时最多的模块数")
+    parser.add_argument("--all-modules", action="store_true", help="包含第三方模块（默认只显示项目模块）")
+    parser.add_argument("--port", type=int, default=None, help="测量首字节时间使用的端口，默认自动选择")
+    args = parser.parse_args(argv)
+    report(args.role, args.top, args.all_modules, args.port)
+
+
+if __name__ == "__main__":
+    main()
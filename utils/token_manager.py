@@ -7,9 +7,19 @@ import logging
 import os
 from typing import Dict, Any, Optional
 
-logging.basicConfig(level=logging.INFO)
+# 本文件可作为独立脚本运行（python3 utils/token_manager.py），不依赖项目内其他模块
 logger = logging.getLogger(__name__)
 
+# 登录响应中需要打码的字段
+_SENSITIVE_KEYS = ("access_token", "refresh_token", "token", "password")
+
+
+def _redact(result: Any) -> Any:
+    """登录响应打码后用于日志"""
+    if not isinstance(result, dict):
+        return result
+    return {key: "***" if str(key).lower() in _SENSITIVE_KEYS else value for key, value in result.items()}
+
 
 class TokenManager:
     """Token管理器 - 负责登录和Token刷新"""
@@ -45,7 +55,7 @@ class TokenManager:
         }
         
         try:
-            logger.info(f"正在为用户 {username} 登录...")
+            logger.info("正在为用户 %s 登录...", username)
             
             # 发送登录请求
             response = requests.post(
@@ -60,27 +70,28 @@ class TokenManager:
             result = response.json()
             
             # 打印完整响应用于调试
-            logger.info(f"响应状态码: {response.status_code}")
-            logger.info(f"响应内容: {result}")
+            logger.info("响应状态码: %s", response.status_code)
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("响应内容: %s", _redact(result))
             
             # 检查响应格式：直接返回access_token，没有success字段
             token = result.get("access_token")
             if token:
                 logger.info("✅ 登录成功！")
-                logger.info(f"Token有效期: {result.get('expires_in')} 秒")
+                logger.info("Token有效期: %s 秒", result.get('expires_in'))
                 return token
             else:
                 # 如果没有access_token，尝试检查是否有错误信息
                 error_msg = result.get('msg') or result.get('error_description') or '未知错误'
-                logger.error(f"❌ 登录失败: {error_msg}")
-                logger.error(f"完整响应: {result}")
+                logger.error("❌ 登录失败: %s", error_msg)
+                logger.error("完整响应: %s", _redact(result))
                 return None
                 
         except requests.exceptions.RequestException as e:
-            logger.error(f"❌ 登录请求失败: {e}")
+            logger.error("❌ 登录请求失败: %s", e)
             return None
         except Exception as e:
-            logger.error(f"❌ 登录过程出错: {e}")
+            logger.error("❌ 登录过程出错: %s", e)
             return None
     
     def save_token(self, token: str) -> bool:
@@ -96,10 +107,10 @@ class TokenManager:
         try:
             with open(self.token_file, 'w', encoding='utf-8') as f:
                 f.write(token)
-            logger.info(f"✅ Token已保存到: {self.token_file}")
+            logger.info("✅ Token已保存到: %s", self.token_file)
             return True
         except Exception as e:
-            logger.error(f"❌ 保存Token失败: {e}")
+            logger.error("❌ 保存Token失败: %s", e)
             return False
     
     def refresh_token(self, username: str, password: str) -> bool:
@@ -143,10 +154,10 @@ class TokenManager:
                     token = f.read().strip()
                     return token if token else None
             else:
-                logger.warning(f"Token文件不存在: {self.token_file}")
+                logger.warning("Token文件不存在: %s", self.token_file)
                 return None
         except Exception as e:
-            logger.error(f"读取Token失败: {e}")
+            logger.error("读取Token失败: %s", e)
             return None
 
 
@@ -166,6 +177,8 @@ def refresh_token(username: str = "李敖", password: str = "e52ca69c7b3f5c50483
 # 主程序 - 可以直接运行此脚本刷新Token
 if __name__ == "__main__":
     import sys
+
+    logging.basicConfig(level=logging.INFO)
     
     print("\n" + "="*50)
     print("          Token 刷新工具")
@@ -0,0 +1,290 @@
+"""
+Token生命周期管理
+Token保存在内存中：启动时从配置或 token.txt 读取一次，之后按 expires_in（或JWT的exp）
+在过期前后台刷新；上游返回401时，所有并发请求共用一次刷新，刷新完成后各自重发。
+请求路径上不读写文件。启用共享状态时，多个 worker 共用一个Token：
+刷新前先看其他进程是否已换新，登录由持有租约的一个进程执行
+"""
+import asyncio
+import base64
+import json
+import logging
+import os
+import time
+from typing import Callable, List, Optional, Tuple
+
+import httpx
+
+from config.config import settings
+from utils.shared_state import SharedStateStore, shared_state_store
+
+logger = logging.getLogger(__name__)
+
+# 登录接口固定使用的客户端认证（与 TokenManager 一致）
+LOGIN_CLIENT_AUTH = "Basic c2FiZXI6c2FiZXJfc2VjcmV0"
+
+# 共享状态中的Token键和登录租约名
+SHARED_TOKEN_KEY = "token"
+LOGIN_LEASE = "token:login"
+
+# 未抢到登录租约时，等待其他进程登录完成的轮询间隔（秒）
+SHARED_TOKEN_POLL = 0.2
+
+
+def resolve_token_path(token_file: str) -> str:
+    """相对路径按项目根目录解析"""
+    if os.path.isabs(token_file):
+        return token_file
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(project_root, token_file)
+
+
+def read_token_file(token_file: str) -> Optional[str]:
+    try:
+        with open(resolve_token_path(token_file), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def jwt_expiry(token: str) -> Optional[float]:
+    """读取JWT载荷中的 exp（不校验签名），非JWT返回None"""
+    parts = token.split(".")
+    if len(parts) != 3:
+        return None
+    try:
+        payload = parts[1] + "=" * (-len(parts[1]) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload)).get("exp")
+        return float(exp) if exp else None
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+
+class TokenProvider:
+    """上游Token提供者"""
+
+    def __init__(self, token: Optional[str] = None, token_file: Optional[str] = None,
+                 username: Optional[str] = None, password: Optional[str] = None,
+                 login_url: Optional[str] = None, refresh_margin: Optional[float] = None,
+                 store: Optional[SharedStateStore] = None):
+        """
+        参数：
+            token: 初始Token（如 ORIGINAL_API_KEY），为空时从 token_file 读取
+            token_file: Token文件，启动时读取一次；刷新成功后写回，未配置账号时刷新改为重新读取该文件
+            username/password: 登录账号和MD5密码，默认取 MES_USERNAME/MES_PASSWORD
+            login_url: 登录接口，默认取 MES_LOGIN_URL
+            refresh_margin: 提前多少秒刷新，默认取 TOKEN_REFRESH_MARGIN
+            store: 多进程共享状态，默认在 SHARED_STATE_ENABLED 时使用共享库
+        """
+        self.store = store if store is not None else shared_state_store()
+        self.token_file = token_file
+        self.username = settings.MES_USERNAME if username is None else username
+        self.password = settings.MES_PASSWORD if password is None else password
+        self.login_url = login_url or settings.MES_LOGIN_URL
+        self.refresh_margin = settings.TOKEN_REFRESH_MARGIN if refresh_margin is None else refresh_margin
+        self.token: Optional[str] = None
+        self.expires_at: Optional[float] = None
+        self.refreshes = 0
+        self.shared_adoptions = 0
+        self.failures = 0
+        self._listeners: List[Callable[[Optional[str]], None]] = []
+        self._refreshing: Optional[asyncio.Task] = None
+        self._task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+        shared = self._read_shared()
+        initial = token or (read_token_file(token_file) if token_file else None)
+        if shared is not None and (not initial or shared[0] != initial):
+            # 其他 worker 已登录换新的Token
+            self._adopt(*shared)
+            logger.info("已加载共享Token")
+        elif initial:
+            self.set_token(initial)
+            logger.info("已加载Token")
+        else:
+            logger.warning("无法加载Token，将使用无认证模式")
+
+    @property
+    def identity(self) -> str:
+        """
+        Token所属的稳定身份（登录账号或Token文件），刷新前后不变
+
+        缓存等按身份而不是Token取值区分范围，Token刷新不会使缓存失效
+        """
+        if self.username:
+            return f"account:{self.username}"
+        if self.token_file:
+            return f"file:{resolve_token_path(self.token_file)}"
+        return "static"
+
+    def subscribe(self, listener: Callable[[Optional[str]], None]):
+        """注册Token变更回调（会话据此更新认证请求头），注册时立即回调一次当前Token"""
+        self._listeners.append(listener)
+        listener(self.token)
+
+    def set_token(self, token: str, expires_in: Optional[float] = None):
+        """更新内存中的Token并通知各会话"""
+        self._adopt(token, time.time() + expires_in if expires_in else jwt_expiry(token))
+
+    def _adopt(self, token: str, expires_at: Optional[float]):
+        self.token = token
+        self.expires_at = expires_at
+        for listener in self._listeners:
+            listener(token)
+        self._changed.set()
+
+    def _read_shared(self) -> Optional[Tuple[str, Optional[float]]]:
+        """共享状态中未过期的Token (token, expires_at)"""
+        if self.store is None:
+            return None
+        try:
+            entry = self.store.get(SHARED_TOKEN_KEY)
+        except Exception as e:
+            logger.warning("读取共享Token失败: %s", e)
+            return None
+        if entry is None:
+            return None
+        value = entry[0]
+        expires_at = value.get("expiresAt")
+        if not value.get("token") or (expires_at is not None and expires_at <= time.time()):
+            return None
+        return value["token"], expires_at
+
+    def _publish(self):
+        if self.store is None or not self.token:
+            return
+        try:
+            self.store.set(SHARED_TOKEN_KEY, {"token": self.token, "expiresAt": self.expires_at})
+        except Exception as e:
+            logger.warning("写入共享Token失败: %s", e)
+
+    async def _login(self) -> Optional[str]:
+        data = {
+            "username": self.username,
+            "password": self.password,
+            "grantTypeInfo": "web",
+            "grant_type": "captcha"
+        }
+        headers = {"Content-Type": "application/x-www-form-urlencoded", "Authorization": LOGIN_CLIENT_AUTH}
+        async with httpx.AsyncClient(timeout=settings.UPSTREAM_TIMEOUT) as client:
+            response = await client.post(self.login_url, data=data, headers=headers)
+            response.raise_for_status()
+            result = response.json()
+        token = result.get("access_token")
+        if not token:
+            raise RuntimeError(result.get("msg") or result.get("error_description") or "登录未返回access_token")
+        self.set_token(token, result.get("expires_in"))
+        await asyncio.to_thread(self._publish)
+        if self.token_file:
+            await asyncio.to_thread(self._save, token)
+        return token
+
+    def _save(self, token: str):
+        try:
+            with open(resolve_token_path(self.token_file), "w", encoding="utf-8") as f:
+                f.write(token)
+        except OSError as e:
+            logger.warning("保存Token文件失败: %s", e)
+
+    async def _reload(self) -> Optional[str]:
+        """未配置账号时，重新读取Token文件（可由 TokenManager 脚本更新）"""
+        token = await asyncio.to_thread(read_token_file, self.token_file) if self.token_file else None
+        if token and token != self.token:
+            self.set_token(token)
+            await asyncio.to_thread(self._publish)
+        return self.token
+
+    async def _adopt_shared(self, previous: Optional[str]) -> bool:
+        """其他进程已换新Token时直接使用"""
+        shared = await asyncio.to_thread(self._read_shared)
+        if shared is None or shared[0] == previous:
+            return False
+        self._adopt(*shared)
+        self.shared_adoptions += 1
+        return True
+
+    async def _do_refresh(self) -> Optional[str]:
+        previous = self.token
+        try:
+            if await self._adopt_shared(previous):
+                return self.token
+            if self.store is not None:
+                lease_ttl = settings.UPSTREAM_TIMEOUT * 2
+                if not await asyncio.to_thread(self.store.try_lease, LOGIN_LEASE, lease_ttl):
+                    # 其他进程正在登录：等待其结果
+                    deadline = time.monotonic() + lease_ttl
+                    while time.monotonic() < deadline:
+                        await asyncio.sleep(SHARED_TOKEN_POLL)
+                        if await self._adopt_shared(previous):
+                            return self.token
+                    logger.warning("等待其他进程刷新Token超时，改为自行刷新")
+            try:
+                token = await (self._login() if self.username and self.password else self._reload())
+            finally:
+                if self.store is not None:
+                    await asyncio.to_thread(self.store.release_lease, LOGIN_LEASE)
+            self.refreshes += 1
+            logger.info("Token已刷新")
+            return token
+        except Exception as e:
+            self.failures += 1
+            logger.error("刷新Token失败: %s", e)
+            return self.token
+
+    async def refresh(self, stale: Optional[str] = None) -> bool:
+        """
+        刷新Token（并发调用共用一次刷新）
+
+        参数：
+            stale: 请求失败时使用的Token；当前Token已与之不同（其他请求已完成刷新）时不再刷新
+        返回：
+            当前Token是否已不同于 stale（调用方据此决定是否重发请求）
+        """
+        if stale is not None and self.token != stale:
+            return True
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.ensure_future(self._do_refresh())
+        await asyncio.shield(self._refreshing)
+        return self.token is not None and self.token != stale
+
+    async def _run(self):
+        while True:
+            self._changed.clear()
+            delay = None
+            if self.expires_at is not None:
+                delay = max(0.0, self.expires_at - self.refresh_margin - time.time())
+            try:
+                # 等到过期前刷新；Token被其他途径更新时重新计算
+                await asyncio.wait_for(self._changed.wait(), timeout=delay)
+                continue
+            except asyncio.TimeoutError:
+                pass
+            previous = self.token
+            await self.refresh()
+            if self.token == previous:
+                # 刷新失败或无新Token，稍后重试，避免空转
+                await asyncio.sleep(max(self.refresh_margin / 10, 5))
+
+    def start(self):
+        """启动到期前自动刷新任务（需在事件循环中调用）"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        for task in (self._task, self._refreshing):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = None
+
+    def stats(self):
+        return {
+            "hasToken": self.token is not None,
+            "expiresAt": self.expires_at,
+            "refreshes": self.refreshes,
+            "sharedAdoptions": self.shared_adoptions,
+            "failures": self.failures
+        }
@@ -0,0 +1,303 @@
+"""
+上游并发调度
+所有角色共用一个上游并发上限，超出上限的请求按优先级排队：
+写操作和操作员终端请求先于班组长查询，审计统计、导出和后台同步最后放行。
+上限按 AIMD 自适应：请求快速成功且名额用满时缓慢增加，出现超时、5xx 或耗时超过目标时成倍下调。
+
+调度器只在进程内排队。多个 worker 之间不做逐请求的协调（每个请求都跨进程加锁的开销过大），
+而是静态分摊：UPSTREAM_CONCURRENCY_LIMIT 及上下限是一个服务所有 worker 的合计，
+每个进程取 1/UPSTREAM_LIMIT_PROCESSES（由 utils.launcher 按 worker 数设置），
+各进程再在自己的份额内按优先级排队和自适应调整
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from config.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 保留的上限变更记录条数
+LIMIT_HISTORY_SIZE = 100
+
+# 优先级（数值越小越先放行）
+PRIORITY_WRITE = 0          # 写操作（新增、修改、归还、暂存）
+PRIORITY_OPERATOR = 1       # 操作员终端查询
+PRIORITY_INTERACTIVE = 2    # 班组长等页面查询
+PRIORITY_ANALYTICS = 3      # 审计统计、导出、后台同步
+
+PRIORITY_NAMES = {
+    PRIORITY_WRITE: "write",
+    PRIORITY_OPERATOR: "operator",
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_ANALYTICS: "analytics",
+}
+
+_current_priority: ContextVar[Optional[int]] = ContextVar("upstream_priority", default=None)
+
+
+@contextmanager
+def upstream_priority(priority: int):
+    """在代码块内覆盖上游请求的优先级（后台任务、导出等批量调用使用）"""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority(default: int) -> int:
+    """当前上下文指定的优先级，未指定时返回 default"""
+    priority = _current_priority.get()
+    return default if priority is None else priority
+
+
+def process_share(total: int, processes: int) -> int:
+    """多个进程分摊的上限中本进程的份额（0 表示不限制，保持为0）"""
+    if total <= 0 or processes <= 1:
+        return total
+    return max(1, math.ceil(total / processes))
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+class _Waiter:
+    """排队中的请求；notify 在放行时调用（可能来自其他线程）"""
+    __slots__ = ("priority", "enqueued_at", "notify", "granted", "cancelled")
+
+    def __init__(self, priority: int, notify: Callable[[], None]):
+        self.priority = priority
+        self.enqueued_at = time.monotonic()
+        self.notify = notify
+        self.granted = False
+        self.cancelled = False
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class UpstreamScheduler:
+    """
+    带优先级的上游并发限制器（线程安全）
+
+    异步调用方使用 slot()，同步客户端（requests）使用 slot_sync()，需在工作线程中调用（同步路由由 FastAPI 放到线程池）；
+    调用方在请求结束后通过 record() 反馈耗时和成败，用于自适应调整上限
+    """
+
+    def __init__(self, limit: Optional[int] = None, adaptive: Optional[bool] = None,
+                 min_limit: Optional[int] = None, max_limit: Optional[int] = None,
+                 latency_target: Optional[float] = None, backoff: Optional[float] = None,
+                 processes: Optional[int] = None):
+        """
+        参数：
+            limit: 初始并发上限，默认取 UPSTREAM_CONCURRENCY_LIMIT，0 表示不限制（同时关闭自适应）
+            adaptive: 是否自适应调整上限，默认取 UPSTREAM_ADAPTIVE_LIMIT
+            min_limit/max_limit: 上限的调整范围，默认取 UPSTREAM_MIN_CONCURRENCY/UPSTREAM_MAX_CONCURRENCY
+            latency_target: 单次请求耗时目标（秒），超过视为拥塞，默认取 UPSTREAM_LATENCY_TARGET
+            backoff: 拥塞时上限乘以的系数，默认取 UPSTREAM_AIMD_BACKOFF
+            processes: 分摊上限的进程数，默认取 UPSTREAM_LIMIT_PROCESSES；上限及上下限按进程数均分
+        """
+        self.processes = max(1, settings.UPSTREAM_LIMIT_PROCESSES if processes is None else processes)
+        initial = process_share(settings.UPSTREAM_CONCURRENCY_LIMIT if limit is None else limit, self.processes)
+        self.adaptive = (settings.UPSTREAM_ADAPTIVE_LIMIT if adaptive is None else adaptive) and initial > 0
+        self.min_limit = max(1, process_share(
+            settings.UPSTREAM_MIN_CONCURRENCY if min_limit is None else min_limit, self.processes))
+        self.max_limit = process_share(
+            settings.UPSTREAM_MAX_CONCURRENCY if max_limit is None else max_limit, self.processes)
+        self.latency_target = settings.UPSTREAM_LATENCY_TARGET if latency_target is None else latency_target
+        self.backoff = settings.UPSTREAM_AIMD_BACKOFF if backoff is None else backoff
+        self._limit = float(initial)
+        self._last_decrease = 0.0
+        self.increases = 0
+        self.decreases = 0
+        self.history: Deque[Tuple[float, int, str]] = deque(maxlen=LIMIT_HISTORY_SIZE)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiters: List[Tuple[int, int, _Waiter]] = []
+        self._seq = itertools.count()
+        self.admitted: Dict[str, int] = {name: 0 for name in PRIORITY_NAMES.values()}
+        self.queued: Dict[str, int] = {name: 0 for name in PRIORITY_NAMES.values()}
+        self.wait_seconds: Dict[str, float] = {name: 0.0 for name in PRIORITY_NAMES.values()}
+        self.overflow = 0
+
+    @property
+    def limit(self) -> int:
+        """当前生效的并发上限"""
+        return int(self._limit)
+
+    def _admit_now(self, priority: int) -> bool:
+        """有空闲名额且无人排队时直接放行（需持有锁）"""
+        if self.limit <= 0 or (self._active < self.limit and not self._waiters):
+            self._active += 1
+            self.admitted[PRIORITY_NAMES[priority]] += 1
+            return True
+        return False
+
+    def _enqueue(self, priority: int, notify: Callable[[], None]) -> _Waiter:
+        waiter = _Waiter(priority, notify)
+        heapq.heappush(self._waiters, (priority, next(self._seq), waiter))
+        self.queued[PRIORITY_NAMES[priority]] += 1
+        return waiter
+
+    async def acquire(self, priority: int):
+        """异步获取一个上游名额"""
+        with self._lock:
+            if self._admit_now(priority):
+                return
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            waiter = self._enqueue(priority, lambda: loop.call_soon_threadsafe(_resolve, future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                granted = waiter.granted
+                waiter.cancelled = True
+            if granted:
+                self.release()
+            raise
+
+    def acquire_sync(self, priority: int):
+        """
+        同步获取一个上游名额
+
+        应在工作线程中调用，名额用满时阻塞等待。若仍在事件循环线程内调用（async 路由直接调用同步客户端），
+        阻塞会使持有名额的协程无法运行，只能直接放行并计入 overflow；overflow 持续增长说明有路由需要改为同步函数
+        """
+        with self._lock:
+            if self._admit_now(priority):
+                return
+            if _on_event_loop():
+                self._active += 1
+                self.admitted[PRIORITY_NAMES[priority]] += 1
+                self.overflow += 1
+                return
+            event = threading.Event()
+            self._enqueue(priority, event.set)
+        event.wait()
+
+    def _drain(self) -> List[_Waiter]:
+        """在上限内按优先级放行排队请求，返回需要通知的等待者（需持有锁）"""
+        granted = []
+        while self._waiters and (self.limit <= 0 or self._active < self.limit):
+            _, _, waiter = heapq.heappop(self._waiters)
+            if waiter.cancelled:
+                continue
+            waiter.granted = True
+            self._active += 1
+            name = PRIORITY_NAMES[waiter.priority]
+            self.admitted[name] += 1
+            self.wait_seconds[name] += time.monotonic() - waiter.enqueued_at
+            granted.append(waiter)
+        return granted
+
+    def release(self):
+        """释放名额，并按优先级放行排队请求"""
+        with self._lock:
+            self._active -= 1
+            granted = self._drain()
+        for waiter in granted:
+            waiter.notify()
+
+    def record(self, latency: float, failed: bool):
+        """
+        反馈一次上游请求的结果（在释放名额之前调用）
+
+        加性增：请求成功、耗时未超过目标且名额已用满或有排队时，上限每轮（约 limit 个请求）加 1；
+        乘性减：失败或耗时超过目标时上限乘以 backoff，一个耗时目标周期内最多下调一次
+        """
+        if not self.adaptive:
+            return
+        granted = []
+        with self._lock:
+            old = self.limit
+            now = time.monotonic()
+            if failed or latency > self.latency_target:
+                if now - self._last_decrease < self.latency_target:
+                    return
+                self._last_decrease = now
+                self._limit = max(float(self.min_limit), self._limit * self.backoff)
+                reason = "error" if failed else "latency"
+            elif self._active >= self.limit or self._waiters:
+                self._limit = min(float(self.max_limit), self._limit + 1.0 / max(self._limit, 1.0))
+                reason = "increase"
+            else:
+                return
+            new = self.limit
+            if new == old:
+                return
+            if new > old:
+                self.increases += 1
+                granted = self._drain()
+            else:
+                self.decreases += 1
+            self.history.append((time.time(), new, reason))
+        if new < old:
+            logger.info("上游并发上限下调: %s -> %s（%s）", old, new, reason)
+        for waiter in granted:
+            waiter.notify()
+
+    @asynccontextmanager
+    async def slot(self, priority: int):
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @contextmanager
+    def slot_sync(self, priority: int):
+        self.acquire_sync(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, object]:
+        """
+        获取调度统计
+
+        返回：
+            limit/active/waiting: 当前上限、进行中、排队中的请求数
+            adaptive/minLimit/maxLimit/increases/decreases/history: 自适应上限的范围、调整次数和最近的变更记录
+            admitted/queued/waitSeconds: 按优先级统计的放行次数、排队次数、累计排队耗时
+            overflow: 事件循环线程内无法等待而直接放行的同步请求数
+            processes: 分摊上限的进程数
+        """
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "processes": self.processes,
+                "adaptive": self.adaptive,
+                "minLimit": self.min_limit,
+                "maxLimit": self.max_limit,
+                "increases": self.increases,
+                "decreases": self.decreases,
+                "history": [{"time": t, "limit": limit, "reason": reason} for t, limit, reason in self.history],
+                "active": self._active,
+                "waiting": sum(1 for _, _, w in self._waiters if not w.cancelled),
+                "admitted": dict(self.admitted),
+                "queued": dict(self.queued),
+                "waitSeconds": {k: round(v, 3) for k, v in self.wait_seconds.items()},
+                "overflow": self.overflow
+            }
+
+
+# 进程内所有上游会话共用的调度器
+upstream_scheduler = UpstreamScheduler()